@@ -0,0 +1,206 @@
+# action_store.py
+"""
+Cópia colunar da tabela actions em arquivos binários de largura fixa, para os
+motores analíticos (stats_calculator_numpy) lerem com np.memmap sem copiar nem
+converter linhas do SQLite em tuplas. As páginas dos arquivos ficam no cache do
+sistema operacional e são compartilhadas entre processos.
+
+Layout (diretório <banco>_columns/, ao lado do arquivo do banco):
+  meta.json   {"format": 1, "hands": H, "actions": N, "last_hand_db_id": último hand_db_id copiado}
+  Por mão (H linhas, em ordem de hand_db_id):
+    hand_db_id.bin        int64 little-endian
+    hand_action_end.bin   int64: fim (exclusivo) das ações da mão; o início é o fim da mão anterior (0 na primeira)
+    hand_aggressors.bin   int32 x 3 por mão: preflop_aggressor_id, flop_aggressor_id, turn_aggressor_id (-1 = NULL)
+  Por ação (N linhas, em ordem de hand_db_id, action_sequence; todas as streets):
+    street_code.bin, action_code.bin, size_group_code.bin             int8 (size_group_code NULL = -1)
+    player_id.bin, action_sequence.bin                                int32 (player_id NULL = -1)
+    amount.bin, pot_total_before_action.bin, amount_to_call_for_player.bin,
+    bet_faced_by_player_amount.bin, pot_when_bet_was_made.bin         float64 (NULL = 0)
+
+Os arquivos só crescem: sync_action_store acrescenta as mãos com hand_db_id maior que
+o último copiado e grava meta.json (troca atômica) depois dos dados, então quem lê usa
+as contagens do meta e nunca enxerga um lote pela metade. Se mãos copiadas forem
+removidas do banco, a cópia é refeita do zero.
+
+NumPy é opcional, como em stats_calculator_numpy.
+"""
+import os
+import json
+import shutil
+from itertools import chain
+
+import db_manager
+from stats_calculator_numpy import NUMPY_AVAILABLE, ActionColumns, np
+
+STORE_FORMAT = 1
+
+# (arquivo, expressão em hands, dtype, colunas por linha)
+HAND_STORE_COLUMNS = (
+    ("hand_db_id", "hand_db_id", "<i8", 1),
+    ("hand_aggressors", "COALESCE(preflop_aggressor_id, -1), COALESCE(flop_aggressor_id, -1), "
+                        "COALESCE(turn_aggressor_id, -1)", "<i4", 3),
+)
+# (arquivo, expressão em actions, dtype)
+ACTION_STORE_COLUMNS = (
+    ("street_code", "street_code", "<i1"),
+    ("action_code", "action_code", "<i1"),
+    ("player_id", "COALESCE(player_id, -1)", "<i4"),
+    ("action_sequence", "action_sequence", "<i4"),
+    ("amount", "COALESCE(amount, 0)", "<f8"),
+    ("pot_total_before_action", "COALESCE(pot_total_before_action, 0)", "<f8"),
+    ("amount_to_call_for_player", "COALESCE(amount_to_call_for_player, 0)", "<f8"),
+    ("bet_faced_by_player_amount", "COALESCE(bet_faced_by_player_amount, 0)", "<f8"),
+    ("pot_when_bet_was_made", "COALESCE(pot_when_bet_was_made, 0)", "<f8"),
+    ("size_group_code", "COALESCE(size_group_code, -1)", "<i1"),
+)
+HAND_ACTION_END_DTYPE = "<i8"
+
+
+def default_store_directory():
+    return os.path.splitext(db_manager.DB_NAME)[0] + "_columns"
+
+
+def _empty_meta():
+    return {"format": STORE_FORMAT, "hands": 0, "actions": 0, "last_hand_db_id": 0}
+
+
+def read_store_meta(directory):
+    """meta.json do diretório, ou None se não existe (ou é de outro formato)."""
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == STORE_FORMAT else None
+
+
+def _write_meta(directory, meta):
+    temp_path = os.path.join(directory, "meta.json.tmp")
+    with open(temp_path, "w", encoding="utf-8") as meta_file:
+        json.dump(meta, meta_file)
+        meta_file.flush()
+        os.fsync(meta_file.fileno())
+    os.replace(temp_path, os.path.join(directory, "meta.json"))
+
+
+def _column_files(directory):
+    """(caminho, dtype, colunas por linha, contagem do meta que define o tamanho)."""
+    files = [(os.path.join(directory, name + ".bin"), dtype, width, "hands") for name, _, dtype, width in HAND_STORE_COLUMNS]
+    files.append((os.path.join(directory, "hand_action_end.bin"), HAND_ACTION_END_DTYPE, 1, "hands"))
+    files.extend((os.path.join(directory, name + ".bin"), dtype, 1, "actions") for name, _, dtype in ACTION_STORE_COLUMNS)
+    return files
+
+
+def _truncate_to_meta(directory, meta):
+    """Descarta o que passou do meta (lote interrompido antes de gravar o meta.json)."""
+    for path, dtype, width, count_key in _column_files(directory):
+        with open(path, "ab") as column_file:
+            column_file.truncate(meta[count_key] * width * np.dtype(dtype).itemsize)
+
+
+def _append_hands(conn, directory, meta, hand_rows):
+    first_hand_id, last_hand_id = hand_rows[0][0], hand_rows[-1][0]
+    hand_columns = np.array(hand_rows, dtype=np.int64)
+    action_sql = ", ".join(expression for _, expression, _ in ACTION_STORE_COLUMNS)
+    action_rows = conn.execute(f"""
+        SELECT hand_db_id, {action_sql}
+        FROM actions
+        WHERE hand_db_id BETWEEN ? AND ?
+        ORDER BY hand_db_id, action_sequence
+    """, (first_hand_id, last_hand_id))
+    actions = np.fromiter(chain.from_iterable(action_rows), dtype=np.float64).reshape(-1, len(ACTION_STORE_COLUMNS) + 1)
+
+    hand_ids = hand_columns[:, 0]
+    hand_action_end = meta["actions"] + np.searchsorted(actions[:, 0].astype(np.int64), hand_ids, side="right")
+    column_index = 0
+    for name, _, dtype, width in HAND_STORE_COLUMNS:
+        with open(os.path.join(directory, name + ".bin"), "ab") as column_file:
+            hand_columns[:, column_index:column_index + width].astype(dtype).tofile(column_file)
+        column_index += width
+    with open(os.path.join(directory, "hand_action_end.bin"), "ab") as column_file:
+        hand_action_end.astype(HAND_ACTION_END_DTYPE).tofile(column_file)
+    for column_index, (name, _, dtype) in enumerate(ACTION_STORE_COLUMNS, start=1):
+        with open(os.path.join(directory, name + ".bin"), "ab") as column_file:
+            actions[:, column_index].astype(dtype).tofile(column_file)
+
+    meta.update(hands=meta["hands"] + len(hand_rows), actions=meta["actions"] + len(actions),
+                last_hand_db_id=int(last_hand_id))
+    _write_meta(directory, meta)
+
+
+def sync_action_store(conn, directory=None, batch_hands=20000):
+    """
+    Cria ou atualiza a cópia colunar de actions: acrescenta as mãos novas (hand_db_id maior
+    que o último copiado), em lotes de batch_hands. Retorna quantas mãos foram acrescentadas.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("NumPy não está instalado: a cópia colunar de actions não está disponível.")
+    directory = directory or default_store_directory()
+    meta = read_store_meta(directory)
+    if meta is not None:
+        # Mãos já copiadas que sumiram do banco (ON DELETE CASCADE): refaz do zero
+        copied_count = conn.execute("SELECT COUNT(*) FROM hands WHERE hand_db_id <= ?",
+                                    (meta["last_hand_db_id"],)).fetchone()[0]
+        if copied_count != meta["hands"]:
+            print(f"Cópia colunar de actions desatualizada ({meta['hands']} mãos copiadas, {copied_count} no banco): recriando...")
+            meta = None
+    if meta is None:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        meta = _empty_meta()
+        _write_meta(directory, meta)
+    _truncate_to_meta(directory, meta)
+
+    hand_sql = ", ".join(expression for _, expression, _, _ in HAND_STORE_COLUMNS)
+    appended_count = 0
+    while True:
+        hand_rows = conn.execute(f"SELECT {hand_sql} FROM hands WHERE hand_db_id > ? ORDER BY hand_db_id LIMIT ?",
+                                 (meta["last_hand_db_id"], batch_hands)).fetchall()
+        if not hand_rows:
+            break
+        _append_hands(conn, directory, meta, [tuple(row) for row in hand_rows])
+        appended_count += len(hand_rows)
+    if appended_count:
+        print(f"Cópia colunar de actions: {appended_count} mãos acrescentadas ({meta['hands']} mãos, {meta['actions']} ações).")
+    return appended_count
+
+
+def _map_column(path, dtype, shape):
+    if not shape[0]:
+        return np.empty(shape, dtype=dtype) # np.memmap não mapeia arquivo vazio
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def open_action_store(directory=None):
+    """
+    Mapeia os arquivos (somente leitura) com o tamanho gravado no meta.json.
+    Retorna {nome do arquivo: array}, ou None se a cópia não existe.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("NumPy não está instalado: a cópia colunar de actions não está disponível.")
+    directory = directory or default_store_directory()
+    meta = read_store_meta(directory)
+    if meta is None:
+        return None
+    columns = {}
+    for path, dtype, width, count_key in _column_files(directory):
+        shape = (meta[count_key], width) if width > 1 else (meta[count_key],)
+        columns[os.path.splitext(os.path.basename(path))[0]] = _map_column(path, dtype, shape)
+    return columns
+
+
+def open_action_columns(directory=None):
+    """ActionColumns (stats_calculator_numpy) sobre os arquivos mapeados, ou None se a cópia não existe."""
+    store = open_action_store(directory)
+    if store is None:
+        return None
+    return ActionColumns(
+        hand_ids=store["hand_db_id"],
+        hand_offsets=np.concatenate(([0], store["hand_action_end"])),
+        aggressor_ids=store["hand_aggressors"],
+        street_code=store["street_code"],
+        action_code=store["action_code"],
+        player_id=store["player_id"],
+        bet_faced=store["bet_faced_by_player_amount"],
+        size_group_code=store["size_group_code"],
+    )
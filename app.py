@@ -6,12 +6,13 @@ import os # Para verificar se o DB existe ao iniciar o servidor
 
 # Importar módulos do seu projeto
 import db_manager         # Para get_db_connection, create_tables
-import stats_calculator   # Para PlayerStats, calculate_stats_for_single_player
+import stats_calculator   # Para PlayerStats, load_stats_for_single_player
 
 app = Flask(__name__, template_folder='html_templates')
 
 # Cache simples no lado do servidor para estatísticas de jogadores já calculadas na sessão
-# Chave: player_name, Valor: objeto PlayerStats já com os dados calculados
+# Chave: player_name, Valor: (MAX(hand_db_id) no momento do cálculo, objeto PlayerStats)
+# Quando o ingest_watcher.py/main_processor.py insere mãos novas o MAX muda e a entrada é recalculada.
 PLAYER_STATS_CACHE = {}
 # Poderia usar um cache mais sofisticado como LRUCache se a memória se tornar um problema
 # from cachetools import LRUCache
@@ -21,17 +22,22 @@ PLAYER_STATS_CACHE = {}
 def get_player_stats_object_from_db_or_cache(player_name_to_fetch: str) -> stats_calculator.PlayerStats | None:
     """
     Obtém o objeto PlayerStats para um jogador.
-    Primeiro tenta o cache, depois calcula do DB se necessário e armazena no cache.
+    Primeiro tenta o cache (válido enquanto nenhuma mão nova for inserida), depois
+    calcula do DB se necessário e armazena no cache.
     """
-    if player_name_to_fetch in PLAYER_STATS_CACHE:
-        print(f"Servidor: Retornando stats de '{player_name_to_fetch}' do cache do servidor.")
-        return PLAYER_STATS_CACHE[player_name_to_fetch]
-
-    print(f"Servidor: Calculando stats para '{player_name_to_fetch}' a partir do DB...")
     conn = None
     try:
-        conn = db_manager.get_db_connection()
+        conn = db_manager.get_read_only_connection() # Não disputa o lock de escrita com o import
         cursor = conn.cursor()
+        cursor.execute("SELECT MAX(hand_db_id) FROM hands")
+        hands_version = cursor.fetchone()[0]
+
+        cached = PLAYER_STATS_CACHE.get(player_name_to_fetch)
+        if cached and cached[0] == hands_version:
+            print(f"Servidor: Retornando stats de '{player_name_to_fetch}' do cache do servidor.")
+            return cached[1]
+
+        print(f"Servidor: Calculando stats para '{player_name_to_fetch}' a partir do DB...")
         cursor.execute("SELECT player_id FROM players WHERE player_name = ?", (player_name_to_fetch,))
         player_row = cursor.fetchone()
 
@@ -41,11 +47,11 @@ def get_player_stats_object_from_db_or_cache(player_name_to_fetch: str) -> stats
 
         player_id = player_row['player_id']
         
-        # Chama a função principal de cálculo de stats para este jogador
-        player_stat_obj = stats_calculator.calculate_stats_for_single_player(conn, player_id, player_name_to_fetch)
+        # Lê os contadores mantidos pela importação (player_stat_counters) em vez de recalcular o histórico
+        player_stat_obj = stats_calculator.load_stats_for_single_player(conn, player_id, player_name_to_fetch)
         
         if player_stat_obj:
-            PLAYER_STATS_CACHE[player_name_to_fetch] = player_stat_obj # Adiciona ao cache
+            PLAYER_STATS_CACHE[player_name_to_fetch] = (hands_version, player_stat_obj) # Adiciona ao cache
             print(f"Servidor: Stats para '{player_name_to_fetch}' calculadas e cacheadas.")
         return player_stat_obj
 
@@ -115,6 +121,7 @@ if __name__ == '__main__':
             print("Tabelas criadas (ou já existiam).")
         else:
             print(f"Usando banco de dados existente: '{db_file}'")
+            db_manager.create_tables(conn_init) # Aplica migrações pendentes (ver db_manager.SCHEMA_VERSION)
     except sqlite3.Error as e:
         print(f"Erro ao inicializar banco de dados: {e}")
     except Exception as e:
@@ -124,7 +131,8 @@ if __name__ == '__main__':
             conn_init.close()
     
     print("\n--- Servidor Flask ---")
-    print("Execute o `main_processor.py` separadamente para popular o banco de dados com novas mãos.")
+    print("Execute o `main_processor.py` separadamente para popular o banco de dados com novas mãos,")
+    print("ou deixe o `ingest_watcher.py` rodando para importar as mãos em tempo real.")
     print("Acesse a interface no navegador em http://127.0.0.1:5000/")
     print("Para parar o servidor, pressione CTRL+C neste terminal.\n")
     
@@ -0,0 +1,89 @@
+# benchmarks/bench_bulk_load.py
+"""
+Compara a gravação no SQLite no modo normal (índices criados antes da carga,
+PRAGMAs padrão) com o modo de carga em massa (db_manager.begin_bulk_load /
+end_bulk_load, incluindo a recriação dos índices e o ANALYZE).
+
+As mãos são parseadas uma única vez antes das medições, então os números medem
+só o custo de escrita. Cada modo grava num banco novo em um diretório temporário.
+
+Uso:
+    python benchmarks/bench_bulk_load.py [--scale N] [arquivo_de_log ...]
+
+Sem arquivos usa historico_maos.txt e maos_gerais/. --scale N replica as mãos N
+vezes (com IDs diferentes) para simular um histórico maior.
+"""
+import os
+import sys
+import copy
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db_manager
+import hand_parser
+import main_processor
+
+
+def load_hands(paths, scale):
+    hands = []
+    for text_block in main_processor.iter_hand_blocks_from_files(paths):
+        hand_obj = hand_parser.parse_hand_history_to_object(text_block)
+        if hand_obj:
+            hands.append(hand_obj)
+    scaled = list(hands)
+    for copy_index in range(1, scale):
+        for hand_obj in hands:
+            hand_copy = copy.copy(hand_obj)
+            hand_copy.hand_id = f"{hand_obj.hand_id}{copy_index:03d}"
+            scaled.append(hand_copy)
+    return scaled
+
+
+def run_load(hands, bulk_load, batch_size=5000):
+    work_dir = tempfile.mkdtemp(prefix="bench_bulk_")
+    db_manager.DB_NAME = os.path.join(work_dir, "poker_data.db")
+    try:
+        conn = db_manager.get_db_connection()
+        db_manager.create_tables(conn)
+        start_time = time.perf_counter()
+        previous_pragmas = db_manager.begin_bulk_load(conn) if bulk_load else None
+        for start in range(0, len(hands), batch_size):
+            db_manager.save_hands_to_db(conn, hands[start:start + batch_size])
+            conn.commit()
+        if previous_pragmas is not None:
+            db_manager.end_bulk_load(conn, previous_pragmas)
+        elapsed = time.perf_counter() - start_time
+        conn.close()
+        return elapsed
+    finally:
+        db_manager.clear_player_id_cache()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--scale", type=int, default=1)
+    args = arg_parser.parse_args(argv)
+
+    paths = args.paths or list(main_processor.iter_log_file_paths())
+    hands = load_hands(paths, max(1, args.scale))
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+    actions_count = sum(len(hand_obj.actions) for hand_obj in hands)
+    print(f"{len(hands)} mãos, {actions_count} ações")
+
+    normal_s = run_load(hands, bulk_load=False)
+    bulk_s = run_load(hands, bulk_load=True)
+    print(f"  modo normal       : {normal_s:7.2f}s  ({len(hands) / normal_s:8.0f} mãos/s)")
+    print(f"  carga em massa    : {bulk_s:7.2f}s  ({len(hands) / bulk_s:8.0f} mãos/s, inclui índices + ANALYZE)")
+    print(f"  speedup           : {normal_s / bulk_s:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_hand_memory.py
+"""
+Mede a memória ocupada pelos objetos PokerHand retornados por
+hand_parser.parse_hand_history_to_object quando muitas mãos ficam vivas ao mesmo
+tempo (caminho em memória / motores de estatística em lote).
+
+Uso:
+    python benchmarks/bench_hand_memory.py [arquivo_de_log ...]
+
+Sem argumentos usa historico_maos.txt e maos_gerais/.
+"""
+import os
+import sys
+import gc
+import pickle
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import hand_parser
+import main_processor
+
+
+def main(argv):
+    paths = argv or list(main_processor.iter_log_file_paths())
+    text_blocks = list(main_processor.iter_hand_blocks_from_files(paths))
+
+    gc.collect()
+    tracemalloc.start()
+    baseline_bytes = tracemalloc.get_traced_memory()[0]
+    hands = [hand_obj for hand_obj in map(hand_parser.parse_hand_history_to_object, text_blocks) if hand_obj]
+    gc.collect()
+    used_bytes = tracemalloc.get_traced_memory()[0] - baseline_bytes
+    tracemalloc.stop()
+
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+    actions_count = sum(len(hand_obj.actions) for hand_obj in hands)
+    pickled_bytes = sum(len(pickle.dumps(hand_obj, protocol=pickle.HIGHEST_PROTOCOL)) for hand_obj in hands)
+    print(f"{len(hands)} mãos, {actions_count} ações")
+    print(f"  memória viva     : {used_bytes / 1024 / 1024:8.1f} MB")
+    print(f"  por mão          : {used_bytes / len(hands):8.0f} bytes")
+    print(f"  por ação (aprox.): {used_bytes / actions_count:8.0f} bytes")
+    print(f"  pickle por mão   : {pickled_bytes / len(hands):8.0f} bytes")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
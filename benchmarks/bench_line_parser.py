@@ -0,0 +1,76 @@
+# benchmarks/bench_line_parser.py
+"""
+Micro-benchmark do classificador de linhas de ação (hand_parser.classify_action_line)
+contra a cascata de regex original (RE_ANTE ... RE_MUCKS_HAND).
+
+Uso:
+    python benchmarks/bench_line_parser.py [arquivo_de_log ...]
+
+Sem argumentos usa historico_maos.txt. Antes de medir, confere que as duas
+implementações produzem o mesmo resultado para todas as linhas do log.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import hand_parser
+from hand_parser import (RE_ANTE, RE_SB, RE_BB, RE_ACTION_FOLDS, RE_ACTION_CHECKS, RE_ACTION_CALLS,
+                         RE_ACTION_BETS, RE_ACTION_RAISES, RE_UNCALLED_BET, RE_COLLECTED_POT,
+                         RE_SHOWS_HAND, RE_DOESNT_SHOW, RE_MUCKS_HAND)
+
+
+def legacy_classify_action_line(line):
+    """Cascata if/elif original de parse_hand_history_to_object (cada regex executada duas vezes)."""
+    m = RE_ANTE.match(line)
+    if m: return (m.group(1), 'posts_ante', int(m.group(2)), None, None, None)
+    elif RE_SB.match(line): m = RE_SB.match(line); return (m.group(1), 'posts_sb', int(m.group(2)), None, None, None)
+    elif RE_BB.match(line): m = RE_BB.match(line); return (m.group(1), 'posts_bb', int(m.group(2)), None, None, None)
+    elif RE_ACTION_FOLDS.match(line): m = RE_ACTION_FOLDS.match(line); return (m.group(1), 'folds', None, None, None, None)
+    elif RE_ACTION_CHECKS.match(line): m = RE_ACTION_CHECKS.match(line); return (m.group(1), 'checks', None, None, None, None)
+    elif RE_ACTION_CALLS.match(line): m = RE_ACTION_CALLS.match(line); return (m.group(1), 'calls', int(m.group(2)), None, None, None)
+    elif RE_ACTION_BETS.match(line): m = RE_ACTION_BETS.match(line); return (m.group(1), 'bets', int(m.group(2)), None, None, None)
+    elif RE_ACTION_RAISES.match(line): m = RE_ACTION_RAISES.match(line); return (m.group(1), 'raises', int(m.group(2)), int(m.group(3)), None, None)
+    elif RE_UNCALLED_BET.match(line): m = RE_UNCALLED_BET.match(line); return (m.group(2), 'uncalled_bet_returned', int(m.group(1)), None, None, None)
+    elif RE_COLLECTED_POT.match(line): m = RE_COLLECTED_POT.match(line); return (m.group(1), 'collected_pot', int(m.group(2)), None, None, None)
+    elif RE_SHOWS_HAND.match(line): m = RE_SHOWS_HAND.match(line); return (m.group(1), 'shows_hand', None, None, m.group(2), m.group(3))
+    elif RE_DOESNT_SHOW.match(line): m = RE_DOESNT_SHOW.match(line); return (m.group(1), 'doesnt_show_hand', None, None, None, None)
+    elif RE_MUCKS_HAND.match(line): m = RE_MUCKS_HAND.match(line); return (m.group(1), 'mucks_hand', None, None, None, None)
+    return None
+
+
+def load_lines(paths):
+    lines = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                line = raw.strip()
+                if line and not line.startswith(("PokerStars Hand #", "***")):
+                    lines.append(line)
+    return lines
+
+
+def main(argv):
+    paths = argv or ["historico_maos.txt"]
+    lines = load_lines(paths)
+    if not lines:
+        print("Nenhuma linha encontrada nos arquivos informados.")
+        return
+
+    mismatches = [l for l in lines if legacy_classify_action_line(l) != hand_parser.classify_action_line(l)]
+    if mismatches:
+        print(f"ATENÇÃO: {len(mismatches)} linhas com resultado diferente. Exemplo: {mismatches[0]!r}")
+
+    runs = max(1, 200000 // len(lines))
+    legacy_s = min(timeit.repeat(lambda: [legacy_classify_action_line(l) for l in lines], number=runs, repeat=5))
+    new_s = min(timeit.repeat(lambda: [hand_parser.classify_action_line(l) for l in lines], number=runs, repeat=5))
+    total = len(lines) * runs
+    print(f"{len(lines)} linhas x {runs} execuções")
+    print(f"  cascata de regex : {legacy_s / total * 1e9:8.0f} ns/linha")
+    print(f"  despacho único   : {new_s / total * 1e9:8.0f} ns/linha")
+    print(f"  speedup          : {legacy_s / new_s:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,126 @@
+# benchmarks/bench_numpy_engine.py
+"""
+Compara o cálculo das stats pós-flop de todos os jogadores pelas consultas SQL
+(stats_calculator.calculate_stats_for_all_players) com o motor colunar NumPy
+(stats_calculator_numpy): o motor é medido em duas partes, a leitura de actions
+para arrays (load_action_columns) e o cálculo vetorizado, e também lendo a cópia
+colunar do action_store (np.memmap dos arquivos gerados por sync_action_store).
+Também confere se os campos de NUMPY_STAT_FIELDS saem iguais nos caminhos.
+
+As mãos são importadas uma vez (carga em massa) num banco temporário.
+
+Uso:
+    python benchmarks/bench_numpy_engine.py [--scale N] [--repeat R] [arquivo_de_log ...]
+
+Com --scale N as mãos são replicadas N vezes; para um banco com milhões de ações
+use um histórico grande e/ou um --scale alto.
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db_manager
+import action_store
+import main_processor
+import stats_calculator
+import stats_calculator_numpy
+from bench_bulk_load import load_hands
+
+
+def build_database(hands, work_dir, batch_size=5000):
+    db_manager.DB_NAME = os.path.join(work_dir, "poker_data.db")
+    conn = db_manager.get_db_connection()
+    db_manager.create_tables(conn)
+    previous_pragmas = db_manager.begin_bulk_load(conn)
+    for start in range(0, len(hands), batch_size):
+        db_manager.save_hands_to_db(conn, hands[start:start + batch_size])
+        conn.commit()
+    db_manager.end_bulk_load(conn, previous_pragmas)
+    db_manager.clear_player_id_cache()
+    return conn
+
+
+def best_time(function, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _nonzero_items(value):
+    if isinstance(value, dict):
+        return {(key,) + sub_key: sub_value for key, item in value.items()
+                for sub_key, sub_value in _nonzero_items(item).items() if sub_value}
+    return {(): value}
+
+
+def count_mismatches(sql_stats, numpy_stats):
+    mismatches = 0
+    for player_name, ps in sql_stats.items():
+        numpy_ps = numpy_stats.get(player_name)
+        for field_name in stats_calculator_numpy.NUMPY_STAT_FIELDS + ("hands_played",):
+            if numpy_ps is None or _nonzero_items(getattr(ps, field_name)) != _nonzero_items(getattr(numpy_ps, field_name)):
+                mismatches += 1
+    return mismatches
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    if not stats_calculator_numpy.NUMPY_AVAILABLE:
+        print("NumPy não está instalado.")
+        return
+    paths = args.paths or list(main_processor.iter_log_file_paths())
+    hands = load_hands(paths, max(1, args.scale))
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_numpy_")
+    try:
+        conn = build_database(hands, work_dir)
+        actions_count = conn.execute("SELECT COUNT(*) FROM actions").fetchone()[0]
+        players_count = conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+        print(f"{len(hands)} mãos, {actions_count} ações, {players_count} jogadores")
+
+        sql_s, sql_stats = best_time(lambda: stats_calculator.calculate_stats_for_all_players(conn), args.repeat)
+        load_s, columns = best_time(lambda: stats_calculator_numpy.load_action_columns(conn), args.repeat)
+        numpy_s, numpy_stats = best_time(
+            lambda: stats_calculator_numpy.calculate_stats_for_all_players(conn, columns=columns), args.repeat)
+        print(f"  SQL (GROUP BY, todas as stats): {sql_s:8.3f}s")
+        print(f"  NumPy leitura de actions      : {load_s:8.3f}s")
+        print(f"  NumPy cálculo                 : {numpy_s:8.3f}s  ({sql_s / numpy_s if numpy_s else 0:6.1f}x o SQL)")
+        print(f"  NumPy leitura + cálculo       : {load_s + numpy_s:8.3f}s  ({sql_s / (load_s + numpy_s):6.1f}x o SQL)")
+        print(f"  campos divergentes            : {count_mismatches(sql_stats, numpy_stats)}")
+
+        store_dir = os.path.join(work_dir, "columns")
+        export_s, _ = best_time(lambda: (shutil.rmtree(store_dir, ignore_errors=True),
+                                         action_store.sync_action_store(conn, store_dir)), 1)
+        open_s, store_columns = best_time(lambda: action_store.open_action_columns(store_dir), args.repeat)
+        store_s, store_stats = best_time(
+            lambda: stats_calculator_numpy.calculate_stats_for_all_players(conn, columns=store_columns), args.repeat)
+        print(f"  action_store exportação       : {export_s:8.3f}s (uma vez; depois só as mãos novas)")
+        print(f"  action_store memmap + cálculo : {open_s + store_s:8.3f}s  ({sql_s / (open_s + store_s):6.1f}x o SQL)")
+        print(f"  campos divergentes (memmap)   : {count_mismatches(sql_stats, store_stats)}")
+        conn.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
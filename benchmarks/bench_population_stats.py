@@ -0,0 +1,81 @@
+# benchmarks/bench_population_stats.py
+"""
+Compara o recálculo das stats de toda a população de jogadores em série
+(stats_calculator.calculate_stats_for_single_player jogador a jogador, numa conexão)
+com o pool de processos de stats_population (blocos de jogadores, uma conexão
+somente leitura por worker), para cada quantidade de workers pedida.
+Também confere se o pool devolve os mesmos contadores que
+stats_calculator.calculate_stats_for_all_players no processo principal.
+
+As mãos são importadas uma vez (carga em massa) num banco temporário.
+
+Uso:
+    python benchmarks/bench_population_stats.py [--scale N] [--workers 1,2,4] [--chunk-size C] [arquivo_de_log ...]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main_processor
+import stats_calculator
+import stats_population
+from bench_bulk_load import load_hands
+from bench_numpy_engine import build_database
+
+
+def timed(function):
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    return time.perf_counter() - start_time, result
+
+
+def calculate_serial(conn):
+    players = conn.execute("SELECT player_id, player_name FROM players ORDER BY player_id").fetchall()
+    return {name: stats_calculator.calculate_stats_for_single_player(conn, player_id, name) for player_id, name in players}
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    arg_parser.add_argument("--chunk-size", type=int, default=100)
+    args = arg_parser.parse_args(argv)
+
+    paths = args.paths or list(main_processor.iter_log_file_paths())
+    hands = load_hands(paths, max(1, args.scale))
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_population_")
+    try:
+        conn = build_database(hands, work_dir)
+        players_count = conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+        print(f"{len(hands)} mãos, {players_count} jogadores")
+
+        serial_s, _ = timed(lambda: calculate_serial(conn))
+        print(f"  série (single_player)     : {serial_s:8.3f}s  ({players_count / serial_s:8.0f} jogadores/s)")
+        _, reference = timed(lambda: stats_calculator.calculate_stats_for_all_players(conn))
+        for workers in sorted({int(value) for value in args.workers.split(",") if value.strip()}):
+            pool_s, pool_stats = timed(lambda: stats_population.calculate_population_stats(
+                workers=workers, chunk_size=args.chunk_size))
+            mismatches = sum(1 for name, ps in reference.items()
+                             if name not in pool_stats or pool_stats[name]._counters != ps._counters)
+            print(f"  pool com {workers:2d} workers       : {pool_s:8.3f}s  ({players_count / pool_s:8.0f} jogadores/s, "
+                  f"{serial_s / pool_s:5.1f}x a série, {mismatches} divergentes)")
+        conn.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
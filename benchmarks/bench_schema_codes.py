@@ -0,0 +1,177 @@
+# benchmarks/bench_schema_codes.py
+"""
+Compara o esquema antigo da tabela actions (street / action_type em TEXT) com o
+atual (street_code / action_code inteiros, db_manager.SCHEMA_VERSION = 1):
+tamanho do arquivo, tamanho da tabela actions e dos índices que contêm as
+colunas, e o tempo de consultas no formato usado pelos stats_calculator_*.
+
+As mãos são importadas uma vez no esquema atual; a cópia no esquema antigo é
+montada a partir da view actions_named, com os índices antigos. Os dois bancos
+passam por VACUUM e ANALYZE antes das medições.
+
+Uso:
+    python benchmarks/bench_schema_codes.py [--scale N] [--repeat R] [arquivo_de_log ...]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db_manager
+import poker_codes
+import main_processor
+from bench_bulk_load import load_hands
+
+# Mesmas consultas nos dois esquemas: {street} / {action} são as colunas e os
+# demais campos os valores (nome entre aspas no esquema antigo, código no atual).
+QUERIES = {
+    "PFR (por jogador)": """
+        SELECT COUNT(DISTINCT hand_db_id) FROM actions
+        WHERE player_id = ? AND {street} = {Preflop} AND {action} IN ({bets}, {raises})
+    """,
+    "Donk Flop (por jogador)": """
+        SELECT COUNT(DISTINCT pa.hand_db_id)
+        FROM hands h JOIN actions pa ON pa.hand_db_id = h.hand_db_id
+        WHERE h.preflop_aggressor_id IS NOT NULL AND h.preflop_aggressor_id != ?1
+          AND pa.player_id = ?1 AND pa.{street} = {Flop} AND pa.{action} IN ({bets}, {checks})
+          AND NOT EXISTS (SELECT 1 FROM actions pb WHERE pb.hand_db_id = h.hand_db_id AND pb.{street} = {Flop}
+                          AND pb.{action} IN ({bets}, {raises}) AND pb.action_sequence < pa.action_sequence)
+    """,
+    "Call-Fold Turn (por jogador)": """
+        SELECT t.{action}, COUNT(*)
+        FROM actions f JOIN actions t ON t.hand_db_id = f.hand_db_id AND t.player_id = f.player_id
+        WHERE f.player_id = ? AND f.{street} = {Flop} AND f.{action} = {calls} AND f.bet_faced_by_player_amount > 0
+          AND t.{street} = {Turn} AND t.bet_faced_by_player_amount > 0 AND t.{action} IN ({calls}, {folds}, {raises})
+        GROUP BY t.{action}
+    """,
+    "Varredura 3bet Preflop": """
+        SELECT hand_db_id, player_id, {action}, action_sequence FROM actions
+        WHERE {street} = {Preflop} ORDER BY hand_db_id, action_sequence
+    """,
+}
+
+OLD_INDEXES = [
+    "CREATE INDEX idx_actions_player_street_type ON actions (player_id, street, action_type)",
+    "CREATE INDEX idx_actions_hand_sequence ON actions (hand_db_id, action_sequence)",
+    "CREATE INDEX idx_actions_hand_player ON actions (hand_db_id, player_id)",
+    "CREATE INDEX idx_actions_hand_street_type ON actions (hand_db_id, street, action_type)",
+]
+
+
+def _query_values(text_schema):
+    values = {"street": "street" if text_schema else "street_code",
+              "action": "action_type" if text_schema else "action_code"}
+    for name, code in list(poker_codes.STREET_CODES.items()) + list(poker_codes.ACTION_CODES.items()):
+        values[name] = f"'{name}'" if text_schema else code
+    return values
+
+
+def build_databases(hands, work_dir):
+    codes_db = os.path.join(work_dir, "codes.db")
+    text_db = os.path.join(work_dir, "text.db")
+    db_manager.DB_NAME = codes_db
+    conn = db_manager.get_db_connection(wal=False)
+    db_manager.create_tables(conn)
+    for start in range(0, len(hands), 5000):
+        db_manager.save_hands_to_db(conn, hands[start:start + 5000])
+        conn.commit()
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    db_manager.clear_player_id_cache()
+
+    shutil.copyfile(codes_db, text_db)
+    conn = sqlite3.connect(text_db)
+    conn.executescript("""
+        CREATE TABLE actions_text AS SELECT * FROM actions_named;
+        DROP VIEW actions_named;
+        DROP TABLE actions;
+        ALTER TABLE actions_text RENAME TO actions;
+    """)
+    for create_sql in OLD_INDEXES:
+        conn.execute(create_sql)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return text_db, codes_db
+
+
+def actions_storage_bytes(db_path):
+    """Bytes ocupados pela tabela actions e seus índices (via dbstat), ou None se indisponível."""
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT SUM(d.pgsize) FROM dbstat d JOIN sqlite_master m ON m.name = d.name "
+                           "WHERE m.tbl_name = 'actions'").fetchone()
+        return row[0]
+    except sqlite3.OperationalError: # SQLite compilado sem SQLITE_ENABLE_DBSTAT_VTAB
+        return None
+    finally:
+        conn.close()
+
+
+def time_queries(db_path, text_schema, repeat):
+    conn = sqlite3.connect(db_path)
+    player_ids = [row[0] for row in conn.execute("SELECT player_id FROM players")]
+    values = _query_values(text_schema)
+    timings = {}
+    for label, template in QUERIES.items():
+        sql = template.format(**values)
+        per_player = "?" in sql
+        best = None
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            if per_player:
+                for player_id in player_ids:
+                    conn.execute(sql, (player_id,)).fetchall()
+            else:
+                conn.execute(sql).fetchall()
+            elapsed = time.perf_counter() - start_time
+            best = elapsed if best is None else min(best, elapsed)
+        timings[label] = best
+    conn.close()
+    return timings
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    paths = args.paths or list(main_processor.iter_log_file_paths())
+    hands = load_hands(paths, max(1, args.scale))
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+    print(f"{len(hands)} mãos, {sum(len(hand_obj.actions) for hand_obj in hands)} ações")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_schema_")
+    try:
+        text_db, codes_db = build_databases(hands, work_dir)
+        text_size, codes_size = os.path.getsize(text_db), os.path.getsize(codes_db)
+        print(f"  arquivo            : {text_size / 1048576:8.2f} MB (TEXT) -> {codes_size / 1048576:8.2f} MB (códigos)"
+              f"  {100.0 * (text_size - codes_size) / text_size:5.1f}% menor")
+        text_actions, codes_actions = actions_storage_bytes(text_db), actions_storage_bytes(codes_db)
+        if text_actions and codes_actions:
+            print(f"  actions + índices  : {text_actions / 1048576:8.2f} MB (TEXT) -> {codes_actions / 1048576:8.2f} MB (códigos)"
+                  f"  {100.0 * (text_actions - codes_actions) / text_actions:5.1f}% menor")
+        text_timings = time_queries(text_db, True, args.repeat)
+        codes_timings = time_queries(codes_db, False, args.repeat)
+        for label in QUERIES:
+            text_s, codes_s = text_timings[label], codes_timings[label]
+            print(f"  {label:<29}: {text_s * 1000:8.1f} ms -> {codes_s * 1000:8.1f} ms  ({text_s / codes_s if codes_s else 0:4.2f}x)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_street_threads.py
+"""
+Compara, jogador a jogador, stats_calculator.calculate_stats_for_single_player em série
+(Pré-Flop e Flop, como hoje, e as quatro streets em sequência numa conexão) com o modo
+concurrent_streets=True (as quatro streets no pool de threads, uma conexão somente
+leitura por thread). Também confere se o modo concorrente dá os mesmos contadores que
+stats_calculator.calculate_stats_for_all_players.
+
+As mãos são importadas uma vez (carga em massa) num banco temporário.
+
+Uso:
+    python benchmarks/bench_street_threads.py [--scale N] [--repeat R] [arquivo_de_log ...]
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main_processor
+import stats_calculator
+from bench_bulk_load import load_hands
+from bench_numpy_engine import build_database, best_time
+
+
+def calculate_each_player(conn, players, all_streets=False, concurrent_streets=False):
+    result = {}
+    for player_id, player_name in players:
+        ps = stats_calculator.calculate_stats_for_single_player(conn, player_id, player_name,
+                                                                concurrent_streets=concurrent_streets)
+        if all_streets and not concurrent_streets and ps.hands_played:
+            for calculate_street in stats_calculator.STREET_CALCULATORS[2:]:
+                calculate_street({player_id: ps}, conn.cursor(), [player_id])
+        result[player_name] = ps
+    return result
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("paths", nargs="*")
+    arg_parser.add_argument("--scale", type=int, default=1)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args(argv)
+
+    paths = args.paths or list(main_processor.iter_log_file_paths())
+    hands = load_hands(paths, max(1, args.scale))
+    if not hands:
+        print("Nenhuma mão encontrada nos arquivos informados.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="bench_streets_")
+    try:
+        conn = build_database(hands, work_dir)
+        players = [tuple(row) for row in conn.execute("SELECT player_id, player_name FROM players ORDER BY player_id")]
+        print(f"{len(hands)} mãos, {len(players)} jogadores")
+
+        two_s, _ = best_time(lambda: calculate_each_player(conn, players), args.repeat)
+        serial_s, _ = best_time(lambda: calculate_each_player(conn, players, all_streets=True), args.repeat)
+        threads_s, threads_stats = best_time(
+            lambda: calculate_each_player(conn, players, concurrent_streets=True), args.repeat)
+        _, reference = best_time(lambda: stats_calculator.calculate_stats_for_all_players(conn), 1)
+        mismatches = sum(1 for name, ps in reference.items() if threads_stats[name]._counters != ps._counters)
+        print(f"  série, Pré-Flop + Flop      : {two_s:8.3f}s")
+        print(f"  série, 4 streets            : {serial_s:8.3f}s")
+        print(f"  threads, 4 streets          : {threads_s:8.3f}s  ({serial_s / threads_s:5.1f}x a série)")
+        print(f"  jogadores divergentes       : {mismatches}")
+        conn.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,210 @@
 # db_manager.py
+import os
 import sqlite3
+from collections import OrderedDict
+from urllib.request import pathname2url
+
+from collections import Counter, defaultdict
+from itertools import groupby
+
+import poker_codes
+from poker_codes import STREET_NAMES, ACTION_NAMES
+from hand_parser import POSTFLOP_STREET_CODES, compute_street_player_info
+from hand_features import HAND_FEATURE_FIELDS, compute_hand_features
+from stat_counters import hand_stat_counters, counter_rows
 
 DB_NAME = "poker_data.db"
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
+# Versão do esquema, gravada em PRAGMA user_version. create_tables migra bancos antigos.
+#   0: actions.street / actions.action_type em TEXT
+#   1: actions.street_code / actions.action_code em INTEGER (códigos de poker_codes),
+#      com as tabelas streets e action_types e a view actions_named para os nomes
+#   2: tabela hand_street_players (ordem de ação, IP e fold por jogador no Flop/Turn/River)
+#   3: tabela hand_features (cbet, donk, probe, check-raise, aposta enfrentada e linha por street)
+#   4: actions.bet_pct / actions.size_group_code (aposta enfrentada em % do pote e grupo de tamanho)
+#   5: tabela player_stat_counters (contadores de stats por jogador mantidos na importação)
+SCHEMA_VERSION = 5
+
+# Concorrência entre o import (main_processor/ingest_watcher) e o HUD (app.py).
+# Em WAL os leitores não bloqueiam o escritor e vice-versa; BUSY_TIMEOUT_MS cobre
+# as disputas restantes (dois escritores, checkpoint) em vez de falhar na hora com
+# "database is locked". WAL_AUTOCHECKPOINT_PAGES = 0 desliga o checkpoint automático
+# (aí o checkpoint fica só por conta de checkpoint_wal).
+USE_WAL = True
+BUSY_TIMEOUT_MS = 5000
+WAL_AUTOCHECKPOINT_PAGES = 1000
+
+# Cache LRU nome -> player_id compartilhado pelo processo. Como jogadores nunca são
+# removidos nem renomeados, um ID lido ou inserido continua válido; o cache só
+# precisa ser descartado após um rollback que desfaça inserções em players (use
+# rollback_and_clear_player_id_cache). Fica associado a um único arquivo de banco por vez.
+PLAYER_ID_CACHE_SIZE = 100000
+_player_id_cache = OrderedDict()
+_player_id_cache_db = None
+
+def get_db_connection(wal=None, busy_timeout_ms=None, wal_autocheckpoint=None):
+    """
+    Conexão de leitura e escrita (import). Por padrão usa os valores de USE_WAL,
+    BUSY_TIMEOUT_MS e WAL_AUTOCHECKPOINT_PAGES.
+    """
+    wal = USE_WAL if wal is None else wal
+    busy_timeout_ms = BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+    conn = sqlite3.connect(DB_NAME, timeout=busy_timeout_ms / 1000)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    if wal:
+        conn.execute("PRAGMA journal_mode = WAL") # Persistente: fica gravado no arquivo do banco
+        conn.execute("PRAGMA synchronous = NORMAL") # Seguro em WAL; só o último commit pode se perder num crash do SO
+        conn.execute(f"PRAGMA wal_autocheckpoint = {int(WAL_AUTOCHECKPOINT_PAGES if wal_autocheckpoint is None else wal_autocheckpoint)}")
+    warm_player_id_cache(conn)
     return conn
 
+def get_read_only_connection(busy_timeout_ms=None, db_path=None):
+    """
+    Conexão somente leitura para a camada web (app.py). Abre o arquivo com
+    mode=ro e query_only, então nunca disputa o lock de escrita com o import;
+    em WAL enxerga o último commit sem esperar o fim de transações em andamento.
+    db_path: outro arquivo de banco (padrão: DB_NAME).
+    """
+    busy_timeout_ms = BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+    db_uri = "file:" + pathname2url(os.path.abspath(db_path or DB_NAME)) + "?mode=ro"
+    conn = sqlite3.connect(db_uri, uri=True, timeout=busy_timeout_ms / 1000)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def checkpoint_wal(conn, mode="PASSIVE"):
+    """
+    Executa um checkpoint do WAL (PASSIVE, FULL, RESTART ou TRUNCATE).
+    PASSIVE nunca espera leitores; TRUNCATE também zera o arquivo -wal.
+    Retorna (busy, frames no log, frames copiados) ou None se o banco não está em WAL.
+    """
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+        return None
+    return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+def clear_player_id_cache():
+    global _player_id_cache_db
+    _player_id_cache.clear()
+    _player_id_cache_db = None
+
+def rollback_and_clear_player_id_cache(conn):
+    """
+    Desfaz a transação aberta de `conn` e descarta o cache de player_ids: IDs gravados
+    pelo INSERT OR IGNORE de get_or_create_player_ids nessa transação deixam de existir
+    (e podem ser reaproveitados para outros nomes). O cache é recarregado no próximo uso.
+    """
+    conn.rollback()
+    clear_player_id_cache()
+
+def _database_path(conn):
+    row = conn.execute("PRAGMA database_list").fetchone()
+    return row[2] if row else ""
+
+def warm_player_id_cache(conn):
+    """
+    (Re)associa o cache ao banco de `conn` e o pré-carrega com os jogadores mais
+    recentes da tabela players (até PLAYER_ID_CACHE_SIZE).
+    Bancos em memória não usam o cache.
+    """
+    global _player_id_cache_db
+    clear_player_id_cache()
+    db_path = _database_path(conn)
+    if not db_path:
+        return
+    try:
+        rows = conn.execute("SELECT player_name, player_id FROM players ORDER BY player_id DESC LIMIT ?",
+                            (PLAYER_ID_CACHE_SIZE,)).fetchall()
+    except sqlite3.OperationalError: # Tabela players ainda não criada
+        rows = []
+    for row in reversed(rows): # Mais recentes ficam no fim (mais recentemente usados)
+        _player_id_cache[row[0]] = row[1]
+    _player_id_cache_db = db_path
+
+def _player_id_cache_for(conn):
+    """Retorna o cache se ele pode ser usado com `conn` (mesmo arquivo de banco), senão None."""
+    db_path = _database_path(conn)
+    if not db_path:
+        return None
+    if db_path != _player_id_cache_db:
+        warm_player_id_cache(conn)
+    return _player_id_cache
+
+def _remember_player_ids(cache, name_to_id):
+    for name, player_id in name_to_id.items():
+        cache[name] = player_id
+        cache.move_to_end(name)
+    while len(cache) > PLAYER_ID_CACHE_SIZE:
+        cache.popitem(last=False)
+
+# Índices secundários: (nome, DDL). Ficam numa lista para que o modo de carga em massa
+# possa removê-los antes de importar e recriá-los (com ANALYZE) no final.
+# Os índices automáticos das restrições UNIQUE não entram aqui e nunca são removidos.
+SECONDARY_INDEXES = [
+    ("idx_actions_player_street_type", "CREATE INDEX IF NOT EXISTS idx_actions_player_street_type ON actions (player_id, street_code, action_code);"),
+    ("idx_actions_hand_sequence", "CREATE INDEX IF NOT EXISTS idx_actions_hand_sequence ON actions (hand_db_id, action_sequence);"),
+    # Índices adicionais para acelerar consultas complexas de Pré-Flop
+    ("idx_actions_hand_player", "CREATE INDEX IF NOT EXISTS idx_actions_hand_player ON actions (hand_db_id, player_id);"),
+    ("idx_actions_hand_street_type", "CREATE INDEX IF NOT EXISTS idx_actions_hand_street_type ON actions (hand_db_id, street_code, action_code);"),
+    # Fold to bet por size: só as ações que enfrentam aposta (índice parcial)
+    ("idx_actions_player_street_size", "CREATE INDEX IF NOT EXISTS idx_actions_player_street_size ON actions (player_id, street_code, size_group_code, action_code) WHERE size_group_code IS NOT NULL;"),
+    ("idx_hand_street_players_player", "CREATE INDEX IF NOT EXISTS idx_hand_street_players_player ON hand_street_players (player_id, street_code);"),
+    ("idx_hand_players_hand_player", "CREATE INDEX IF NOT EXISTS idx_hand_players_hand_player ON hand_players (hand_db_id, player_id);"),
+    ("idx_hand_players_hand_position", "CREATE INDEX IF NOT EXISTS idx_hand_players_hand_position ON hand_players (hand_db_id, position);"),
+    # Mãos de um jogador (hands_played, stats_sql.materialized_player_hands) sem varrer hand_players
+    ("idx_hand_players_player", "CREATE INDEX IF NOT EXISTS idx_hand_players_player ON hand_players (player_id, hand_db_id);"),
+    ("idx_hands_pfa", "CREATE INDEX IF NOT EXISTS idx_hands_pfa ON hands (preflop_aggressor_id);"),
+    ("idx_hands_history_id", "CREATE INDEX IF NOT EXISTS idx_hands_history_id ON hands (hand_history_id);"), # Muito importante
+    ("idx_players_name", "CREATE INDEX IF NOT EXISTS idx_players_name ON players (player_name);"),
+]
+
+# PRAGMAs de throughput usados pela carga em massa (main_processor.py --bulk-load).
+# journal_mode MEMORY + synchronous OFF: um crash no meio da carga pode corromper o
+# arquivo, por isso o modo é indicado só para reconstruções completas.
+BULK_LOAD_PRAGMAS = [
+    ("journal_mode", "MEMORY"),
+    ("synchronous", "OFF"),
+    ("cache_size", -262144), # 256 MB
+    ("temp_store", "MEMORY"),
+]
+
+def create_secondary_indexes(conn):
+    cursor = conn.cursor()
+    for _, create_sql in SECONDARY_INDEXES:
+        cursor.execute(create_sql)
+
+def drop_secondary_indexes(conn):
+    cursor = conn.cursor()
+    for index_name, _ in SECONDARY_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+    conn.commit()
+
+def begin_bulk_load(conn):
+    """
+    Prepara a conexão para uma carga grande: aplica BULK_LOAD_PRAGMAS e remove os
+    índices secundários. Retorna os valores anteriores dos PRAGMAs, para end_bulk_load.
+    """
+    previous_pragmas = []
+    for pragma_name, value in BULK_LOAD_PRAGMAS:
+        previous_pragmas.append((pragma_name, conn.execute(f"PRAGMA {pragma_name}").fetchone()[0]))
+        conn.execute(f"PRAGMA {pragma_name} = {value}")
+    drop_secondary_indexes(conn)
+    return previous_pragmas
+
+def end_bulk_load(conn, previous_pragmas):
+    """Recria os índices secundários, roda ANALYZE e restaura os PRAGMAs anteriores."""
+    conn.commit()
+    create_secondary_indexes(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    for pragma_name, value in previous_pragmas:
+        conn.execute(f"PRAGMA {pragma_name} = {value}")
+
 def create_tables(conn):
     cursor = conn.cursor()
+    schema_version = cursor.execute("PRAGMA user_version").fetchone()[0]
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS players (
         player_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -54,13 +248,127 @@ def create_tables(conn):
         UNIQUE (hand_db_id, player_id)
     )
     """)
+    # Ordem de ação / IP / fold por street, calculados pelo parser (PokerHand.street_player_info).
+    # action_order segue a primeira ação voluntária na street; is_ip = último a agir entre
+    # os que não foldaram. Para IP/OOP entre dois jogadores compare os action_order.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS hand_street_players (
+        hand_db_id INTEGER NOT NULL,
+        street_code INTEGER NOT NULL,
+        player_id INTEGER NOT NULL,
+        action_order INTEGER NOT NULL,
+        is_ip INTEGER NOT NULL,
+        folded INTEGER NOT NULL,
+        PRIMARY KEY (hand_db_id, street_code, player_id),
+        FOREIGN KEY (hand_db_id) REFERENCES hands(hand_db_id) ON DELETE CASCADE,
+        FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+    # Fatos pós-flop por mão/street/jogador (ver hand_features.py). A chave começa por
+    # player_id para que as consultas de um jogador leiam um trecho contíguo da tabela.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS hand_features (
+        player_id INTEGER NOT NULL,
+        street_code INTEGER NOT NULL,
+        hand_db_id INTEGER NOT NULL,
+        cbet_opportunity INTEGER NOT NULL,
+        cbet_action INTEGER NOT NULL,
+        faced_cbet INTEGER NOT NULL,
+        donk_opportunity INTEGER NOT NULL,
+        donk_action INTEGER NOT NULL,
+        faced_donk INTEGER NOT NULL,
+        probe_opportunity INTEGER NOT NULL,
+        probe_action INTEGER NOT NULL,
+        faced_probe INTEGER NOT NULL,
+        check_raise_opportunity INTEGER NOT NULL,
+        check_raise_action INTEGER NOT NULL,
+        faced_check_raise INTEGER NOT NULL,
+        called_bet INTEGER NOT NULL,
+        folded INTEGER NOT NULL,
+        ip_vs_aggressor INTEGER,
+        faced_bet_player_id INTEGER,
+        faced_bet_pct INTEGER,
+        faced_size_group_code INTEGER,
+        faced_bet_action_code INTEGER,
+        line TEXT,
+        PRIMARY KEY (player_id, street_code, hand_db_id),
+        FOREIGN KEY (hand_db_id) REFERENCES hands(hand_db_id) ON DELETE CASCADE,
+        FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+    # Contadores de stats por jogador (ver stat_counters.py), somados a cada mão importada.
+    # Os stats de um jogador saem de uma leitura só do trecho dele na chave primária.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS player_stat_counters (
+        player_id INTEGER NOT NULL,
+        stat_key TEXT NOT NULL,
+        value INTEGER NOT NULL,
+        PRIMARY KEY (player_id, stat_key),
+        FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+    _create_code_tables(cursor)
+    if _table_columns(cursor, "actions") & {"street", "action_type"}:
+        migrate_actions_to_codes(conn) # Banco da versão 0 (nomes em TEXT)
+    _create_actions_table(cursor, "actions")
+    added_size_columns = _add_action_size_columns(cursor) # Bancos das versões 1 a 3
+    _create_actions_named_view(cursor)
+    # Índices secundários (ver SECONDARY_INDEXES)
+    create_secondary_indexes(conn)
+
+    # Controle da importação incremental: até onde (byte_offset) cada arquivo de log já foi lido
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_files (
+        path TEXT PRIMARY KEY,
+        inode INTEGER,
+        size INTEGER,
+        mtime REAL,
+        byte_offset INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    if schema_version < 2:
+        backfill_hand_street_players(conn)
+    if schema_version < 3:
+        backfill_hand_features(conn)
+    if schema_version < 4 or added_size_columns:
+        backfill_action_sizes(conn)
+    if schema_version < 5:
+        rebuild_player_stat_counters(conn)
+
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+def _table_columns(cursor, table_name):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})").fetchall()}
+
+def _create_code_tables(cursor):
+    """Tabelas de consulta código -> nome de streets e tipos de ação (poker_codes)."""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS streets (
+        street_code INTEGER PRIMARY KEY,
+        street_name TEXT UNIQUE NOT NULL
+    )
+    """)
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS actions (
+    CREATE TABLE IF NOT EXISTS action_types (
+        action_code INTEGER PRIMARY KEY,
+        action_name TEXT UNIQUE NOT NULL
+    )
+    """)
+    cursor.executemany("INSERT OR IGNORE INTO streets (street_code, street_name) VALUES (?, ?)", enumerate(STREET_NAMES))
+    cursor.executemany("INSERT OR IGNORE INTO action_types (action_code, action_name) VALUES (?, ?)", enumerate(ACTION_NAMES))
+
+def _create_actions_table(cursor, table_name):
+    # street_code / action_code: códigos de poker_codes (nomes em streets / action_types).
+    # Sem FOREIGN KEY para as tabelas de códigos: evita uma busca extra por ação inserida.
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
         action_id INTEGER PRIMARY KEY AUTOINCREMENT,
         hand_db_id INTEGER NOT NULL,
         player_id INTEGER,
-        street TEXT,
-        action_type TEXT NOT NULL,
+        street_code INTEGER,
+        action_code INTEGER NOT NULL,
         amount INTEGER,
         total_bet_amount INTEGER,
         action_sequence INTEGER NOT NULL,
@@ -68,31 +376,239 @@ def create_tables(conn):
         amount_to_call_for_player INTEGER,
         bet_faced_by_player_amount INTEGER,
         pot_when_bet_was_made INTEGER,
+        bet_pct INTEGER,
+        size_group_code INTEGER,
         FOREIGN KEY (hand_db_id) REFERENCES hands(hand_db_id) ON DELETE CASCADE,
         FOREIGN KEY (player_id) REFERENCES players(player_id) ON DELETE SET NULL
     )
     """)
-    # Índices (Exemplo, adicione mais conforme necessário)
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_actions_player_street_type ON actions (player_id, street, action_type);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_actions_hand_sequence ON actions (hand_db_id, action_sequence);")
-    # Índices adicionais para acelerar consultas complexas de Pré-Flop
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_actions_hand_player ON actions (hand_db_id, player_id);"
-    )
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_actions_hand_street_type ON actions (hand_db_id, street, action_type);"
-    )
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_hand_players_hand_player ON hand_players (hand_db_id, player_id);"
-    )
-    cursor.execute(
-        "CREATE INDEX IF NOT EXISTS idx_hand_players_hand_position ON hand_players (hand_db_id, position);"
-    )
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_hands_pfa ON hands (preflop_aggressor_id);")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_hands_history_id ON hands (hand_history_id);") # Muito importante
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_name ON players (player_name);")
 
+# Colunas de actions acrescentadas depois da versão 1 (ALTER TABLE em bancos antigos)
+_ACTION_SIZE_COLUMNS = (("bet_pct", "INTEGER"), ("size_group_code", "INTEGER"))
+
+def _add_action_size_columns(cursor):
+    """Acrescenta bet_pct / size_group_code a uma tabela actions antiga. Retorna True se alterou."""
+    existing_columns = _table_columns(cursor, "actions")
+    missing_columns = [(name, sql_type) for name, sql_type in _ACTION_SIZE_COLUMNS if name not in existing_columns]
+    for name, sql_type in missing_columns:
+        cursor.execute(f"ALTER TABLE actions ADD COLUMN {name} {sql_type}")
+    return bool(missing_columns)
+
+def action_bet_size(bet_faced_amount, pot_when_bet_was_made):
+    """
+    (bet_pct, size_group_code) gravados em actions: a aposta enfrentada em % inteiro do
+    pote e o grupo de tamanho de poker_codes. (None, None) sem aposta a pagar ou com pote 0.
+    """
+    if not bet_faced_amount or bet_faced_amount <= 0:
+        return None, None
+    bet_percentage = poker_codes.bet_percentage_of_pot(bet_faced_amount, pot_when_bet_was_made)
+    return bet_percentage, poker_codes.size_group_code(bet_percentage)
+
+def _create_actions_named_view(cursor):
+    # Mesmas colunas da tabela actions antiga (street e action_type por nome), para consultas manuais
+    cursor.execute("""
+    CREATE VIEW IF NOT EXISTS actions_named AS
+    SELECT a.action_id, a.hand_db_id, a.player_id,
+           s.street_name AS street, t.action_name AS action_type,
+           a.amount, a.total_bet_amount, a.action_sequence,
+           a.pot_total_before_action, a.amount_to_call_for_player,
+           a.bet_faced_by_player_amount, a.pot_when_bet_was_made
+    FROM actions a
+    LEFT JOIN streets s ON s.street_code = a.street_code
+    LEFT JOIN action_types t ON t.action_code = a.action_code
+    """)
+
+def migrate_actions_to_codes(conn, vacuum=True):
+    """
+    Migra a tabela actions da versão 0 (street / action_type em TEXT) para códigos
+    inteiros: copia as linhas para uma tabela nova, troca as tabelas e recria os
+    índices, tudo numa transação. Nomes desconhecidos recebem códigos novos em
+    streets / action_types. Com vacuum=True roda VACUUM no final para devolver ao
+    sistema o espaço liberado pelas strings.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    db_path = _database_path(conn)
+    size_before = os.path.getsize(db_path) if db_path else 0
+    print("Migrando tabela actions para códigos inteiros de street/tipo de ação...")
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    try:
+        _create_code_tables(cursor)
+        cursor.execute("INSERT OR IGNORE INTO streets (street_name) SELECT DISTINCT street FROM actions WHERE street IS NOT NULL")
+        cursor.execute("INSERT OR IGNORE INTO action_types (action_name) SELECT DISTINCT action_type FROM actions")
+        cursor.execute("DROP TABLE IF EXISTS actions_v1")
+        _create_actions_table(cursor, "actions_v1")
+        cursor.execute("""
+            INSERT INTO actions_v1 (action_id, hand_db_id, player_id, street_code, action_code, amount, total_bet_amount,
+                                    action_sequence, pot_total_before_action, amount_to_call_for_player,
+                                    bet_faced_by_player_amount, pot_when_bet_was_made)
+            SELECT a.action_id, a.hand_db_id, a.player_id, s.street_code, t.action_code, a.amount, a.total_bet_amount,
+                   a.action_sequence, a.pot_total_before_action, a.amount_to_call_for_player,
+                   a.bet_faced_by_player_amount, a.pot_when_bet_was_made
+            FROM actions a
+            LEFT JOIN streets s ON s.street_name = a.street
+            JOIN action_types t ON t.action_name = a.action_type
+            ORDER BY a.action_id
+        """)
+        migrated_count = cursor.rowcount
+        cursor.execute("DROP VIEW IF EXISTS actions_named")
+        cursor.execute("DROP TABLE actions") # Remove junto os índices antigos (street, action_type)
+        cursor.execute("ALTER TABLE actions_v1 RENAME TO actions")
+        _create_actions_named_view(cursor)
+        create_secondary_indexes(conn)
+        cursor.execute("PRAGMA user_version = 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if vacuum:
+        conn.execute("VACUUM")
+        checkpoint_wal(conn, "TRUNCATE") # Em WAL o arquivo principal só diminui depois do checkpoint
+    size_after = os.path.getsize(db_path) if db_path else 0
+    print(f"Migração concluída: {migrated_count} ações convertidas"
+          + (f", banco de {size_before / 1048576:.1f} MB para {size_after / 1048576:.1f} MB." if size_before else "."))
+
+def backfill_action_sizes(conn, batch_size=50000):
+    """
+    Preenche actions.bet_pct / size_group_code das ações gravadas antes das colunas
+    existirem. Percorre as ações que enfrentam aposta por faixas de action_id, com um
+    UPDATE em lote e commit por faixa, para não segurar o banco numa transação longa.
+    """
+    cursor = conn.cursor()
+    if not cursor.execute("SELECT 1 FROM actions LIMIT 1").fetchone():
+        return 0
+    last_action_id = 0
+    updated_count = 0
+    print("Calculando % do pote e grupo de tamanho das apostas enfrentadas (actions)...")
+    while True:
+        rows = cursor.execute("""
+            SELECT action_id, bet_faced_by_player_amount, pot_when_bet_was_made FROM actions
+            WHERE action_id > ? AND bet_faced_by_player_amount > 0 AND size_group_code IS NULL
+            ORDER BY action_id LIMIT ?
+        """, (last_action_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_action_id = rows[-1][0]
+        cursor.executemany("UPDATE actions SET bet_pct = ?, size_group_code = ? WHERE action_id = ?",
+                           [action_bet_size(bet_faced, pot_when_bet) + (action_id,)
+                            for action_id, bet_faced, pot_when_bet in rows])
+        conn.commit()
+        updated_count += len(rows)
+        print(f"  {updated_count} ações atualizadas...")
+    print(f"bet_pct / size_group_code preenchidos para {updated_count} ações.")
+    return updated_count
+
+def backfill_hand_street_players(conn, batch_size=5000):
+    """
+    Preenche hand_street_players para as mãos gravadas antes da tabela existir,
+    recalculando a ordem de ação / IP / fold a partir de actions (uma varredura
+    ordenada, com inserções em lotes). Mãos que já têm linhas são ignoradas.
+    """
+    cursor = conn.cursor()
+    if not cursor.execute("SELECT 1 FROM actions LIMIT 1").fetchone():
+        return 0
+    print("Calculando ordem de ação e IP/OOP por street das mãos existentes (hand_street_players)...")
+    done_hand_ids = {row[0] for row in cursor.execute("SELECT DISTINCT hand_db_id FROM hand_street_players")}
+    placeholders = ",".join("?" * len(POSTFLOP_STREET_CODES))
+    action_rows = conn.execute(f"""
+        SELECT hand_db_id, street_code, action_code, player_id FROM actions
+        WHERE street_code IN ({placeholders})
+        ORDER BY hand_db_id, action_sequence
+    """, POSTFLOP_STREET_CODES)
+    pending_rows = []
+    hands_count = 0
+    for hand_db_id, hand_actions in groupby(action_rows, key=lambda row: row[0]):
+        if hand_db_id in done_hand_ids:
+            continue
+        hands_count += 1
+        street_player_info = compute_street_player_info(row[1:] for row in hand_actions)
+        for street_code, street_info in street_player_info.items():
+            for player_id, info in street_info.items():
+                pending_rows.append((hand_db_id, street_code, player_id, info.action_order, info.is_ip, info.folded))
+        if len(pending_rows) >= batch_size:
+            cursor.executemany("INSERT OR IGNORE INTO hand_street_players VALUES (?, ?, ?, ?, ?, ?)", pending_rows)
+            pending_rows = []
+    cursor.executemany("INSERT OR IGNORE INTO hand_street_players VALUES (?, ?, ?, ?, ?, ?)", pending_rows)
     conn.commit()
+    print(f"hand_street_players preenchida para {hands_count} mãos.")
+    return hands_count
+
+_UPSERT_STAT_COUNTERS_SQL = """
+    INSERT INTO player_stat_counters (player_id, stat_key, value) VALUES (?, ?, ?)
+    ON CONFLICT (player_id, stat_key) DO UPDATE SET value = value + excluded.value
+"""
+
+def _hand_rows_reader(rows, key_index=0):
+    """
+    Para linhas ordenadas por hand_db_id (coluna key_index): retorna uma função que,
+    chamada com hand_db_ids crescentes, devolve a lista de linhas de cada mão.
+    """
+    groups = groupby(rows, key=lambda row: row[key_index])
+    current = next(groups, None)
+    def take(hand_db_id):
+        nonlocal current
+        while current is not None and current[0] < hand_db_id:
+            current = next(groups, None)
+        if current is None or current[0] != hand_db_id:
+            return []
+        hand_rows = list(current[1])
+        current = next(groups, None)
+        return hand_rows
+    return take
+
+def rebuild_player_stat_counters(conn):
+    """
+    Reconstrói player_stat_counters do zero a partir de hand_players, actions,
+    hand_street_players e hand_features (uma varredura ordenada por hand_db_id de
+    cada tabela). Antes de substituir a tabela informa quantos jogadores tinham
+    contadores diferentes dos mantidos pela importação, o que serve de verificação.
+    Retorna esse número.
+    """
+    cursor = conn.cursor()
+    if not cursor.execute("SELECT 1 FROM hands LIMIT 1").fetchone():
+        return 0
+    print("Reconstruindo contadores de stats por jogador (player_stat_counters)...")
+    take_hand_players = _hand_rows_reader(conn.execute("""
+        SELECT hand_db_id, player_id, seat_num, initial_chips, position, hole_cards
+        FROM hand_players ORDER BY hand_db_id, hand_player_id"""))
+    take_actions = _hand_rows_reader(conn.execute("""
+        SELECT hand_db_id, player_id, street_code, action_code, amount, total_bet_amount, action_sequence,
+               pot_total_before_action, amount_to_call_for_player, bet_faced_by_player_amount, pot_when_bet_was_made,
+               bet_pct, size_group_code
+        FROM actions ORDER BY hand_db_id, action_sequence"""))
+    take_street_players = _hand_rows_reader(conn.execute(
+        "SELECT * FROM hand_street_players ORDER BY hand_db_id, street_code, player_id"))
+    take_hand_features = _hand_rows_reader(conn.execute(
+        "SELECT * FROM hand_features ORDER BY hand_db_id"), key_index=2)
+    counters_by_player = defaultdict(Counter)
+    hands_count = 0
+    for hand_db_id, preflop_aggressor_id, big_blind_amount in conn.execute(
+            "SELECT hand_db_id, preflop_aggressor_id, big_blind_amount FROM hands ORDER BY hand_db_id"):
+        hands_count += 1
+        hand_counters = hand_stat_counters(preflop_aggressor_id, big_blind_amount,
+                                           take_hand_players(hand_db_id), take_actions(hand_db_id),
+                                           take_street_players(hand_db_id), take_hand_features(hand_db_id))
+        for player_id, counter in hand_counters.items():
+            counters_by_player[player_id].update(counter)
+
+    rebuilt_rows = counter_rows(counters_by_player)
+    previous_by_player = defaultdict(dict)
+    for player_id, key, value in cursor.execute("SELECT player_id, stat_key, value FROM player_stat_counters"):
+        if value:
+            previous_by_player[player_id][key] = value
+    rebuilt_by_player = defaultdict(dict)
+    for player_id, key, value in rebuilt_rows:
+        rebuilt_by_player[player_id][key] = value
+    changed_players = sum(1 for player_id in set(previous_by_player) | set(rebuilt_by_player)
+                          if previous_by_player.get(player_id) != rebuilt_by_player.get(player_id))
+
+    cursor.execute("DELETE FROM player_stat_counters")
+    cursor.executemany("INSERT INTO player_stat_counters (player_id, stat_key, value) VALUES (?, ?, ?)", rebuilt_rows)
+    conn.commit()
+    print(f"player_stat_counters reconstruída: {hands_count} mãos, {len(rebuilt_by_player)} jogadores"
+          + (f", {changed_players} com contadores diferentes dos anteriores." if previous_by_player else "."))
+    return changed_players
 
 def get_or_create_player_id(conn, player_name):
     if not player_name:
@@ -112,81 +628,252 @@ def get_or_create_player_id(conn, player_name):
             row = cursor.fetchone()
             return row['player_id'] if row else None
 
-def save_hand_to_db(conn, hand_obj): # Recebe um objeto PokerHand
+def _hand_player_names(hand_obj):
+    """Nomes de jogadores referenciados por uma mão (herói, assentos, ações e agressores), sem repetição."""
+    names = []
+    if hand_obj.hero_name: names.append(hand_obj.hero_name)
+    for seat_info in hand_obj.player_seat_info.values():
+        if seat_info.name: names.append(seat_info.name)
+    for action in hand_obj.actions:
+        if action.player: names.append(action.player)
+    for aggressor in (hand_obj.preflop_aggressor, hand_obj.flop_aggressor, hand_obj.turn_aggressor, hand_obj.river_aggressor):
+        if aggressor: names.append(aggressor)
+    return names
+
+def _select_player_ids(cursor, player_names, chunk_size=500):
+    name_to_id = {}
+    for start in range(0, len(player_names), chunk_size):
+        chunk = player_names[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT player_name, player_id FROM players WHERE player_name IN ({placeholders})", chunk)
+        name_to_id.update((row[0], row[1]) for row in cursor.fetchall())
+    return name_to_id
+
+def get_or_create_player_ids(conn, player_names):
+    """
+    Versão em lote de get_or_create_player_id: consulta primeiro o cache LRU do
+    processo; só os nomes ausentes vão ao banco (SELECTs em blocos) e os que
+    faltam são inseridos com um único executemany. Retorna {player_name: player_id}.
+    """
+    player_names = list(dict.fromkeys(filter(None, player_names)))
+    if not player_names:
+        return {}
+    cache = _player_id_cache_for(conn)
+    name_to_id = {}
+    if cache is not None:
+        for name in player_names:
+            player_id = cache.get(name)
+            if player_id is not None:
+                cache.move_to_end(name)
+                name_to_id[name] = player_id
+        player_names = [name for name in player_names if name not in name_to_id]
+        if not player_names: # Caso comum em regime: nenhum acesso ao banco
+            return name_to_id
+
     cursor = conn.cursor()
-    player_name_to_id_map = {}
-    all_player_names_in_hand = set()
+    found = _select_player_ids(cursor, player_names)
+    missing = [name for name in player_names if name not in found]
+    if missing:
+        cursor.executemany("INSERT OR IGNORE INTO players (player_name) VALUES (?)", [(name,) for name in missing])
+        # Commit será feito em lote pelo chamador
+        found.update(_select_player_ids(cursor, missing))
+    if cache is not None:
+        _remember_player_ids(cache, found)
+    name_to_id.update(found)
+    return name_to_id
 
-    if hand_obj.hero_name: all_player_names_in_hand.add(hand_obj.hero_name)
-    for seat_info in hand_obj.player_seat_info.values():
-        if seat_info['name']: all_player_names_in_hand.add(seat_info['name'])
-    for action_data in hand_obj.actions:
-        if action_data.get('player'): all_player_names_in_hand.add(action_data['player'])
-    
-    if hand_obj.preflop_aggressor: all_player_names_in_hand.add(hand_obj.preflop_aggressor)
-    if hand_obj.flop_aggressor: all_player_names_in_hand.add(hand_obj.flop_aggressor)
-    if hand_obj.turn_aggressor: all_player_names_in_hand.add(hand_obj.turn_aggressor)
-    if hand_obj.river_aggressor: all_player_names_in_hand.add(hand_obj.river_aggressor)
-
-    for name in filter(None, all_player_names_in_hand):
-        player_id = get_or_create_player_id(conn, name)
-        if player_id is not None: # Adicionado para evitar erro se get_or_create_player_id falhar
-            player_name_to_id_map[name] = player_id
-
-
-    hero_db_id = player_name_to_id_map.get(hand_obj.hero_name)
-    pfa_id = player_name_to_id_map.get(hand_obj.preflop_aggressor)
-    fa_id = player_name_to_id_map.get(hand_obj.flop_aggressor)
-    ta_id = player_name_to_id_map.get(hand_obj.turn_aggressor)
-    ra_id = player_name_to_id_map.get(hand_obj.river_aggressor)
-    final_pot = hand_obj.current_pot_total
+def _hand_feature_rows(hand_db_id, hand_features, get_player_id):
+    """Linhas de hand_features (na ordem das colunas) a partir de compute_hand_features."""
+    faced_bet_player_idx = HAND_FEATURE_FIELDS.index('faced_bet_player')
+    rows = []
+    for street_code, street_features in hand_features.items():
+        for player, features in street_features.items():
+            player_id = get_player_id(player)
+            if player_id is None:
+                continue
+            row = [player_id, street_code, hand_db_id]
+            row.extend(features)
+            row[3 + faced_bet_player_idx] = get_player_id(features.faced_bet_player)
+            rows.append(row)
+    return rows
 
-    try:
-        cursor.execute("""
-            INSERT INTO hands (hand_history_id, tournament_id, datetime_str, table_id, button_seat_num, hero_id, big_blind_amount, board_cards,
-                             preflop_aggressor_id, flop_aggressor_id, turn_aggressor_id, river_aggressor_id, pot_total_at_showdown)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (hand_obj.hand_id, hand_obj.tournament_id, hand_obj.datetime_str, hand_obj.table_id, hand_obj.button_seat_num, hero_db_id,
-              hand_obj.big_blind_amount, ' '.join(hand_obj.board_cards) if hand_obj.board_cards else None,
-              pfa_id, fa_id, ta_id, ra_id, final_pot))
-        hand_db_id = cursor.lastrowid
-    except sqlite3.IntegrityError:
-        # print(f"Mão {hand_obj.hand_id} já existe no DB. Pulando inserção detalhada.")
-        return None 
-
-    for seat_num, seat_info in hand_obj.player_seat_info.items():
-        if seat_info['name'] and seat_info['name'] in player_name_to_id_map : # Verifica se o ID foi obtido
-            player_db_id = player_name_to_id_map[seat_info['name']]
-            position = hand_obj.player_positions.get(seat_info['name'])
-            cards = hand_obj.hole_cards.get(seat_info['name'])
-            try:
-                cursor.execute("""
-                    INSERT INTO hand_players (hand_db_id, player_id, seat_num, initial_chips, position, hole_cards)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (hand_db_id, player_db_id, seat_num, seat_info['chips'], position, cards))
-            except sqlite3.IntegrityError:
-                pass 
-
-    for i, action_data in enumerate(hand_obj.actions):
-        player_name_for_action = action_data.get('player')
-        player_db_id_for_action = player_name_to_id_map.get(player_name_for_action) if player_name_for_action else None
-        amount_val = action_data.get('amount')
-        total_bet_val = action_data.get('total_bet')
-        
-        pot_total_before = action_data.get('pot_total_before_action', 0)
-        amount_to_call = action_data.get('amount_to_call_for_player', 0)
-        bet_faced = action_data.get('bet_faced_by_player_amount', 0)
-        pot_when_bet = action_data.get('pot_when_bet_was_made', 0)
+_INSERT_HAND_FEATURES_SQL = (f"INSERT OR IGNORE INTO hand_features VALUES "
+                             f"({', '.join('?' * (3 + len(HAND_FEATURE_FIELDS)))})")
 
-        cursor.execute("""
-            INSERT INTO actions (hand_db_id, player_id, street, action_type, amount, total_bet_amount, action_sequence,
-                                 pot_total_before_action, amount_to_call_for_player, bet_faced_by_player_amount, pot_when_bet_was_made)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (hand_db_id, player_db_id_for_action, action_data.get('street'), action_data.get('action'),
-              amount_val, total_bet_val, i,
-              pot_total_before, amount_to_call, bet_faced, pot_when_bet))
-    
-    return hand_db_id # Retorna o ID da mão inserida
+def backfill_hand_features(conn, batch_size=5000):
+    """
+    Preenche hand_features para as mãos gravadas antes da tabela existir (mesma
+    estratégia de backfill_hand_street_players: uma varredura ordenada de actions,
+    inserções em lotes). Mãos que já têm linhas são ignoradas.
+    """
+    cursor = conn.cursor()
+    if not cursor.execute("SELECT 1 FROM actions LIMIT 1").fetchone():
+        return 0
+    print("Calculando cbet/donk/probe/check-raise e linhas das mãos existentes (hand_features)...")
+    done_hand_ids = {row[0] for row in cursor.execute("SELECT DISTINCT hand_db_id FROM hand_features")}
+    placeholders = ",".join("?" * len(POSTFLOP_STREET_CODES))
+    action_rows = conn.execute(f"""
+        SELECT a.hand_db_id, h.preflop_aggressor_id, h.flop_aggressor_id, h.turn_aggressor_id,
+               a.street_code, a.action_code, a.player_id, a.bet_faced_by_player_amount, a.pot_when_bet_was_made
+        FROM actions a JOIN hands h ON h.hand_db_id = a.hand_db_id
+        WHERE a.street_code IN ({placeholders})
+        ORDER BY a.hand_db_id, a.action_sequence
+    """, POSTFLOP_STREET_CODES)
+    same_id = lambda player_id: player_id
+    pending_rows = []
+    hands_count = 0
+    for hand_db_id, hand_actions in groupby(action_rows, key=lambda row: row[0]):
+        if hand_db_id in done_hand_ids:
+            continue
+        hands_count += 1
+        hand_actions = list(hand_actions)
+        hand_features = compute_hand_features((row[4:] for row in hand_actions), hand_actions[0][1:4])
+        pending_rows.extend(_hand_feature_rows(hand_db_id, hand_features, same_id))
+        if len(pending_rows) >= batch_size:
+            cursor.executemany(_INSERT_HAND_FEATURES_SQL, pending_rows)
+            pending_rows = []
+    cursor.executemany(_INSERT_HAND_FEATURES_SQL, pending_rows)
+    conn.commit()
+    print(f"hand_features preenchida para {hands_count} mãos.")
+    return hands_count
+
+def save_hands_to_db(conn, hand_objs): # Recebe uma lista de objetos PokerHand
+    """
+    Insere um lote de mãos parseadas: resolve todos os jogadores de uma vez, grava cada
+    mão em hands e as linhas filhas (hand_players, actions, ...) com executemany.
+    Mãos sem ID, já existentes no DB (inclusive gravadas por outra conexão durante o
+    lote) ou repetidas no lote são ignoradas.
+    Retorna {hand_history_id: hand_db_id} apenas das mãos inseridas.
+    O commit fica a cargo do chamador.
+    """
+    existing_ids = get_existing_hand_ids(conn, [hand_obj.hand_id for hand_obj in hand_objs])
+    new_hands = []
+    for hand_obj in hand_objs:
+        if hand_obj.hand_id and hand_obj.hand_id not in existing_ids:
+            existing_ids.add(hand_obj.hand_id)
+            new_hands.append(hand_obj)
+    if not new_hands:
+        return {}
+
+    all_player_names = []
+    for hand_obj in new_hands:
+        all_player_names.extend(_hand_player_names(hand_obj))
+    player_name_to_id_map = get_or_create_player_ids(conn, all_player_names)
+    get_player_id = player_name_to_id_map.get
+
+    cursor = conn.cursor()
+    # Um INSERT por mão (sem OR IGNORE): as linhas filhas só são geradas para as mãos que este
+    # INSERT gravou. Se outro processo (ingest_watcher e main_processor juntos) gravou a mesma mão
+    # depois de get_existing_hand_ids, o INSERT falha e a mão é pulada, como no save_hand_to_db original.
+    hand_id_to_db_id = {}
+    for hand_obj in new_hands:
+        try:
+            cursor.execute("""
+                INSERT INTO hands (hand_history_id, tournament_id, datetime_str, table_id, button_seat_num, hero_id, big_blind_amount, board_cards,
+                                 preflop_aggressor_id, flop_aggressor_id, turn_aggressor_id, river_aggressor_id, pot_total_at_showdown)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (hand_obj.hand_id, hand_obj.tournament_id, hand_obj.datetime_str, hand_obj.table_id, hand_obj.button_seat_num,
+                  get_player_id(hand_obj.hero_name), hand_obj.big_blind_amount,
+                  ' '.join(hand_obj.board_cards) if hand_obj.board_cards else None,
+                  get_player_id(hand_obj.preflop_aggressor), get_player_id(hand_obj.flop_aggressor),
+                  get_player_id(hand_obj.turn_aggressor), get_player_id(hand_obj.river_aggressor),
+                  hand_obj.current_pot_total))
+        except sqlite3.IntegrityError:
+            continue # Mão já existe no DB (gravada por outra conexão)
+        hand_id_to_db_id[hand_obj.hand_id] = cursor.lastrowid
+
+    hand_player_rows = []
+    action_rows = []
+    street_player_rows = []
+    hand_feature_rows = []
+    counters_by_player = defaultdict(Counter)
+    for hand_obj in new_hands:
+        hand_db_id = hand_id_to_db_id.get(hand_obj.hand_id)
+        if hand_db_id is None:
+            continue
+        row_starts = (len(hand_player_rows), len(action_rows), len(street_player_rows), len(hand_feature_rows))
+        for seat_num, seat_info in hand_obj.player_seat_info.items():
+            player_db_id = get_player_id(seat_info.name) if seat_info.name else None
+            if player_db_id is not None: # Verifica se o ID foi obtido
+                hand_player_rows.append((hand_db_id, player_db_id, seat_num, seat_info.chips,
+                                         hand_obj.player_positions.get(seat_info.name),
+                                         hand_obj.hole_cards.get(seat_info.name)))
+        for i, action in enumerate(hand_obj.actions): # HandAction (hand_parser)
+            action_rows.append((hand_db_id, get_player_id(action.player) if action.player else None,
+                                action.street_code, action.action_code,
+                                action.amount, action.total_bet, i,
+                                action.pot_total_before_action, action.amount_to_call_for_player,
+                                action.bet_faced_by_player_amount, action.pot_when_bet_was_made)
+                               + action_bet_size(action.bet_faced_by_player_amount, action.pot_when_bet_was_made))
+        for street_code, street_info in hand_obj.street_player_info.items():
+            for player_name, info in street_info.items():
+                player_db_id = get_player_id(player_name)
+                if player_db_id is not None:
+                    street_player_rows.append((hand_db_id, street_code, player_db_id,
+                                               info.action_order, info.is_ip, info.folded))
+        hand_features = compute_hand_features(
+            ((action.street_code, action.action_code, action.player, action.bet_faced_by_player_amount, action.pot_when_bet_was_made)
+             for action in hand_obj.actions),
+            (hand_obj.preflop_aggressor, hand_obj.flop_aggressor, hand_obj.turn_aggressor))
+        hand_feature_rows.extend(_hand_feature_rows(hand_db_id, hand_features, get_player_id))
+        # Contribuição da mão para player_stat_counters, a partir das mesmas linhas gravadas acima
+        hand_counters = hand_stat_counters(get_player_id(hand_obj.preflop_aggressor), hand_obj.big_blind_amount,
+                                           hand_player_rows[row_starts[0]:], action_rows[row_starts[1]:],
+                                           street_player_rows[row_starts[2]:], hand_feature_rows[row_starts[3]:])
+        for player_id, counter in hand_counters.items():
+            counters_by_player[player_id].update(counter)
+
+    # OR IGNORE: jogador repetido na mesma mão viola UNIQUE (hand_db_id, player_id); mantém o primeiro assento
+    cursor.executemany("""
+        INSERT OR IGNORE INTO hand_players (hand_db_id, player_id, seat_num, initial_chips, position, hole_cards)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, hand_player_rows)
+    cursor.executemany("""
+        INSERT INTO actions (hand_db_id, player_id, street_code, action_code, amount, total_bet_amount, action_sequence,
+                             pot_total_before_action, amount_to_call_for_player, bet_faced_by_player_amount, pot_when_bet_was_made,
+                             bet_pct, size_group_code)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, action_rows)
+    cursor.executemany("""
+        INSERT OR IGNORE INTO hand_street_players (hand_db_id, street_code, player_id, action_order, is_ip, folded)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, street_player_rows)
+    cursor.executemany(_INSERT_HAND_FEATURES_SQL, hand_feature_rows)
+    cursor.executemany(_UPSERT_STAT_COUNTERS_SQL, counter_rows(counters_by_player))
+
+    return hand_id_to_db_id
+
+def save_hand_to_db(conn, hand_obj): # Recebe um objeto PokerHand
+    """Insere uma única mão. Retorna o hand_db_id inserido ou None se a mão já existia."""
+    return save_hands_to_db(conn, [hand_obj]).get(hand_obj.hand_id)
+
+def get_existing_hand_ids(conn, hand_history_ids, chunk_size=500):
+    """
+    Retorna o subconjunto de hand_history_ids que já está na tabela hands.
+    Consulta em blocos de IN (...) (limitados a chunk_size parâmetros) em vez de
+    um SELECT por mão.
+    """
+    ids = list(dict.fromkeys(filter(None, hand_history_ids)))
+    existing = set()
+    cursor = conn.cursor()
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f"SELECT hand_history_id FROM hands WHERE hand_history_id IN ({placeholders})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+def get_ingest_file_state(conn, path):
+    cursor = conn.cursor()
+    cursor.execute("SELECT path, inode, size, mtime, byte_offset FROM ingest_files WHERE path = ?", (path,))
+    return cursor.fetchone()
+
+def save_ingest_file_state(conn, path, inode, size, mtime, byte_offset):
+    # Commit será feito pelo chamador, junto com as mãos lidas até byte_offset
+    conn.execute("""
+        INSERT OR REPLACE INTO ingest_files (path, inode, size, mtime, byte_offset)
+        VALUES (?, ?, ?, ?, ?)
+    """, (path, inode, size, mtime, byte_offset))
 
 def check_hand_exists(conn, hand_history_id):
     cursor = conn.cursor()
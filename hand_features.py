@@ -0,0 +1,149 @@
+# hand_features.py
+"""
+Fatos pós-flop por mão e por jogador (tabela hand_features do db_manager),
+calculados uma única vez na importação em vez de serem reconstruídos pelos
+stats_calculator_* com subconsultas NOT EXISTS sobre actions a cada jogador.
+
+Uma linha por (street, jogador) para cada jogador com ação voluntária no Flop,
+Turn ou River. "Agressor" da street é o agressor da street anterior
+(PFA no flop, FA no turn, TA no river):
+  - cbet_opportunity / cbet_action: o agressor age (bet ou check) sem bet/raise
+    antes dele / essa primeira ação é um bet.
+  - faced_cbet: outro jogador age depois do cbet do agressor, enfrentando aposta.
+  - donk_* / probe_*: jogador que não é o agressor aposta antes dele agir; é probe
+    quando a street anterior foi checada (o agressor é então o da street anterior a
+    ela, como o hand_parser registra). faced_donk / faced_probe: o agressor enfrenta
+    essa aposta.
+  - check_raise_opportunity / check_raise_action: jogador deu check e volta a agir
+    enfrentando aposta / com raise. faced_check_raise: quem apostou enfrenta o check-raise.
+  - called_bet / folded: pagou alguma aposta / foldou na street.
+  - ip_vs_aggressor: jogador age depois do agressor na street (None se é o próprio ou
+    se o agressor não agiu).
+  - faced_bet_*: primeira aposta enfrentada na street (quem apostou, % do pote, grupo
+    de tamanho de poker_codes) e a reação do jogador a ela.
+  - line: linha do jogador até a street, uma letra por street a partir do flop com a
+    primeira ação sem aposta a pagar: 'B' (bet), 'X' (check) ou '-' (só enfrentou
+    aposta). No river: 'BBB', 'BXB', 'XBB', 'XXB', ...
+"""
+from collections import namedtuple
+
+import poker_codes
+from poker_codes import ACTION_FOLDS, ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES
+from hand_parser import POSTFLOP_STREET_CODES
+
+HAND_FEATURE_FIELDS = (
+    'cbet_opportunity', 'cbet_action', 'faced_cbet',
+    'donk_opportunity', 'donk_action', 'faced_donk',
+    'probe_opportunity', 'probe_action', 'faced_probe',
+    'check_raise_opportunity', 'check_raise_action', 'faced_check_raise',
+    'called_bet', 'folded', 'ip_vs_aggressor',
+    'faced_bet_player', 'faced_bet_pct', 'faced_size_group_code', 'faced_bet_action_code',
+    'line',
+)
+HandFeatures = namedtuple('HandFeatures', HAND_FEATURE_FIELDS)
+
+_STREET_ACTION_CODES = frozenset((ACTION_FOLDS, ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES))
+_LINE_LETTERS = {ACTION_BETS: 'B', ACTION_CHECKS: 'X'}
+
+
+def _street_features(street_actions, street_index, aggressor, lead_is_donk, player_lines):
+    """Calcula os HandFeatures de uma street. Retorna {jogador: HandFeatures} na ordem de ação."""
+    players = {} # jogador -> dict de campos, na ordem da primeira ação
+    first_unopened_action = {} # jogador -> primeira ação sem aposta a pagar (bet/check)
+    checked_players = set()
+    bet_made = False # Já houve bet/raise na street
+    last_bettor = None
+    cbet_made = False
+    lead_bettor = None # Jogador que apostou antes do agressor agir (donk/probe)
+    check_raised_bettor = None # Apostador que levou check-raise e ainda não reagiu
+
+    for action_code, player, bet_faced, pot_when_bet in street_actions:
+        features = players.get(player)
+        if features is None:
+            features = players[player] = dict.fromkeys(HAND_FEATURE_FIELDS, 0)
+            features.update(ip_vs_aggressor=None, faced_bet_player=None, faced_bet_pct=None,
+                            faced_size_group_code=None, faced_bet_action_code=None)
+            if player != aggressor and aggressor is not None and aggressor not in players and not bet_made \
+                    and action_code in (ACTION_BETS, ACTION_CHECKS):
+                features['donk_opportunity' if lead_is_donk else 'probe_opportunity'] = 1
+
+        if action_code in (ACTION_BETS, ACTION_CHECKS):
+            first_unopened_action.setdefault(player, action_code)
+            if player == aggressor and not bet_made:
+                features['cbet_opportunity'] = 1
+        if bet_faced and bet_faced > 0:
+            if features['faced_bet_action_code'] is None:
+                bet_percentage = poker_codes.bet_percentage_of_pot(bet_faced, pot_when_bet)
+                features.update(faced_bet_player=last_bettor, faced_bet_pct=bet_percentage,
+                                faced_size_group_code=poker_codes.size_group_code(bet_percentage),
+                                faced_bet_action_code=action_code)
+                if cbet_made and player != aggressor:
+                    features['faced_cbet'] = 1
+                if lead_bettor is not None and player == aggressor:
+                    features['faced_donk' if lead_is_donk else 'faced_probe'] = 1
+            if player in checked_players and not features['check_raise_opportunity']:
+                features['check_raise_opportunity'] = 1
+                features['check_raise_action'] = int(action_code == ACTION_RAISES)
+        if player == check_raised_bettor:
+            features['faced_check_raise'] = 1
+            check_raised_bettor = None
+
+        if action_code == ACTION_CHECKS:
+            checked_players.add(player)
+        elif action_code == ACTION_CALLS:
+            if bet_faced and bet_faced > 0:
+                features['called_bet'] = 1
+        elif action_code == ACTION_FOLDS:
+            features['folded'] = 1
+        elif action_code in (ACTION_BETS, ACTION_RAISES):
+            if action_code == ACTION_BETS:
+                if player == aggressor and not bet_made:
+                    cbet_made = True
+                    features['cbet_action'] = int(first_unopened_action.get(player) == ACTION_BETS)
+                if features['donk_opportunity'] or features['probe_opportunity']:
+                    lead_bettor = player
+                    features['donk_action' if lead_is_donk else 'probe_action'] = 1
+            elif player in checked_players and last_bettor is not None and last_bettor != player:
+                check_raised_bettor = last_bettor
+            bet_made = True
+            last_bettor = player
+
+    aggressor_order = list(players).index(aggressor) if aggressor in players else None
+    street_features = {}
+    for order, (player, features) in enumerate(players.items()):
+        if aggressor_order is not None and player != aggressor:
+            features['ip_vs_aggressor'] = int(order > aggressor_order)
+        # Streets anteriores sem ação do jogador entram como '-'
+        street_line = player_lines.get(player, '').ljust(street_index, '-') + _LINE_LETTERS.get(first_unopened_action.get(player), '-')
+        player_lines[player] = features['line'] = street_line
+        street_features[player] = HandFeatures(**features)
+    return street_features
+
+
+def compute_hand_features(hand_actions, aggressors):
+    """
+    Calcula os HandFeatures do Flop, Turn e River de uma mão.
+    hand_actions: tuplas (street_code, action_code, jogador, bet_faced_by_player_amount,
+    pot_when_bet_was_made) na ordem da mão; o jogador pode ser o nome ou o player_id do
+    banco, desde que aggressors (PFA, FA, TA) use a mesma forma.
+    Retorna {street_code: {jogador: HandFeatures}} (só streets com ações).
+    """
+    actions_by_street = {street_code: [] for street_code in POSTFLOP_STREET_CODES}
+    for street_code, action_code, player, bet_faced, pot_when_bet in hand_actions:
+        street_actions = actions_by_street.get(street_code)
+        if street_actions is not None and player is not None and action_code in _STREET_ACTION_CODES:
+            street_actions.append((action_code, player, bet_faced, pot_when_bet))
+
+    hand_features = {}
+    player_lines = {}
+    for street_index, street_code in enumerate(POSTFLOP_STREET_CODES):
+        street_actions = actions_by_street[street_code]
+        if not street_actions:
+            break
+        # O agressor passa de uma street para a seguinte quando ninguém aposta (flop checado:
+        # FA = PFA). Aposta antes dele agir é donk; depois de uma street checada, é probe.
+        aggressor = aggressors[street_index]
+        lead_is_donk = street_index == 0 or any(action[0] in (ACTION_BETS, ACTION_RAISES)
+                                                for action in actions_by_street[POSTFLOP_STREET_CODES[street_index - 1]])
+        hand_features[street_code] = _street_features(street_actions, street_index, aggressor, lead_is_donk, player_lines)
+    return hand_features
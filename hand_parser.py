@@ -1,6 +1,10 @@
 # hand_parser.py
 import re
-from collections import defaultdict
+import sys
+from collections import defaultdict, namedtuple
+
+import poker_codes
+from poker_codes import STREET_CODES, STREET_NAMES, ACTION_CODES, ACTION_NAMES
 
 # Regex (copiadas do poker_parser.py original)
 RE_HAND_HEADER = re.compile(
@@ -28,6 +32,101 @@ RE_DOESNT_SHOW = re.compile(r"^(.*?): doesn't show hand")
 RE_MUCKS_HAND = re.compile(r"^(.*?): mucks hand")
 RE_BOARD_CARDS = re.compile(r"Board \[(.*?)\]")
 
+# --- Classificador de linhas de ação ---
+# Em vez de testar até 15 regex em cascata por linha, localiza o separador "<nome>: "
+# e despacha pela primeira palavra do restante da linha (tabela _ACTION_LINE_HANDLERS).
+# Cada linha é analisada uma única vez e produz o mesmo resultado da cascata RE_ANTE..RE_MUCKS_HAND.
+
+def _leading_int(text):
+    """Retorna (valor, resto) para os dígitos no início de text, ou (None, text)."""
+    end = 0
+    while end < len(text) and text[end].isdigit():
+        end += 1
+    if not end:
+        return None, text
+    return int(text[:end]), text[end:]
+
+def _parse_posts(rest):
+    for prefix, action_type in (("posts the ante ", 'posts_ante'), ("posts small blind ", 'posts_sb'), ("posts big blind ", 'posts_bb')):
+        if rest.startswith(prefix):
+            amount, _ = _leading_int(rest[len(prefix):])
+            return (action_type, amount, None, None, None) if amount is not None else None
+    return None
+
+def _parse_amount_action(action_type, prefix):
+    def _parse(rest):
+        if not rest.startswith(prefix): return None
+        amount, _ = _leading_int(rest[len(prefix):])
+        return (action_type, amount, None, None, None) if amount is not None else None
+    return _parse
+
+def _parse_raises(rest):
+    if not rest.startswith("raises "): return None
+    amount, tail = _leading_int(rest[7:])
+    if amount is None or not tail.startswith(" to "): return None
+    total_bet, _ = _leading_int(tail[4:])
+    return ('raises', amount, total_bet, None, None) if total_bet is not None else None
+
+def _parse_collected(rest):
+    if not rest.startswith("collected "): return None
+    amount, tail = _leading_int(rest[10:])
+    return ('collected_pot', amount, None, None, None) if amount is not None and tail.startswith(" from pot") else None
+
+def _parse_shows(rest):
+    if not rest.startswith("shows ["): return None
+    cards_end = rest.find("]", 7)
+    if cards_end == -1: return None
+    cards_shown, tail = rest[7:cards_end], rest[cards_end + 1:]
+    description_shown = None
+    if tail.startswith(" ("):
+        desc_end = tail.find(")", 2)
+        if desc_end != -1:
+            description_shown = tail[2:desc_end]
+    return ('shows_hand', None, None, cards_shown, description_shown)
+
+def _parse_fixed(action_type, prefix):
+    def _parse(rest):
+        return (action_type, None, None, None, None) if rest.startswith(prefix) else None
+    return _parse
+
+_ACTION_LINE_HANDLERS = {
+    "posts": _parse_posts,
+    "folds": _parse_fixed('folds', "folds"),
+    "checks": _parse_fixed('checks', "checks"),
+    "calls": _parse_amount_action('calls', "calls "),
+    "bets": _parse_amount_action('bets', "bets "),
+    "raises": _parse_raises,
+    "collected": _parse_collected,
+    "shows": _parse_shows,
+    "doesn't": _parse_fixed('doesnt_show_hand', "doesn't show hand"),
+    "mucks": _parse_fixed('mucks_hand', "mucks hand"),
+}
+
+def classify_action_line(line):
+    """
+    Classifica uma linha de ação do histórico.
+    Retorna (jogador, ação, amount, total_bet, cards, description) ou None se a linha não é uma ação.
+    """
+    if line.startswith("Uncalled bet ("):
+        amount, tail = _leading_int(line[14:])
+        if amount is not None and tail.startswith(") returned to "):
+            return (tail[14:], 'uncalled_bet_returned', amount, None, None, None)
+        return None
+    sep = line.find(": ")
+    while sep != -1:
+        rest = line[sep + 2:]
+        space = rest.find(" ")
+        handler = _ACTION_LINE_HANDLERS.get(rest if space == -1 else rest[:space])
+        if handler is None and rest.startswith(("folds", "checks")):
+            # Como nas regex originais, "folds"/"checks" valem mesmo colados a outro texto
+            handler = _ACTION_LINE_HANDLERS["folds" if rest[0] == "f" else "checks"]
+        if handler is not None:
+            parsed = handler(rest)
+            if parsed is not None:
+                return (line[:sep],) + parsed
+        sep = line.find(": ", sep + 1)
+    return None
+
 
 POSITION_NAMES_ORDERED = {
     2: [], 3: [], 4: ["UTG"], 5: ["UTG", "CO"], 6: ["UTG", "MP", "CO"],
@@ -115,16 +214,170 @@ def assign_player_positions(player_seat_info, button_seat_num):
     return player_positions
 
 
+class SeatInfo:
+    """
+    Assento de um jogador na mão. Usa __slots__ no lugar do dict
+    {'name', 'chips', 'bounty'}, mas continua aceitando seat_info['name'] e
+    seat_info.get('chips', 0).
+    """
+    __slots__ = ('name', 'chips', 'bounty')
+
+    def __init__(self, name=None, chips=0, bounty=None):
+        self.name = name
+        self.chips = chips
+        self.bounty = bounty
+
+    def __getitem__(self, key):
+        if key not in self.__slots__: raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__: raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __getstate__(self):
+        return (self.name, self.chips, self.bounty)
+
+    def __setstate__(self, state):
+        self.name, self.chips, self.bounty = state
+
+    def __repr__(self):
+        return f"SeatInfo(name={self.name!r}, chips={self.chips!r}, bounty={self.bounty!r})"
+
+
+# Campos de HandAction, na ordem da tupla
+HAND_ACTION_FIELDS = (
+    'street_code', 'action_code', 'player', 'amount', 'total_bet',
+    'pot_total_before_action', 'amount_to_call_for_player',
+    'bet_faced_by_player_amount', 'pot_when_bet_was_made',
+    'cards', 'description',
+)
+_HAND_ACTION_INDEX = {name: idx for idx, name in enumerate(HAND_ACTION_FIELDS)}
+_HAND_ACTION_STREET_IDX = _HAND_ACTION_INDEX['street_code']
+_HAND_ACTION_ACTION_IDX = _HAND_ACTION_INDEX['action_code']
+# Chaves do antigo dict de ação, na ordem em que eram expostas
+_HAND_ACTION_KEYS = ('street', 'player', 'action', 'amount', 'total_bet', 'description', 'cards',
+                     'pot_total_before_action', 'amount_to_call_for_player',
+                     'bet_faced_by_player_amount', 'pot_when_bet_was_made')
+
+
+class HandAction(tuple):
+    """
+    Registro imutável de uma ação (tupla com os campos de HAND_ACTION_FIELDS).
+    Street e tipo de ação ficam como códigos inteiros de poker_codes.
+    Para compatibilidade com o antigo dict de ação, aceita action['street'],
+    action.get('action') etc., devolvendo os nomes ('Flop', 'raises').
+    'hand_id', 'position' e 'hero' não são mais copiados em cada ação: use
+    hand.hand_id, hand.get_player_position(player) e hand.hero_name.
+    """
+    __slots__ = ()
+
+    street_code = property(lambda self: tuple.__getitem__(self, 0))
+    action_code = property(lambda self: tuple.__getitem__(self, 1))
+    player = property(lambda self: tuple.__getitem__(self, 2))
+    amount = property(lambda self: tuple.__getitem__(self, 3))
+    total_bet = property(lambda self: tuple.__getitem__(self, 4))
+    pot_total_before_action = property(lambda self: tuple.__getitem__(self, 5))
+    amount_to_call_for_player = property(lambda self: tuple.__getitem__(self, 6))
+    bet_faced_by_player_amount = property(lambda self: tuple.__getitem__(self, 7))
+    pot_when_bet_was_made = property(lambda self: tuple.__getitem__(self, 8))
+    cards = property(lambda self: tuple.__getitem__(self, 9))
+    description = property(lambda self: tuple.__getitem__(self, 10))
+
+    @property
+    def street(self): return STREET_NAMES[tuple.__getitem__(self, 0)]
+
+    @property
+    def action(self): return ACTION_NAMES[tuple.__getitem__(self, 1)]
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            if key == 'street': return STREET_NAMES[tuple.__getitem__(self, _HAND_ACTION_STREET_IDX)]
+            if key == 'action': return ACTION_NAMES[tuple.__getitem__(self, _HAND_ACTION_ACTION_IDX)]
+            idx = _HAND_ACTION_INDEX.get(key)
+            if idx is None: raise KeyError(key)
+            return tuple.__getitem__(self, idx)
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self): return _HAND_ACTION_KEYS
+    def items(self): return [(key, self[key]) for key in _HAND_ACTION_KEYS]
+    def to_dict(self): return dict(self.items())
+
+    def __repr__(self):
+        return f"HandAction({self.to_dict()!r})"
+
+
+# --- Ordem de ação, IP e fold por jogador no Flop, Turn e River ---
+POSTFLOP_STREET_CODES = (poker_codes.STREET_FLOP, poker_codes.STREET_TURN, poker_codes.STREET_RIVER)
+# Ações que contam para a ordem de ação na street (blinds, antes e showdown não contam)
+_VOLUNTARY_ACTION_CODES = frozenset((poker_codes.ACTION_BETS, poker_codes.ACTION_RAISES, poker_codes.ACTION_CALLS,
+                                     poker_codes.ACTION_CHECKS, poker_codes.ACTION_FOLDS))
+
+# action_order: posição (0, 1, ...) na ordem da primeira ação voluntária do jogador na street.
+# is_ip: nenhum jogador que ficou na street (não foldou) age depois dele; é o mesmo
+# resultado de PokerHand.is_player_ip_on_street(jogador, jogador, ...).
+StreetPlayerInfo = namedtuple('StreetPlayerInfo', 'action_order is_ip folded')
+
+def compute_street_player_info(street_actions):
+    """
+    Calcula numa única passada a ordem de ação, o flag IP e o fold de cada jogador
+    no Flop, Turn e River. street_actions: tuplas (street_code, action_code, jogador)
+    na ordem da mão; o jogador pode ser o nome ou o player_id do banco.
+    Retorna {street_code: {jogador: StreetPlayerInfo}}, com os jogadores na ordem de ação.
+    """
+    street_orders = {street_code: {} for street_code in POSTFLOP_STREET_CODES}
+    street_folds = {street_code: set() for street_code in POSTFLOP_STREET_CODES}
+    for street_code, action_code, player in street_actions:
+        street_order = street_orders.get(street_code)
+        if street_order is None or player is None or action_code not in _VOLUNTARY_ACTION_CODES:
+            continue
+        street_order.setdefault(player, len(street_order))
+        if action_code == poker_codes.ACTION_FOLDS:
+            street_folds[street_code].add(player)
+    street_player_info = {}
+    for street_code, street_order in street_orders.items():
+        folded_players = street_folds[street_code]
+        active_orders = sorted((order for player, order in street_order.items() if player not in folded_players), reverse=True)
+        street_info = {}
+        for player, order in street_order.items():
+            # Maior action_order entre os outros jogadores que não foldaram
+            last_other_active = next((active_order for active_order in active_orders if active_order != order), -1)
+            street_info[player] = StreetPlayerInfo(order, order > last_other_active, player in folded_players)
+        street_player_info[street_code] = street_info
+    return street_player_info
+
+
 class PokerHand:
     # ... (COPIE A CLASSE PokerHand INTEIRA AQUI do poker_parser.py,
     #      MAS REMOVA o método save_to_db, pois ele estará em db_manager.py)
+    # __slots__: sem __dict__ por mão; as ações são HandAction (tuplas) e os assentos SeatInfo.
+    __slots__ = (
+        'hand_id', 'tournament_id', 'datetime_str', 'table_id', 'button_seat_num',
+        'player_seat_info', 'player_positions', 'hero_name', 'actions',
+        'preflop_aggressor', 'flop_aggressor', 'turn_aggressor', 'river_aggressor',
+        'streets_seen', 'hole_cards', 'board_cards', 'preflop_raise_count', 'first_raiser_preflop',
+        'flop_actors_in_order', 'turn_actors_in_order', 'river_actors_in_order', 'street_player_info',
+        'current_pot_total', 'big_blind_amount', 'pot_total_at_start_of_street',
+        'amount_to_call_overall_this_street', 'last_bet_or_raise_amount_this_street',
+        'pot_before_last_bet_or_raise_this_street', 'bets_this_street_by_player', 'current_street_aggressor',
+    )
+
     def __init__(self, hand_id, tournament_id, datetime_str, table_id, button_seat_num):
         self.hand_id = hand_id
         self.tournament_id = tournament_id
         self.datetime_str = datetime_str
         self.table_id = table_id
         self.button_seat_num = button_seat_num
-        self.player_seat_info = defaultdict(lambda: {'name': None, 'chips': 0, 'bounty': None})
+        self.player_seat_info = defaultdict(SeatInfo)
         self.player_positions = {}
         self.hero_name = None
         self.actions = [] 
@@ -140,9 +393,10 @@ class PokerHand:
         self.preflop_raise_count = 0
         self.first_raiser_preflop = None 
 
-        self.flop_actors_in_order = []
-        self.turn_actors_in_order = []
-        self.river_actors_in_order = []
+        self.flop_actors_in_order = ()
+        self.turn_actors_in_order = ()
+        self.river_actors_in_order = ()
+        self.street_player_info = {} # {street_code: {nome: StreetPlayerInfo}}, ver determine_actors_order
 
         self.current_pot_total = 0
         self.big_blind_amount = 0 
@@ -153,6 +407,25 @@ class PokerHand:
         self.bets_this_street_by_player = defaultdict(int) 
         self.current_street_aggressor = None 
 
+    # Estado de apostas usado apenas durante o parse; não precisa viajar entre processos.
+    _TRANSIENT_PARSE_STATE = {
+        'amount_to_call_overall_this_street': 0,
+        'last_bet_or_raise_amount_this_street': 0,
+        'pot_before_last_bet_or_raise_this_street': 0,
+        'current_street_aggressor': None,
+    }
+
+    def __getstate__(self):
+        # Registro compacto para o pickle (ex.: retorno dos workers do ProcessPoolExecutor)
+        return {k: getattr(self, k) for k in self.__slots__
+                if k not in self._TRANSIENT_PARSE_STATE and k != 'bets_this_street_by_player'}
+
+    def __setstate__(self, state):
+        for k, v in self._TRANSIENT_PARSE_STATE.items():
+            setattr(self, k, v)
+        self.bets_this_street_by_player = defaultdict(int)
+        for k, v in state.items():
+            setattr(self, k, v)
 
     def _reset_street_betting_state(self, street_name):
         self.pot_total_at_start_of_street[street_name] = self.current_pot_total
@@ -169,23 +442,29 @@ class PokerHand:
             self.current_street_aggressor = self.turn_aggressor
 
     def add_action(self, action_data):
-        player_name = action_data.get('player')
-        action_type = action_data.get('action')
-        amount = action_data.get('amount', 0) if action_data.get('amount') is not None else 0
-        street = action_data.get('street')
+        """Compatibilidade: recebe o antigo dict de ação e registra um HandAction (que é retornado)."""
+        return self._add_action(action_data.get('street'), action_data.get('action'), action_data.get('player'),
+                                action_data.get('amount'), action_data.get('total_bet'),
+                                action_data.get('cards'), action_data.get('description'))
+
+    def _add_action(self, street, action_type, player_name, amount_parsed, total_bet, cards=None, description=None):
+        amount = amount_parsed if amount_parsed is not None else 0
 
-        action_data['pot_total_before_action'] = self.current_pot_total
+        pot_total_before_action = self.current_pot_total
         amount_player_already_invested_this_street = self.bets_this_street_by_player.get(player_name, 0)
-        action_data['amount_to_call_for_player'] = max(0, self.amount_to_call_overall_this_street - amount_player_already_invested_this_street)
+        amount_to_call_for_player = max(0, self.amount_to_call_overall_this_street - amount_player_already_invested_this_street)
 
-        if action_data['amount_to_call_for_player'] > 0: 
-            action_data['bet_faced_by_player_amount'] = self.last_bet_or_raise_amount_this_street
-            action_data['pot_when_bet_was_made'] = self.pot_before_last_bet_or_raise_this_street
+        if amount_to_call_for_player > 0: 
+            bet_faced_by_player_amount = self.last_bet_or_raise_amount_this_street
+            pot_when_bet_was_made = self.pot_before_last_bet_or_raise_this_street
         else: 
-            action_data['bet_faced_by_player_amount'] = 0
-            action_data['pot_when_bet_was_made'] = self.current_pot_total 
+            bet_faced_by_player_amount = 0
+            pot_when_bet_was_made = self.current_pot_total 
 
-        self.actions.append(action_data) 
+        action = HandAction((STREET_CODES[street], ACTION_CODES[action_type], player_name, amount_parsed, total_bet,
+                             pot_total_before_action, amount_to_call_for_player,
+                             bet_faced_by_player_amount, pot_when_bet_was_made, cards, description))
+        self.actions.append(action) 
 
         if action_type == 'posts_ante':
             self.current_pot_total += amount
@@ -217,74 +496,79 @@ class PokerHand:
             self.current_street_aggressor = player_name 
             if street == "Preflop": self.preflop_aggressor = player_name 
         elif action_type == 'raises':
-            total_bet_this_action = action_data['total_bet']
+            total_bet_this_action = total_bet
             money_added_by_raiser = total_bet_this_action - self.bets_this_street_by_player.get(player_name, 0)
             self.pot_before_last_bet_or_raise_this_street = self.current_pot_total 
             self.current_pot_total += money_added_by_raiser
             self.bets_this_street_by_player[player_name] = total_bet_this_action 
             self.amount_to_call_overall_this_street = total_bet_this_action 
-            self.last_bet_or_raise_amount_this_street = action_data['amount'] 
+            self.last_bet_or_raise_amount_this_street = amount_parsed 
             self.current_street_aggressor = player_name 
             if street == "Preflop": self.preflop_aggressor = player_name 
         elif action_type == 'uncalled_bet_returned':
             self.current_pot_total -= amount 
-        if action_data['street'] and action_data['street'] not in ["Pre-deal", "Summary", "Showdown"]:
-            self.streets_seen.add(action_data['street'])
-        if action_data['street'] == 'Preflop' and action_type in ['bets', 'raises']: 
+        if street and street not in ["Pre-deal", "Summary", "Showdown"]:
+            self.streets_seen.add(street)
+        if street == 'Preflop' and action_type in ['bets', 'raises']: 
             self.preflop_raise_count += 1
             if self.preflop_raise_count == 1 and not self.first_raiser_preflop:
                 self.first_raiser_preflop = player_name
+        return action
 
-    def _determine_street_actors_order(self, street_name, target_list):
-        target_list.clear()
-        seen_actors = set()
-        relevant_actions = ['bets', 'raises', 'calls', 'checks', 'folds']
-        street_actions_only = [a for a in self.actions if a['street'] == street_name and a['action'] in relevant_actions and a.get('player') is not None]
-        for action in street_actions_only:
-            if action['player'] not in seen_actors:
-                target_list.append(action['player'])
-                seen_actors.add(action['player'])
+    def _append_showdown_action(self, street, action_type, player_name, amount, cards=None, description=None):
+        # Ações de showdown/resumo não mexem no pote nem nas apostas; os campos de pote ficam em 0
+        self.actions.append(HandAction((STREET_CODES[street], ACTION_CODES[action_type], player_name, amount, None,
+                                        0, 0, 0, 0, cards, description)))
 
     def determine_actors_order(self):
-        self._determine_street_actors_order("Flop", self.flop_actors_in_order)
-        self._determine_street_actors_order("Turn", self.turn_actors_in_order)
-        self._determine_street_actors_order("River", self.river_actors_in_order)
+        """
+        Calcula uma vez por mão a ordem de ação, o IP e os folds de cada street pós-flop
+        (street_player_info, gravado em hand_street_players) e as tuplas *_actors_in_order.
+        """
+        self.street_player_info = compute_street_player_info(
+            (action.street_code, action.action_code, action.player) for action in self.actions)
+        self.flop_actors_in_order = tuple(self.street_player_info[poker_codes.STREET_FLOP])
+        self.turn_actors_in_order = tuple(self.street_player_info[poker_codes.STREET_TURN])
+        self.river_actors_in_order = tuple(self.street_player_info[poker_codes.STREET_RIVER])
+
+    def _players_folded_on_street(self, street_name):
+        street_code = STREET_CODES.get(street_name)
+        return {action.player for action in self.actions
+                if action.street_code == street_code and action.action_code == poker_codes.ACTION_FOLDS}
 
     def is_player_ip_on_street(self, player_name, street_aggressor_for_comparison, street_actors_order, street_name_param=None): # Renomeado street_name para street_name_param
         if not street_actors_order or player_name not in street_actors_order: return None
+        street_info = self.street_player_info.get(STREET_CODES.get(street_name_param))
+        if street_info is not None and tuple(street_actors_order) == tuple(street_info):
+            # Ordem e folds pré-calculados (determine_actors_order): só consultas em dict
+            player_info = street_info[player_name]
+            aggressor_info = street_info.get(street_aggressor_for_comparison) if street_aggressor_for_comparison else None
+            if aggressor_info is not None:
+                if player_name != street_aggressor_for_comparison:
+                    return player_info.action_order > aggressor_info.action_order
+                return player_info.is_ip
+            if not player_info.folded:
+                return player_info.is_ip
+            return False if any(not info.folded for info in street_info.values()) else None
         try:
             player_idx = street_actors_order.index(player_name)
         except ValueError:
             return None 
+        folded_players = self._players_folded_on_street(street_name_param) # Usar street_name_param
         if street_aggressor_for_comparison and street_aggressor_for_comparison in street_actors_order:
             try:
                 aggressor_idx = street_actors_order.index(street_aggressor_for_comparison)
                 if player_name == street_aggressor_for_comparison:
-                    active_opp_indices = []
-                    for opp_cand_name in street_actors_order:
-                        if opp_cand_name != player_name:
-                            opp_actions_this_street = [
-                                a for a in self.actions
-                                if a.get('street') == street_name_param and a.get('player') == opp_cand_name # Usar street_name_param
-                            ]
-                            if not any(a.get('action') == 'folds' for a in opp_actions_this_street):
-                                if opp_cand_name in street_actors_order: 
-                                   active_opp_indices.append(street_actors_order.index(opp_cand_name))
+                    active_opp_indices = [idx for idx, opp_cand_name in enumerate(street_actors_order)
+                                          if opp_cand_name != player_name and opp_cand_name not in folded_players]
                     if not active_opp_indices: return True 
                     return player_idx > max(active_opp_indices)
                 else:
                     return player_idx > aggressor_idx
             except ValueError:
                 pass 
-        active_player_indices_this_street = []
-        for p_name_in_order in street_actors_order:
-            p_actions_this_street = [
-                a for a in self.actions
-                if a.get('street') == street_name_param and a.get('player') == p_name_in_order # Usar street_name_param
-            ]
-            if not any(a.get('action') == 'folds' for a in p_actions_this_street):
-                if p_name_in_order in street_actors_order: 
-                    active_player_indices_this_street.append(street_actors_order.index(p_name_in_order))
+        active_player_indices_this_street = [idx for idx, p_name_in_order in enumerate(street_actors_order)
+                                             if p_name_in_order not in folded_players]
         if not active_player_indices_this_street: return None 
         return player_idx == max(active_player_indices_this_street)
 
@@ -322,6 +606,7 @@ def parse_hand_history_to_object(hand_text_block):
     current_hand = PokerHand(hand_id, tournament_id, datetime_str, None, None)
     current_street = "Pre-deal"
     positions_assigned_for_hand = False
+    seated_names = set()
 
     for line_idx, line_content in enumerate(lines[1:], start=1):
         line = line_content.strip()
@@ -354,73 +639,59 @@ def parse_hand_history_to_object(hand_text_block):
                 if m_board_search:
                     current_hand.board_cards = m_board_search.group(1).split(' ')
             continue 
-        m = RE_TABLE_INFO.match(line)
-        if m:
-            current_hand.table_id = m.group(1) 
-            current_hand.button_seat_num = int(m.group(4))
-            continue
-        m = RE_SEAT_INFO.match(line)
-        if m:
-            seat, player_name, chips, bounty_str = int(m.group(1)), m.group(2), int(m.group(3)), m.group(4)
-            current_hand.player_seat_info[seat]['name'] = player_name
-            current_hand.player_seat_info[seat]['chips'] = int(chips)
-            if bounty_str:
-                 current_hand.player_seat_info[seat]['bounty'] = float(bounty_str)
-            continue
-        m = RE_DEALT_TO.match(line)
-        if m:
-            hero_name, cards = m.groups()
-            current_hand.set_hero(hero_name)
-            current_hand.set_hole_cards(hero_name, cards)
-            continue
+        if line.startswith("Table '"):
+            m = RE_TABLE_INFO.match(line)
+            if m:
+                current_hand.table_id = m.group(1) 
+                current_hand.button_seat_num = int(m.group(4))
+                continue
+        elif line.startswith("Seat "):
+            m = RE_SEAT_INFO.match(line)
+            if m:
+                seat, player_name, chips, bounty_str = int(m.group(1)), sys.intern(m.group(2)), int(m.group(3)), m.group(4)
+                seat_info = current_hand.player_seat_info[seat]
+                seat_info.name = player_name
+                seat_info.chips = chips
+                seated_names.add(player_name)
+                if bounty_str:
+                     seat_info.bounty = float(bounty_str)
+                continue
+        elif line.startswith("Dealt to "):
+            m = RE_DEALT_TO.match(line)
+            if m:
+                hero_name, cards = m.groups()
+                current_hand.set_hero(hero_name)
+                current_hand.set_hole_cards(hero_name, cards)
+                continue
+        elif line.startswith("Board ["):
+            m_board = RE_BOARD_CARDS.match(line)
+            if m_board:
+                current_hand.board_cards = m_board.group(1).split(' ')
+                continue 
         if not positions_assigned_for_hand and current_hand.button_seat_num is not None and \
            current_street not in ["Summary", "Pre-deal", "Showdown"] and \
-           any((info.get('name') or "") + ": " in line for seat, info in current_hand.player_seat_info.items()): 
+           line.split(": ", 1)[0] in seated_names: 
             valid_player_seat_info = {s:i for s,i in current_hand.player_seat_info.items() if i['name'] is not None and i.get('chips',0) > 0}
             if valid_player_seat_info:
                  current_hand.player_positions = assign_player_positions(valid_player_seat_info, current_hand.button_seat_num)
                  positions_assigned_for_hand = True
-        action_data = {
-            'hand_id': current_hand.hand_id, 'street': current_street, 'player': None,
-            'action': None, 'amount': None, 'total_bet': None,
-            'position': "N/A", 'hero': False, 'description': None
-        }
-        player_name_from_action = None
-        action_parsed = False
-        m = RE_ANTE.match(line);
-        if m: player_name_from_action, amount_str = m.groups(); action_data.update({'action': 'posts_ante', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_SB.match(line): m = RE_SB.match(line); player_name_from_action, amount_str = m.groups(); action_data.update({'action': 'posts_sb', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_BB.match(line): m = RE_BB.match(line); player_name_from_action, amount_str = m.groups(); action_data.update({'action': 'posts_bb', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_ACTION_FOLDS.match(line): m = RE_ACTION_FOLDS.match(line); player_name_from_action = m.group(1); action_data.update({'action': 'folds'}); action_parsed = True
-        elif RE_ACTION_CHECKS.match(line): m = RE_ACTION_CHECKS.match(line); player_name_from_action = m.group(1); action_data.update({'action': 'checks'}); action_parsed = True
-        elif RE_ACTION_CALLS.match(line): m = RE_ACTION_CALLS.match(line); player_name_from_action, amount_str = m.groups()[:2]; action_data.update({'action': 'calls', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_ACTION_BETS.match(line): m = RE_ACTION_BETS.match(line); player_name_from_action, amount_str = m.groups()[:2]; action_data.update({'action': 'bets', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_ACTION_RAISES.match(line): m = RE_ACTION_RAISES.match(line); player_name_from_action, amount_str, total_bet_str = m.groups()[:3]; action_data.update({'action': 'raises', 'amount': int(amount_str), 'total_bet': int(total_bet_str)}); action_parsed = True
-        elif RE_UNCALLED_BET.match(line): m = RE_UNCALLED_BET.match(line); amount_str, player_name_from_action = m.groups(); action_data.update({'action': 'uncalled_bet_returned', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_COLLECTED_POT.match(line): m = RE_COLLECTED_POT.match(line); player_name_from_action, amount_str = m.groups(); action_data.update({'action': 'collected_pot', 'amount': int(amount_str)}); action_parsed = True
-        elif RE_SHOWS_HAND.match(line):
-            m = RE_SHOWS_HAND.match(line); player_name_from_action, cards_shown, description_shown = m.groups()
-            action_data.update({'action': 'shows_hand', 'cards': cards_shown, 'description': description_shown})
+        parsed_action = classify_action_line(line)
+        if parsed_action is None:
+            continue
+        player_name_from_action, action_type, amount, total_bet, cards_shown, description_shown = parsed_action
+        if action_type == 'shows_hand':
             if player_name_from_action: current_hand.set_hole_cards(player_name_from_action, cards_shown) 
-            action_parsed = True
-        elif RE_DOESNT_SHOW.match(line): m = RE_DOESNT_SHOW.match(line); player_name_from_action = m.group(1); action_data.update({'action': 'doesnt_show_hand'}); action_parsed = True
-        elif RE_MUCKS_HAND.match(line): m = RE_MUCKS_HAND.match(line); player_name_from_action = m.group(1); action_data.update({'action': 'mucks_hand'}); action_parsed = True
-        m_board = RE_BOARD_CARDS.match(line)
-        if m_board:
-            current_hand.board_cards = m_board.group(1).split(' ')
-            continue 
-        if action_parsed and player_name_from_action:
-            action_data['player'] = player_name_from_action
-            pos = current_hand.player_positions.get(player_name_from_action, "N/A_NoPosYet")
-            action_data['position'] = pos
-            if current_hand.hero_name and player_name_from_action == current_hand.hero_name:
-                action_data['hero'] = True
-            if action_data['action'] and action_data['player'] and current_street not in ["Summary", None, "Pre-deal", "Showdown"]:
-                 current_hand.add_action(action_data)
-            elif action_data['action'] in ['posts_ante', 'posts_sb', 'posts_bb'] and current_street == "Pre-deal":
-                current_hand.add_action(action_data) 
-            elif action_data['action'] in ['shows_hand', 'mucks_hand', 'doesnt_show_hand', 'collected_pot', 'uncalled_bet_returned'] and current_street in ["Showdown", "Summary"]:
-                 current_hand.actions.append(action_data) 
+        else:
+            cards_shown = None
+        if player_name_from_action:
+            # Mesmo objeto str para o nome em todas as ações (e mãos) do jogador
+            player_name_from_action = sys.intern(player_name_from_action)
+            if current_street not in ["Summary", None, "Pre-deal", "Showdown"]:
+                 current_hand._add_action(current_street, action_type, player_name_from_action, amount, total_bet, cards_shown, description_shown)
+            elif action_type in ['posts_ante', 'posts_sb', 'posts_bb'] and current_street == "Pre-deal":
+                current_hand._add_action(current_street, action_type, player_name_from_action, amount, total_bet, cards_shown, description_shown) 
+            elif action_type in ['shows_hand', 'mucks_hand', 'doesnt_show_hand', 'collected_pot', 'uncalled_bet_returned'] and current_street in ["Showdown", "Summary"]:
+                 current_hand._append_showdown_action(current_street, action_type, player_name_from_action, amount, cards_shown, description_shown) 
     if current_street == "River": current_hand.river_aggressor = current_hand.current_street_aggressor
     elif current_street == "Turn" and not current_hand.streets_seen.intersection({"River", "Showdown", "Summary"}):
         current_hand.turn_aggressor = current_hand.current_street_aggressor
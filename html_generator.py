@@ -279,6 +279,17 @@ def generate_html_grid(stats_data, output_filename="estatisticas_poker_grid.html
         traceback.print_exc()
 
 
+def generate_population_html_grid(output_filename="estatisticas_poker_grid.html", player_ids=None, workers=None, chunk_size=100):
+    """
+    Calcula as stats de todos os jogadores (ou dos player_ids) do banco em db_manager.DB_NAME
+    no pool de processos de stats_population e gera o grid com generate_html_grid.
+    """
+    from stats_population import calculate_population_stats
+    stats_data = calculate_population_stats(player_ids, workers=workers, chunk_size=chunk_size)
+    generate_html_grid(stats_data, output_filename)
+    return stats_data
+
+
 def generate_html_summary(stats_data, output_filename="estatisticas_resumidas.html"):
     print(f"Salvando resumo em HTML em '{output_filename}'...")
     try:
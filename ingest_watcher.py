@@ -0,0 +1,147 @@
+# ingest_watcher.py
+"""
+Importação contínua: fica rodando, observa historico_maos.txt e maos_gerais/ e
+insere cada mão assim que ela termina de ser escrita pelo cliente de poker.
+
+Usa polling (os.stat) para não depender de bibliotecas de inotify; com o intervalo
+padrão de 0.25s uma mão completa chega ao DB (e ao HUD do app.py) em menos de 1s.
+Os bytes novos de cada arquivo são lidos a partir do offset salvo em ingest_files,
+pelo mesmo caminho incremental do main_processor.
+
+Com --action-store a cópia colunar de actions (action_store) recebe as mãos novas
+a cada importação.
+
+Uso:
+    python ingest_watcher.py [--interval 0.25] [--action-store]
+"""
+import os
+import time
+import sqlite3
+import argparse
+
+import db_manager
+import main_processor
+
+
+def _list_dir_log_files(dir_path, dir_cache, found_paths):
+    """
+    Acrescenta a found_paths os .txt de dir_path (recursivo). A listagem de cada
+    diretório só é refeita quando o mtime dele muda (arquivo criado/removido).
+    """
+    try:
+        dir_mtime = os.stat(dir_path).st_mtime_ns
+    except OSError:
+        dir_cache.pop(dir_path, None)
+        return
+    cached = dir_cache.get(dir_path)
+    if cached and cached[0] == dir_mtime:
+        _, subdirs, txt_files = cached
+    else:
+        subdirs, txt_files = [], []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(".txt"):
+                        txt_files.append(entry.path)
+        except OSError as e:
+            print(f"Erro ao listar '{dir_path}': {e}")
+        dir_cache[dir_path] = (dir_mtime, subdirs, txt_files)
+    found_paths.extend(txt_files)
+    for subdir in subdirs:
+        _list_dir_log_files(subdir, dir_cache, found_paths)
+
+
+def find_changed_log_files(input_filename, general_dir, watch_state, cold_after=600.0, cold_poll_interval=30.0):
+    """
+    Retorna os arquivos de log novos ou alterados desde a última chamada.
+    Arquivos sem modificação há mais de cold_after segundos (torneios já
+    encerrados) só são verificados a cada cold_poll_interval segundos.
+    watch_state é um dict mantido pelo chamador entre as chamadas.
+    """
+    dir_cache = watch_state.setdefault('dirs', {})
+    file_signatures = watch_state.setdefault('files', {}) # path -> ((inode, size, mtime_ns), último stat)
+    now = time.time()
+
+    paths = [input_filename] if os.path.isfile(input_filename) else []
+    if os.path.isdir(general_dir):
+        _list_dir_log_files(general_dir, dir_cache, paths)
+
+    changed_paths = []
+    for path in paths:
+        known = file_signatures.get(path)
+        if known:
+            signature, last_stat_time = known
+            if now - signature[2] / 1e9 > cold_after and now - last_stat_time < cold_poll_interval:
+                continue
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            file_signatures.pop(path, None)
+            continue
+        signature = (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+        if not known or known[0] != signature:
+            changed_paths.append(path)
+        file_signatures[path] = (signature, now)
+    return changed_paths
+
+
+def watch(input_filename="historico_maos.txt", general_dir="maos_gerais", poll_interval=0.25, commit_every=50,
+          sync_action_store=False):
+    """
+    Loop principal: a cada poll_interval segundos importa o que foi acrescentado
+    aos arquivos alterados, em transações pequenas. A conexão (e o cache de
+    jogadores do db_manager) fica aberta enquanto o processo roda.
+    Um erro do SQLite num ciclo (p. ex. "database is locked" enquanto outro processo
+    segura a escrita por mais que BUSY_TIMEOUT_MS) desfaz a transação do ciclo e os
+    arquivos são relidos no próximo: o offset em ingest_files só avança junto com o
+    commit das mãos.
+    """
+    conn = db_manager.get_db_connection()
+    db_manager.create_tables(conn) # Garante que tabelas existem (inclusive ingest_files)
+    watch_state = {}
+    print(f"Observando '{input_filename}' e '{general_dir}/' (intervalo de {poll_interval}s). CTRL+C para parar.")
+    try:
+        while True:
+            tick_start = time.perf_counter()
+            changed_paths = find_changed_log_files(input_filename, general_dir, watch_state)
+            if changed_paths:
+                try:
+                    hand_blocks = main_processor.iter_hand_blocks_from_files_incremental(changed_paths, conn)
+                    inserted_count = main_processor.process_log_files(hand_blocks, conn, commit_every=commit_every)
+                    if inserted_count and sync_action_store:
+                        import action_store # Só com --action-store: carrega NumPy e os stats_calculator_*
+                        action_store.sync_action_store(conn)
+                except sqlite3.Error as e:
+                    # Os player_ids inseridos na transação desfeita saem do cache; os arquivos
+                    # voltam a ser "alterados" para o próximo ciclo reler os mesmos bytes
+                    db_manager.rollback_and_clear_player_id_cache(conn)
+                    for path in changed_paths:
+                        watch_state['files'].pop(path, None)
+                    print(f"{time.strftime('%H:%M:%S')} Erro do banco de dados, tentando de novo no próximo ciclo: {e}")
+                    inserted_count = 0
+                if inserted_count:
+                    elapsed_ms = (time.perf_counter() - tick_start) * 1000
+                    print(f"{time.strftime('%H:%M:%S')} {inserted_count} novas mãos inseridas ({elapsed_ms:.0f} ms).")
+            time.sleep(max(0.0, poll_interval - (time.perf_counter() - tick_start)))
+    except KeyboardInterrupt:
+        print("\nObservação encerrada.")
+    finally:
+        db_manager.checkpoint_wal(conn, "TRUNCATE")
+        conn.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Importa continuamente as mãos novas dos históricos.")
+    arg_parser.add_argument("--interval", type=float, default=0.25, help="Intervalo de polling em segundos.")
+    arg_parser.add_argument("--input", default="historico_maos.txt", help="Arquivo de histórico principal.")
+    arg_parser.add_argument("--dir", default="maos_gerais", help="Diretório com os demais históricos.")
+    arg_parser.add_argument("--action-store", action="store_true",
+                            help="Acrescenta as mãos novas à cópia colunar de actions (action_store).")
+    args = arg_parser.parse_args(argv)
+    watch(args.input, args.dir, poll_interval=args.interval, sync_action_store=args.action_store)
+
+
+if __name__ == "__main__":
+    main()
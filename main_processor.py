@@ -1,6 +1,9 @@
 # main_processor.py
 import os
-from collections import defaultdict # Apenas se usado para algo antes de passar para stats_calculator
+import time
+import argparse
+from collections import defaultdict, deque, namedtuple # Apenas se usado para algo antes de passar para stats_calculator
+from concurrent.futures import ProcessPoolExecutor
 
 # Importar dos novos módulos
 import db_manager
@@ -8,87 +11,375 @@ import hand_parser
 # stats_calculator não é mais chamado diretamente aqui para calcular tudo
 # html_generator não é mais chamado aqui
 
-def process_log_files(log_content, conn): # Removido existing_processed_ids
+HAND_HEADER_PREFIX = "PokerStars Hand #"
+
+# Marca, no fluxo de blocos de mão, o ponto até onde um arquivo foi lido por completo.
+# É gravada na tabela ingest_files na mesma transação das mãos que a precedem.
+IngestCheckpoint = namedtuple("IngestCheckpoint", "path inode size mtime byte_offset")
+
+def iter_log_file_paths(input_filename="historico_maos.txt", general_dir="maos_gerais"):
     """
-    Parsea o conteúdo do log e salva mãos novas no DB.
-    Retorna a contagem de mãos novas inseridas.
+    Gera, em ordem, os caminhos dos arquivos de histórico a processar:
+    primeiro o arquivo principal, depois todo .txt dentro de general_dir.
+    """
+    if os.path.isfile(input_filename):
+        yield input_filename
+    else:
+        print(f"Arquivo '{input_filename}' não encontrado.")
+
+    if os.path.isdir(general_dir):
+        for root, _, files in os.walk(general_dir):
+            for fname in files:
+                if fname.lower().endswith(".txt"):
+                    yield os.path.join(root, fname)
+
+
+def iter_hand_blocks(lines):
+    """
+    Agrupa um iterável de linhas em blocos de mão completos ("PokerStars Hand #...").
+    Consome as linhas de forma incremental: só o bloco corrente fica em memória.
     """
-    hand_texts = []
     current_block = []
-    for line in log_content.strip().split('\n'):
+    for raw_line in lines:
+        line = raw_line.rstrip('\r\n')
         if line.startswith("PokerStars Hand #") and current_block:
-            hand_texts.append("\n".join(current_block))
+            yield "\n".join(current_block).strip()
             current_block = [line]
         elif line.strip() or current_block: # Mantém linhas em branco dentro de um bloco
             current_block.append(line)
     if current_block:
-        hand_texts.append("\n".join(current_block))
+        yield "\n".join(current_block).strip()
 
-    newly_inserted_db_count = 0
 
-    if not hand_texts:
-        return newly_inserted_db_count
+def iter_hand_blocks_from_files(file_paths):
+    """Lê cada arquivo linha a linha e gera seus blocos de mão, um por vez."""
+    for fpath in file_paths:
+        try:
+            with open(fpath, "r", encoding="utf-8") as f:
+                yield from iter_hand_blocks(f)
+        except Exception as e: print(f"Erro ao ler '{fpath}': {e}")
+
 
-    print(f"Analisando {len(hand_texts)} blocos de mão para inserção no DB...")
-    for i, text_block in enumerate(hand_texts):
-        header_match = hand_parser.RE_HAND_HEADER.match(text_block.split('\n')[0])
+def _is_hand_block_complete(block_lines, ends_with_newline):
+    """
+    Decide se o último bloco de um arquivo já foi escrito por inteiro: precisa ter
+    a seção SUMMARY, terminar em quebra de linha e ter uma linha em branco depois
+    ou uma linha "Seat N:" no resumo para cada assento do cabeçalho.
+    """
+    if not ends_with_newline or "*** SUMMARY ***" not in block_lines:
+        return False
+    if not block_lines[-1].strip():
+        return True
+    summary_index = block_lines.index("*** SUMMARY ***")
+    header_seats = sum(1 for line in block_lines[:summary_index] if hand_parser.RE_SEAT_INFO.match(line)) # Inclui "(1500 in chips, $10 bounty)"
+    summary_seats = sum(1 for line in block_lines[summary_index + 1:] if line.startswith("Seat "))
+    return summary_seats >= header_seats
+
+
+def iter_complete_hand_blocks(binary_file, start_offset=0):
+    """
+    Versão de iter_hand_blocks para um arquivo aberto em modo binário e já
+    posicionado em start_offset. Gera (bloco, offset_final), onde offset_final é a
+    posição em bytes logo após o bloco. Um último bloco incompleto (arquivo ainda
+    sendo escrito) não é gerado; o offset_final do último bloco gerado indica de
+    onde continuar na próxima leitura.
+    """
+    header_prefix = HAND_HEADER_PREFIX.encode("utf-8")
+    position = start_offset
+    current_block = []
+    last_raw_line = b""
+    for raw_line in binary_file:
+        if raw_line.startswith(header_prefix) and current_block:
+            yield "\n".join(current_block).strip(), position
+            current_block = []
+        line = raw_line.decode("utf-8").rstrip('\r\n')
+        if line.strip() or current_block: # Mantém linhas em branco dentro de um bloco
+            current_block.append(line)
+        position += len(raw_line)
+        last_raw_line = raw_line
+    if current_block and _is_hand_block_complete(current_block, last_raw_line.endswith(b"\n")):
+        yield "\n".join(current_block).strip(), position
+
+
+def iter_hand_blocks_from_files_incremental(file_paths, conn):
+    """
+    Como iter_hand_blocks_from_files, mas lê de cada arquivo só os bytes novos desde
+    a última importação (tabela ingest_files). Arquivos sem alteração nem são
+    abertos; arquivos substituídos (outro inode) ou truncados são relidos do início.
+    Depois dos blocos de cada arquivo é gerado um IngestCheckpoint com o offset do
+    último bloco completo.
+    """
+    for fpath in file_paths:
+        abs_path = os.path.abspath(fpath)
+        try:
+            file_stat = os.stat(abs_path)
+            state = db_manager.get_ingest_file_state(conn, abs_path)
+            start_offset = 0
+            if state and state['inode'] == file_stat.st_ino and file_stat.st_size >= state['byte_offset']:
+                start_offset = state['byte_offset']
+                if file_stat.st_size == start_offset:
+                    continue # Nada foi acrescentado desde a última importação
+
+            end_offset = start_offset
+            with open(abs_path, "rb") as f:
+                f.seek(start_offset)
+                for text_block, end_offset in iter_complete_hand_blocks(f, start_offset):
+                    yield text_block
+            yield IngestCheckpoint(abs_path, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime, end_offset)
+        except Exception as e: print(f"Erro ao ler '{fpath}': {e}")
+
+
+def _iter_new_hand_blocks(hand_blocks, conn, counters, dedup_batch_size=1000):
+    """
+    Filtra os blocos: descarta os sem cabeçalho válido e as mãos que já estão no DB.
+    Os IDs dos cabeçalhos são acumulados em lotes de dedup_batch_size e conferidos
+    de uma vez (db_manager.get_existing_hand_ids), então mãos já importadas são
+    descartadas antes do parse e sem um SELECT por mão.
+    Itens IngestCheckpoint passam adiante na mesma posição do fluxo.
+    counters['processed'] é atualizado com o total de blocos lidos.
+    """
+    pending = [] # (hand_history_id, text_block)
+    for text_block in hand_blocks:
+        if isinstance(text_block, IngestCheckpoint):
+            # Mantém a ordem: o checkpoint só segue depois de todos os blocos do arquivo
+            yield from _filter_known_hand_blocks(pending, conn)
+            pending = []
+            yield text_block
+            continue
+        counters['processed'] += 1
+        header_match = hand_parser.RE_HAND_HEADER.match(text_block.split('\n', 1)[0])
         if not header_match:
             continue
-        
-        hand_history_id = header_match.group(1)
-
-        if not db_manager.check_hand_exists(conn, hand_history_id):
-            hand_obj = hand_parser.parse_hand_history_to_object(text_block)
-            if hand_obj:
-                db_id = db_manager.save_hand_to_db(conn, hand_obj) # save_hand_to_db faz o commit internamente ou o chamador faz
-                if db_id:
-                    newly_inserted_db_count += 1
-        
-        if (i + 1) % 200 == 0:
-            conn.commit() # Commit em lotes
-            print(f"  Processadas {i+1}/{len(hand_texts)} mãos para o DB. {newly_inserted_db_count} novas inseridas.")
-    
+        pending.append((header_match.group(1), text_block))
+        if len(pending) >= dedup_batch_size:
+            yield from _filter_known_hand_blocks(pending, conn)
+            pending = []
+    if pending:
+        yield from _filter_known_hand_blocks(pending, conn)
+
+
+def _filter_known_hand_blocks(pending, conn):
+    """Gera os blocos de `pending` cujo ID não está no DB nem repetido dentro do lote."""
+    if not pending:
+        return
+    seen_ids = db_manager.get_existing_hand_ids(conn, [hand_history_id for hand_history_id, _ in pending])
+    for hand_history_id, text_block in pending:
+        if hand_history_id not in seen_ids:
+            seen_ids.add(hand_history_id)
+            yield text_block
+
+
+def _save_parsed_items(conn, parsed_items):
+    """
+    Grava, em ordem, uma lista de objetos PokerHand e IngestCheckpoint: as mãos são
+    salvas em lote e cada checkpoint só é registrado depois das mãos que o precedem,
+    dentro da mesma transação. Retorna a contagem de mãos novas inseridas.
+    """
+    inserted_count = 0
+    pending_hands = []
+    for item in parsed_items:
+        if isinstance(item, IngestCheckpoint):
+            if pending_hands:
+                inserted_count += len(db_manager.save_hands_to_db(conn, pending_hands))
+                pending_hands = []
+            db_manager.save_ingest_file_state(conn, item.path, item.inode, item.size, item.mtime, item.byte_offset)
+        else:
+            pending_hands.append(item)
+    if pending_hands:
+        inserted_count += len(db_manager.save_hands_to_db(conn, pending_hands))
+    return inserted_count
+
+
+def process_log_files(hand_blocks, conn, commit_every=200): # Removido existing_processed_ids
+    """
+    Parsea os blocos de mão recebidos e salva mãos novas no DB.
+    hand_blocks pode ser qualquer iterável de blocos (ex.: iter_hand_blocks_from_files
+    ou iter_hand_blocks_from_files_incremental) ou, por compatibilidade, o conteúdo
+    de log inteiro como string.
+    Retorna a contagem de mãos novas inseridas.
+    """
+    if isinstance(hand_blocks, str):
+        hand_blocks = iter_hand_blocks(hand_blocks.split('\n'))
+
+    newly_inserted_db_count = 0
+    counters = {'processed': 0}
+    pending_items = []
+    pending_hand_count = 0
+
+    for text_block in _iter_new_hand_blocks(hand_blocks, conn, counters):
+        if isinstance(text_block, IngestCheckpoint):
+            pending_items.append(text_block)
+            continue
+        hand_obj = hand_parser.parse_hand_history_to_object(text_block)
+        if hand_obj:
+            pending_items.append(hand_obj)
+            pending_hand_count += 1
+            if pending_hand_count >= commit_every:
+                # Grava o lote inteiro com executemany e faz o commit em seguida
+                newly_inserted_db_count += _save_parsed_items(conn, pending_items)
+                pending_items = []
+                pending_hand_count = 0
+                conn.commit() # Commit em lotes
+                print(f"  Processados {counters['processed']} blocos de mão. {newly_inserted_db_count} novas inseridas.")
+
+    if pending_items:
+        newly_inserted_db_count += _save_parsed_items(conn, pending_items)
     conn.commit() # Commit final
+    if counters['processed']:
+        print(f"Analisados {counters['processed']} blocos de mão para inserção no DB.")
     return newly_inserted_db_count
 
 
-def main():
+def _parse_hand_blocks_worker(text_blocks):
+    """
+    Executado nos processos do pool: apenas parseia (CPU puro) e devolve os
+    objetos PokerHand já compactados para o pickle. Nunca acessa o SQLite.
+    Itens IngestCheckpoint são devolvidos na mesma posição, sem alteração.
+    """
+    parsed_hands = []
+    for text_block in text_blocks:
+        if isinstance(text_block, IngestCheckpoint):
+            parsed_hands.append(text_block)
+            continue
+        hand_obj = hand_parser.parse_hand_history_to_object(text_block)
+        if hand_obj:
+            parsed_hands.append(hand_obj)
+    return parsed_hands
+
+
+def _iter_batches(iterable, batch_size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process_log_files_parallel(hand_blocks, conn, workers=None, batch_size=250, commit_every=5000):
+    """
+    Versão multi-processo de process_log_files.
+    Os blocos são distribuídos em lotes para um ProcessPoolExecutor com `workers`
+    processos que só fazem o parse; este processo é o único escritor do SQLite e
+    insere os resultados em transações grandes (commit a cada `commit_every` mãos).
+    No máximo 2 lotes por worker ficam em voo, então a memória continua limitada.
+    Retorna a contagem de mãos novas inseridas.
+    """
+    if isinstance(hand_blocks, str):
+        hand_blocks = iter_hand_blocks(hand_blocks.split('\n'))
+    workers = workers or os.cpu_count() or 1
+
+    newly_inserted_db_count = 0
+    last_commit_count = 0
+    counters = {'processed': 0}
+    start_time = time.perf_counter()
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        batches = _iter_batches(_iter_new_hand_blocks(hand_blocks, conn, counters), batch_size)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                else:
+                    in_flight.append(pool.submit(_parse_hand_blocks_worker, batch))
+            if not in_flight:
+                break
+            # Resultados consumidos na ordem de submissão para manter a ordem de inserção
+            newly_inserted_db_count += _save_parsed_items(conn, in_flight.popleft().result())
+            if newly_inserted_db_count - last_commit_count >= commit_every:
+                conn.commit()
+                last_commit_count = newly_inserted_db_count
+                elapsed = time.perf_counter() - start_time
+                print(f"  Processados {counters['processed']} blocos de mão. {newly_inserted_db_count} novas inseridas "
+                      f"({newly_inserted_db_count / elapsed:.0f} mãos/s).")
+
+    conn.commit() # Commit final
+    elapsed = time.perf_counter() - start_time
+    if counters['processed']:
+        print(f"Analisados {counters['processed']} blocos de mão com {workers} workers em {elapsed:.1f}s "
+              f"({newly_inserted_db_count / elapsed if elapsed else 0:.0f} mãos novas/s).")
+    return newly_inserted_db_count
+
+
+def _non_negative_int(value):
+    """Tipo do argparse para --workers: inteiro >= 0 (o erro sai antes de abrir o banco)."""
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"deve ser um inteiro 0 ou maior: {value!r}")
+    return number
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Importa históricos de mãos para o banco de dados.")
+    arg_parser.add_argument("--workers", type=_non_negative_int, default=1,
+                            help="Processos de parse em paralelo (1 = serial, 0 = um por CPU).")
+    arg_parser.add_argument("--full-rescan", action="store_true",
+                            help="Relê todos os arquivos desde o início, ignorando os offsets salvos em ingest_files.")
+    arg_parser.add_argument("--bulk-load", action="store_true",
+                            help="Carga em massa para reconstruções: remove os índices secundários, usa PRAGMAs "
+                                 "de throughput e recria os índices (com ANALYZE) no final.")
+    arg_parser.add_argument("--rebuild-stat-counters", action="store_true",
+                            help="Reconstrói do zero a tabela player_stat_counters a partir das mãos gravadas, "
+                                 "informa quantos jogadores divergiam dos contadores incrementais e sai.")
+    arg_parser.add_argument("--action-store", action="store_true",
+                            help="Depois da importação, acrescenta as mãos novas à cópia colunar de actions "
+                                 "(action_store, lida com np.memmap pelo stats_calculator_numpy).")
+    args = arg_parser.parse_args(argv)
+
     input_filename = "historico_maos.txt"
     general_dir = "maos_gerais"
 
     conn = db_manager.get_db_connection()
-    # create_tables é chamado agora pelo app.py ao iniciar, mas pode ser chamado aqui também se rodar este script como standalone para popular o DB.
-    # db_manager.create_tables(conn) # Garante que tabelas existem
+    # create_tables é chamado agora pelo app.py ao iniciar, mas também é necessário aqui:
+    # a tabela ingest_files pode não existir em bancos criados antes da importação incremental.
+    db_manager.create_tables(conn) # Garante que tabelas existem
 
-    log_parts = []
-    if os.path.isfile(input_filename):
-        try:
-            with open(input_filename, "r", encoding="utf-8") as f: log_parts.append(f.read())
-        except Exception as e: print(f"Erro ao ler '{input_filename}': {e}")
-    else: print(f"Arquivo '{input_filename}' não encontrado.")
-    
-    if os.path.isdir(general_dir):
-        for root, _, files in os.walk(general_dir):
-            for fname in files:
-                if fname.lower().endswith(".txt"):
-                    fpath = os.path.join(root, fname)
-                    try:
-                        with open(fpath, "r", encoding="utf-8") as f: log_parts.append(f.read())
-                    except Exception as e: print(f"Erro ao ler '{fpath}': {e}")
-    
-    if not log_parts:
-        print("Nenhum arquivo de log encontrado para processar.")
+    if args.rebuild_stat_counters:
+        db_manager.rebuild_player_stat_counters(conn)
         conn.close()
         return
-    
-    full_log_content = "\n\n".join(log_parts)
-    if not full_log_content.strip():
-        print("Conteúdo dos logs está vazio.")
+
+    log_paths = list(iter_log_file_paths(input_filename, general_dir))
+    if not log_paths:
+        print("Nenhum arquivo de log encontrado para processar.")
         conn.close()
         return
 
+    # Os arquivos são lidos em streaming: cada bloco de mão é parseado e inserido
+    # assim que é lido, sem concatenar todo o histórico em memória. Por padrão só
+    # os bytes acrescentados desde a última importação são lidos.
     print("Processando arquivos de log e populando/atualizando o banco de dados...")
-    inserted_count = process_log_files(full_log_content, conn)
+    if args.full_rescan:
+        hand_blocks = iter_hand_blocks_from_files(log_paths)
+    else:
+        hand_blocks = iter_hand_blocks_from_files_incremental(log_paths, conn)
+    start_time = time.perf_counter()
+    previous_pragmas = db_manager.begin_bulk_load(conn) if args.bulk_load else None
+    try:
+        if args.workers == 1:
+            # Na carga em massa, sem índices para manter, transações maiores compensam
+            inserted_count = process_log_files(hand_blocks, conn, commit_every=5000 if args.bulk_load else 200)
+        else:
+            inserted_count = process_log_files_parallel(hand_blocks, conn, workers=args.workers or None)
+    finally:
+        if previous_pragmas is not None:
+            print("Recriando índices secundários e atualizando estatísticas (ANALYZE)...")
+            db_manager.end_bulk_load(conn, previous_pragmas)
+    elapsed = time.perf_counter() - start_time
+    print(f"Importação concluída em {elapsed:.1f}s ({inserted_count / elapsed if elapsed else 0:.0f} mãos novas/s).")
+    db_manager.checkpoint_wal(conn, "TRUNCATE") # Devolve o conteúdo do -wal ao banco e zera o arquivo
+    if args.action_store:
+        import action_store # Só com --action-store: carrega NumPy e os stats_calculator_*
+        action_store.sync_action_store(conn)
     print(f"\n{inserted_count} novas mãos foram inseridas no banco de dados.")
     print("Banco de dados populado.")
     print("Para visualizar as estatísticas, execute o servidor web (app.py) e acesse no navegador.")
@@ -0,0 +1,68 @@
+# poker_codes.py
+"""
+Códigos inteiros compactos para streets e tipos de ação.
+Usados pelo modelo de mão do hand_parser (HandAction) no lugar das strings
+repetidas em cada ação e gravados como estão nas colunas street_code/action_code
+da tabela actions (nomes nas tabelas streets/action_types do db_manager). Os nomes
+continuam sendo os mesmos usados no resto do projeto ('Preflop', 'raises', ...).
+Os códigos existentes nunca devem ser renumerados: novos nomes vão no fim.
+Os grupos de tamanho de aposta (SIZE_GROUP_NAMES) seguem a mesma regra e são
+gravados por código na tabela hand_features.
+"""
+
+STREET_NAMES = ("Pre-deal", "Preflop", "Flop", "Turn", "River", "Showdown", "Summary")
+STREET_CODES = {name: code for code, name in enumerate(STREET_NAMES)}
+
+STREET_PREDEAL = STREET_CODES["Pre-deal"]
+STREET_PREFLOP = STREET_CODES["Preflop"]
+STREET_FLOP = STREET_CODES["Flop"]
+STREET_TURN = STREET_CODES["Turn"]
+STREET_RIVER = STREET_CODES["River"]
+STREET_SHOWDOWN = STREET_CODES["Showdown"]
+STREET_SUMMARY = STREET_CODES["Summary"]
+
+ACTION_NAMES = (
+    "posts_ante", "posts_sb", "posts_bb",
+    "folds", "checks", "calls", "bets", "raises",
+    "uncalled_bet_returned", "collected_pot",
+    "shows_hand", "doesnt_show_hand", "mucks_hand",
+)
+ACTION_CODES = {name: code for code, name in enumerate(ACTION_NAMES)}
+
+ACTION_POSTS_ANTE = ACTION_CODES["posts_ante"]
+ACTION_POSTS_SB = ACTION_CODES["posts_sb"]
+ACTION_POSTS_BB = ACTION_CODES["posts_bb"]
+ACTION_FOLDS = ACTION_CODES["folds"]
+ACTION_CHECKS = ACTION_CODES["checks"]
+ACTION_CALLS = ACTION_CODES["calls"]
+ACTION_BETS = ACTION_CODES["bets"]
+ACTION_RAISES = ACTION_CODES["raises"]
+ACTION_UNCALLED_BET_RETURNED = ACTION_CODES["uncalled_bet_returned"]
+ACTION_COLLECTED_POT = ACTION_CODES["collected_pot"]
+ACTION_SHOWS_HAND = ACTION_CODES["shows_hand"]
+ACTION_DOESNT_SHOW_HAND = ACTION_CODES["doesnt_show_hand"]
+ACTION_MUCKS_HAND = ACTION_CODES["mucks_hand"]
+
+# Grupos de tamanho de aposta (% do pote), os mesmos de PlayerStats.get_bet_size_group.
+SIZE_GROUP_NAMES = ("0-29%", "30-45%", "46-56%", "57-70%", "80-100%", "101%+")
+SIZE_GROUP_CODES = {name: code for code, name in enumerate(SIZE_GROUP_NAMES)}
+_SIZE_GROUP_UPPER_LIMITS = (29.99, 45.99, 56.99, 70.99, 100.99)
+
+def size_group_code(bet_percentage_pot):
+    """Código do grupo de tamanho para uma aposta de bet_percentage_pot % do pote (None se indefinido)."""
+    if bet_percentage_pot is None or bet_percentage_pot != bet_percentage_pot or bet_percentage_pot in (float("inf"), float("-inf")):
+        return None
+    for code, upper_limit in enumerate(_SIZE_GROUP_UPPER_LIMITS):
+        if bet_percentage_pot <= upper_limit:
+            return code
+    return len(_SIZE_GROUP_UPPER_LIMITS)
+
+def bet_percentage_of_pot(bet_amount, pot_amount):
+    """
+    Aposta em % inteiro do pote, arredondada como o ROUND do SQLite
+    (CAST(ROUND(bet * 100.0 / pot) AS INTEGER)). None se o pote for 0.
+    """
+    if not pot_amount:
+        return None
+    percentage = bet_amount * 100.0 / pot_amount
+    return int(percentage + 0.5) if percentage >= 0 else -int(-percentage + 0.5)
@@ -2328,28 +2328,29 @@ def merge_player_stats(base_stats_dict, new_stats_dict):
             base_stats_dict[player_name] = PlayerStats(player_name) # Cria se não existir
 
         base_ps = base_stats_dict[player_name]
-        
-        # Iterar sobre atributos numéricos simples
-        for attr in dir(new_ps):
-            if not attr.startswith("__") and not callable(getattr(new_ps, attr)):
-                new_value = getattr(new_ps, attr)
-                if hasattr(base_ps, attr):
-                    base_value = getattr(base_ps, attr)
-                    if isinstance(new_value, (int, float)) and isinstance(base_value, (int, float)):
-                        setattr(base_ps, attr, base_value + new_value)
-                    elif isinstance(new_value, dict) and isinstance(base_value, dict):
-                        # Lógica de merge para defaultdicts (como os _by_size e _composition)
-                        def _recursive_merge_defaultdicts(d1, d2):
-                            for k, v2 in d2.items():
-                                if isinstance(v2, defaultdict) or isinstance(v2, dict): # Checa se v2 é dict-like
-                                    # d1[k] já será um defaultdict se d1 for defaultdict(factory)
-                                    _recursive_merge_defaultdicts(d1[k], v2)
-                                elif isinstance(v2, (int, float)):
-                                    d1[k] += v2
-                                # else: não mescla outros tipos
-                        _recursive_merge_defaultdicts(base_value, new_value)
-                    # elif base_value is None and new_value is not None: # Caso de inicialização
-                        # setattr(base_ps, attr, new_value)
+        if hasattr(base_ps, "merge"): # PlayerStats de stats_calculator: soma vetorizada dos slots
+            base_ps.merge(new_ps)
+            continue
+
+        # Iterar sobre atributos numéricos simples (vars: só os da instância, sem avaliar as propriedades de display)
+        for attr, new_value in vars(new_ps).items():
+            if hasattr(base_ps, attr):
+                base_value = getattr(base_ps, attr)
+                if isinstance(new_value, (int, float)) and isinstance(base_value, (int, float)):
+                    setattr(base_ps, attr, base_value + new_value)
+                elif isinstance(new_value, dict) and isinstance(base_value, dict):
+                    # Lógica de merge para defaultdicts (como os _by_size e _composition)
+                    def _recursive_merge_defaultdicts(d1, d2):
+                        for k, v2 in d2.items():
+                            if isinstance(v2, defaultdict) or isinstance(v2, dict): # Checa se v2 é dict-like
+                                # d1[k] já será um defaultdict se d1 for defaultdict(factory)
+                                _recursive_merge_defaultdicts(d1[k], v2)
+                            elif isinstance(v2, (int, float)):
+                                d1[k] += v2
+                            # else: não mescla outros tipos
+                    _recursive_merge_defaultdicts(base_value, new_value)
+                # elif base_value is None and new_value is not None: # Caso de inicialização
+                    # setattr(base_ps, attr, new_value)
 
 # --- Funções de Saída (main) ---
 STAT_COLOR_RANGES = {
@@ -0,0 +1,237 @@
+# stat_counters.py
+"""
+Contadores de estatísticas por jogador (tabela player_stat_counters do db_manager),
+mantidos de forma incremental: cada mão importada soma a sua contribuição aos
+contadores dos jogadores dela, na mesma transação em que a mão é gravada.
+
+Todas as estatísticas calculadas pelos stats_calculator_* são somas por mão, então
+a contribuição de uma mão sai das mesmas linhas que são gravadas para ela em
+hand_players, actions, hand_street_players e hand_features, aplicando as mesmas
+regras das consultas SQL. Uma reconstrução completa (db_manager.rebuild_player_stat_counters)
+refaz a soma a partir dessas tabelas.
+
+Cada contador é uma linha (player_id, stat_key, value). stat_key é o nome do atributo
+de PlayerStats ('cbet_flop_opportunities'); para os dicionários por size / linha as
+chaves vêm em seguida, separadas por STAT_KEY_SEPARATOR
+('fold_to_bet_opportunities_by_size|Flop|30-45%').
+"""
+from collections import Counter, defaultdict
+
+from poker_codes import (STREET_PREFLOP, STREET_FLOP, STREET_TURN, STREET_RIVER, STREET_NAMES, SIZE_GROUP_NAMES,
+                         ACTION_FOLDS, ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES)
+from hand_features import HandFeatures
+
+STAT_KEY_SEPARATOR = "|"
+
+# Posição das colunas nas linhas de actions (mesma ordem do INSERT de db_manager.save_hands_to_db)
+_PLAYER, _STREET, _ACTION, _AMOUNT = 1, 2, 3, 4
+_AMOUNT_TO_CALL, _SIZE_GROUP = 8, 12
+
+_STREET_KEYS = {STREET_FLOP: "flop", STREET_TURN: "turn", STREET_RIVER: "river"}
+_RIVER_LINES = ("BBB", "BXB", "XBB", "XXB")
+_AGGRESSIVE_ACTIONS = (ACTION_BETS, ACTION_RAISES)
+
+
+def stat_key(attr_name, *dict_keys):
+    return STAT_KEY_SEPARATOR.join((attr_name,) + dict_keys)
+
+
+def _is_excluded_blind_call(position, amount, big_blind_amount):
+    """
+    Call do SB completando o blind ou do BB com valor 0, que não conta para o VPIP.
+    Mesmo resultado do NOT (...) da consulta SQL: com NULL a condição não é falsa e o call fica de fora.
+    """
+    sb_clause_false = (position is not None and position != 'SB') or \
+        (amount is not None and big_blind_amount is not None and amount != big_blind_amount // 2)
+    bb_clause_false = (position is not None and position != 'BB') or (amount is not None and amount != 0)
+    return not (sb_clause_false and bb_clause_false)
+
+
+def _add_preflop_counters(counters, seated_positions, big_blind_amount, preflop_actions):
+    """VPIP, PFR, 3Bet e Fold to 3Bet (stats_calculator_preflop)."""
+    vpip_players, pfr_players = set(), set()
+    first_raise = second_raise = None
+    first_action_index = {}
+    for index, row in enumerate(preflop_actions):
+        player_id, action_code = row[_PLAYER], row[_ACTION]
+        if action_code in _AGGRESSIVE_ACTIONS:
+            pfr_players.add(player_id)
+            if not first_raise:
+                first_raise = player_id
+            elif not second_raise:
+                second_raise = player_id
+        if action_code in (ACTION_CALLS, ACTION_BETS, ACTION_RAISES) and player_id in seated_positions:
+            if action_code != ACTION_CALLS or not _is_excluded_blind_call(seated_positions[player_id], row[_AMOUNT], big_blind_amount):
+                vpip_players.add(player_id)
+        first_action_index.setdefault(player_id, index)
+
+    for player_id in vpip_players:
+        counters[player_id]['vpip_actions'] += 1
+    for player_id in pfr_players:
+        if player_id is not None:
+            counters[player_id]['pfr_actions'] += 1
+
+    for player_id, index in first_action_index.items():
+        if player_id is None:
+            continue
+        raises_before = [row for row in preflop_actions[:index] if row[_ACTION] in _AGGRESSIVE_ACTIONS]
+        if len(raises_before) == 1 and raises_before[0][_PLAYER] != player_id:
+            counters[player_id]['three_bet_pf_opportunities'] += 1
+            if preflop_actions[index][_ACTION] in _AGGRESSIVE_ACTIONS:
+                counters[player_id]['three_bet_pf_actions'] += 1
+        if first_raise == player_id and second_raise and second_raise != player_id:
+            counters[player_id]['fold_to_pf_3bet_opportunities'] += 1
+            if any(row[_PLAYER] == player_id and row[_ACTION] == ACTION_FOLDS for row in preflop_actions[index + 1:]):
+                counters[player_id]['fold_to_pf_3bet_actions'] += 1
+
+
+def _add_faced_size(counter, opportunities_key, actions_key, features):
+    """Conta a aposta enfrentada por grupo de tamanho e se a reação a ela foi fold."""
+    if features.faced_size_group_code is None:
+        return
+    size_group = SIZE_GROUP_NAMES[features.faced_size_group_code]
+    counter[stat_key(opportunities_key, size_group)] += 1
+    if features.faced_bet_action_code == ACTION_FOLDS:
+        counter[stat_key(actions_key, size_group)] += 1
+
+
+def _add_street_counters(counter, street_code, features, is_ip):
+    """Stats de uma street a partir da linha de hand_features (stats_calculator_flop / _turn / _river)."""
+    street = _STREET_KEYS[street_code]
+    if street_code == STREET_FLOP:
+        if features.cbet_opportunity and is_ip is not None:
+            side = "ip" if is_ip else "oop"
+            for prefix in ("cbet_flop", f"cbet_flop_{side}"):
+                counter[f"{prefix}_opportunities"] += 1
+                counter[f"{prefix}_actions"] += features.cbet_action
+    else:
+        counter[f"cbet_{street}_opportunities"] += features.cbet_opportunity
+        counter[f"cbet_{street}_actions"] += features.cbet_action
+        counter[f"probe_bet_{street}_opportunities"] += features.probe_opportunity
+        counter[f"probe_bet_{street}_actions"] += features.probe_action
+    counter[f"donk_bet_{street}_opportunities"] += features.donk_opportunity
+    counter[f"donk_bet_{street}_actions"] += features.donk_action
+    counter[f"check_raise_{street}_opportunities"] += features.check_raise_opportunity
+    counter[f"check_raise_{street}_actions"] += features.check_raise_action
+    counter[f"fold_to_check_raise_{street}_opportunities"] += features.faced_check_raise
+    counter[f"fold_to_check_raise_{street}_actions"] += features.faced_check_raise * features.folded
+
+    if features.check_raise_opportunity:
+        reaction_code = features.faced_bet_action_code
+        counter[f"check_call_{street}_opportunities"] += 1
+        counter[f"check_fold_{street}_opportunities"] += 1
+        counter[f"check_call_{street}_actions"] += reaction_code == ACTION_CALLS
+        counter[f"check_fold_{street}_actions"] += reaction_code == ACTION_FOLDS
+        if street_code == STREET_FLOP and features.cbet_opportunity - features.cbet_action:
+            for reaction, reaction_name in ((ACTION_CALLS, "call"), (ACTION_FOLDS, "fold"), (ACTION_RAISES, "raise")):
+                counter[f"pfa_skipped_cbet_then_check_{reaction_name}_flop_opportunities"] += 1
+                counter[f"pfa_skipped_cbet_then_check_{reaction_name}_flop_actions"] += reaction_code == reaction
+
+    if features.faced_cbet:
+        side = "ip" if features.ip_vs_aggressor else "oop"
+        for prefix in (f"fold_to_{street}_cbet", f"fold_to_{street}_cbet_{side}"):
+            counter[f"{prefix}_opportunities"] += 1
+            counter[f"{prefix}_actions"] += features.folded
+        if street_code == STREET_FLOP:
+            _add_faced_size(counter, f"fold_to_flop_cbet_{side}_opportunities_by_size",
+                            f"fold_to_flop_cbet_{side}_actions_by_size", features)
+
+    if features.faced_donk:
+        counter[f"fold_to_donk_bet_{street}_opportunities"] += 1
+        counter[f"fold_to_donk_bet_{street}_actions"] += features.folded
+        _add_faced_size(counter, f"fold_to_donk_bet_{street}_opportunities_by_size",
+                        f"fold_to_donk_bet_{street}_actions_by_size", features)
+    elif features.faced_probe and street_code != STREET_FLOP:
+        counter[f"fold_to_probe_bet_{street}_opportunities"] += 1
+        counter[f"fold_to_probe_bet_{street}_actions"] += features.folded
+
+
+def _add_river_line_counters(counter, player_id, features, features_by_street_player, preflop_aggressor_id):
+    """FTS River por linha do PFA, CCF vs Triple Barrel e BBF vs Donk River (stats_calculator_river)."""
+    bettor_id = features.faced_bet_player
+    if bettor_id is not None and bettor_id == preflop_aggressor_id:
+        bettor_features = features_by_street_player.get((STREET_RIVER, bettor_id))
+        bettor_line = bettor_features.line if bettor_features else None
+        if bettor_line in _RIVER_LINES:
+            _add_faced_size(counter, stat_key("fold_to_river_bet_by_line_opportunities_by_size", bettor_line),
+                            stat_key("fold_to_river_bet_by_line_actions_by_size", bettor_line), features)
+        flop_features = features_by_street_player.get((STREET_FLOP, player_id))
+        turn_features = features_by_street_player.get((STREET_TURN, player_id))
+        if bettor_line == 'BBB' and flop_features and turn_features and flop_features.called_bet and turn_features.called_bet:
+            counter['ccf_triple_barrel_opportunities'] += 1
+            counter['ccf_triple_barrel_actions'] += features.folded
+    if features.line == 'BB-' and bettor_id is not None:
+        counter['bbf_vs_donk_river_opportunities'] += 1
+        counter['bbf_vs_donk_river_actions'] += features.folded
+
+
+def hand_stat_counters(preflop_aggressor_id, big_blind_amount, hand_player_rows, action_rows,
+                       street_player_rows, hand_feature_rows):
+    """
+    Contribuição de uma mão para os contadores de cada jogador: {player_id: Counter}.
+    As linhas seguem a ordem das colunas dos INSERTs de db_manager.save_hands_to_db em
+    hand_players, actions (na ordem de action_sequence), hand_street_players e hand_features.
+    """
+    counters = defaultdict(Counter)
+    seated_positions = {}
+    for row in hand_player_rows:
+        seated_positions.setdefault(row[1], row[4]) # Jogador repetido na mão: vale o primeiro assento
+    for player_id in seated_positions:
+        counter = counters[player_id]
+        counter['hands_played'] += 1
+        counter['vpip_opportunities'] += 1
+        counter['pfr_opportunities'] += 1
+
+    _add_preflop_counters(counters, seated_positions, big_blind_amount,
+                          [row for row in action_rows if row[_STREET] == STREET_PREFLOP])
+
+    river_bet_hands = {} # player_id -> [oportunidade, ação] de Bet River (uma vez por mão)
+    for row in action_rows:
+        player_id, street_code, size_group_code = row[_PLAYER], row[_STREET], row[_SIZE_GROUP]
+        if player_id is None or street_code not in _STREET_KEYS:
+            continue
+        if size_group_code is not None:
+            size_group = SIZE_GROUP_NAMES[size_group_code]
+            counters[player_id][stat_key("fold_to_bet_opportunities_by_size", STREET_NAMES[street_code], size_group)] += 1
+            if row[_ACTION] == ACTION_FOLDS:
+                counters[player_id][stat_key("fold_to_bet_actions_by_size", STREET_NAMES[street_code], size_group)] += 1
+        if street_code == STREET_RIVER and row[_ACTION] in (ACTION_BETS, ACTION_CHECKS) and row[_AMOUNT_TO_CALL] == 0:
+            river_bet = river_bet_hands.setdefault(player_id, [1, 0])
+            river_bet[1] |= row[_ACTION] == ACTION_BETS
+    for player_id, (opportunity, action) in river_bet_hands.items():
+        counters[player_id]['bet_river_opportunities'] += opportunity
+        counters[player_id]['bet_river_actions'] += action
+
+    is_ip_by_street_player = {(row[1], row[2]): row[4] for row in street_player_rows}
+    features_by_street_player = {(row[1], row[0]): HandFeatures(*row[3:]) for row in hand_feature_rows}
+    for (street_code, player_id), features in features_by_street_player.items():
+        counter = counters[player_id]
+        _add_street_counters(counter, street_code, features, is_ip_by_street_player.get((street_code, player_id)))
+        if street_code == STREET_TURN and features.faced_bet_action_code in (ACTION_CALLS, ACTION_FOLDS, ACTION_RAISES):
+            flop_features = features_by_street_player.get((STREET_FLOP, player_id))
+            if flop_features and flop_features.called_bet:
+                _add_faced_size(counter, "call_fold_turn_opportunities_by_size", "call_fold_turn_actions_by_size", features)
+        elif street_code == STREET_RIVER:
+            _add_river_line_counters(counter, player_id, features, features_by_street_player, preflop_aggressor_id)
+    return counters
+
+
+def counter_rows(counters_by_player):
+    """Linhas (player_id, stat_key, value) dos contadores não nulos, para player_stat_counters."""
+    return [(player_id, key, value)
+            for player_id, counter in counters_by_player.items()
+            for key, value in counter.items() if value]
+
+
+def apply_stat_counters(ps, counter_items):
+    """Preenche o PlayerStats (ps) com pares (stat_key, value) lidos de player_stat_counters."""
+    for key, value in counter_items:
+        attr_name, *dict_keys = key.split(STAT_KEY_SEPARATOR)
+        if not dict_keys:
+            setattr(ps, attr_name, value)
+            continue
+        target = getattr(ps, attr_name)
+        for dict_key in dict_keys[:-1]:
+            target = target[dict_key]
+        target[dict_keys[-1]] = value
+    return ps
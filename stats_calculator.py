@@ -1,12 +1,28 @@
-import math
-from collections import defaultdict
+from collections import defaultdict, Counter
+from collections.abc import Mapping
+from array import array
+import sys
+import atexit
+import struct
 import sqlite3
+import operator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import db_manager
+from poker_codes import SIZE_GROUP_NAMES, size_group_code
+from stat_counters import apply_stat_counters, stat_key
+
+try:
+    import numpy as np
+except ImportError: # NumPy é opcional: merge/subtract caem no laço slot a slot
+    np = None
 
 # Importar as funções de cálculo por street
-from stats_calculator_preflop import calculate_preflop_stats_for_player
-from stats_calculator_flop import calculate_flop_stats_for_player
-from stats_calculator_turn import calculate_turn_stats_for_player 
-from stats_calculator_river import calculate_river_stats_for_player
+from stats_calculator_preflop import calculate_preflop_stats_for_player, calculate_preflop_stats_for_players, PREFLOP_STAT_BLOCKS
+from stats_calculator_flop import calculate_flop_stats_for_player, calculate_flop_stats_for_players, FLOP_STAT_BLOCKS
+from stats_calculator_turn import calculate_turn_stats_for_player, calculate_turn_stats_for_players, TURN_STAT_BLOCKS
+from stats_calculator_river import calculate_river_stats_for_player, calculate_river_stats_for_players, RIVER_STAT_BLOCKS
+from stats_sql import player_filter, materialized_player_hands, StatQueryPlan
 
 # --- Constantes e Classe PlayerStats como antes ---
 # ... (copie POSITION_CATEGORIES, PF_POS_CATS_FOR_STATS, etc.)
@@ -44,116 +60,272 @@ def _classify_percentage(size_group, pct, thresholds_dict):
     if pct <= under_max: return "under"
     elif pct <= gto_max: return "gto"
     return "over"
+# --- Registro dos contadores de PlayerStats ---
+# Cada contador é um slot fixo do vetor PlayerStats._counters (array('q')); o nome do
+# slot segue stat_counters.stat_key ('cbet_flop_opportunities',
+# 'fold_to_bet_opportunities_by_size|Flop|30-45%'). A ordem é estável, como os códigos
+# de poker_codes: contadores novos entram SEMPRE no fim do registro, para que os blobs
+# de PlayerStats.to_bytes já gravados continuem válidos (os slots que faltam viram 0).
+STATS_STREETS = ("Flop", "Turn", "River")
+RIVER_LINE_TYPES = ("BBB", "BXB", "XBB", "XXB")
+RIVER_HAND_CATEGORIES = ("topo", "bluff_catcher", "air", "total_showdowns")
+
+# Nome do atributo (contador int) ou (nome, domínios das chaves) para os dicionários por street / linha / size
+PLAYER_STAT_COUNTERS = (
+    "hands_played",
+    "vpip_opportunities", "vpip_actions",
+    "pfr_opportunities", "pfr_actions",
+    "three_bet_pf_opportunities", "three_bet_pf_actions",
+    "fold_to_pf_3bet_opportunities", "fold_to_pf_3bet_actions",
+    "squeeze_pf_opportunities", "squeeze_pf_actions",
+    "four_bet_pf_opportunities", "four_bet_pf_actions",
+    "fold_to_pf_4bet_opportunities", "fold_to_pf_4bet_actions",
+    "fold_bb_vs_btn_steal_opportunities", "fold_bb_vs_btn_steal_actions",
+    "fold_bb_vs_co_steal_opportunities", "fold_bb_vs_co_steal_actions",
+    "fold_bb_vs_sb_steal_opportunities", "fold_bb_vs_sb_steal_actions",
+    "cbet_flop_opportunities", "cbet_flop_actions",
+    "cbet_flop_ip_opportunities", "cbet_flop_ip_actions",
+    "cbet_flop_oop_opportunities", "cbet_flop_oop_actions",
+    "fold_to_flop_cbet_opportunities", "fold_to_flop_cbet_actions",
+    "fold_to_flop_cbet_ip_opportunities", "fold_to_flop_cbet_ip_actions",
+    "fold_to_flop_cbet_oop_opportunities", "fold_to_flop_cbet_oop_actions",
+    "cbet_turn_opportunities", "cbet_turn_actions",
+    "fold_to_turn_cbet_opportunities", "fold_to_turn_cbet_actions",
+    "fold_to_turn_cbet_ip_opportunities", "fold_to_turn_cbet_ip_actions",
+    "fold_to_turn_cbet_oop_opportunities", "fold_to_turn_cbet_oop_actions",
+    "cbet_river_opportunities", "cbet_river_actions",
+    "fold_to_river_cbet_opportunities", "fold_to_river_cbet_actions",
+    "fold_to_river_cbet_ip_opportunities", "fold_to_river_cbet_ip_actions",
+    "fold_to_river_cbet_oop_opportunities", "fold_to_river_cbet_oop_actions",
+    "donk_bet_flop_opportunities", "donk_bet_flop_actions",
+    "fold_to_donk_bet_flop_opportunities", "fold_to_donk_bet_flop_actions",
+    "donk_bet_turn_opportunities", "donk_bet_turn_actions",
+    "fold_to_donk_bet_turn_opportunities", "fold_to_donk_bet_turn_actions",
+    "donk_bet_river_opportunities", "donk_bet_river_actions",
+    "fold_to_donk_bet_river_opportunities", "fold_to_donk_bet_river_actions",
+    "probe_bet_turn_opportunities", "probe_bet_turn_actions",
+    "fold_to_probe_bet_turn_opportunities", "fold_to_probe_bet_turn_actions",
+    "probe_bet_river_opportunities", "probe_bet_river_actions",
+    "fold_to_probe_bet_river_opportunities", "fold_to_probe_bet_river_actions",
+    "bet_vs_missed_cbet_flop_opportunities", "bet_vs_missed_cbet_flop_actions",
+    "fold_to_bet_vs_missed_cbet_flop_opportunities", "fold_to_bet_vs_missed_cbet_flop_actions",
+    "bet_vs_missed_cbet_turn_opportunities", "bet_vs_missed_cbet_turn_actions",
+    "fold_to_bet_vs_missed_cbet_turn_opportunities", "fold_to_bet_vs_missed_cbet_turn_actions",
+    "bet_vs_missed_cbet_river_opportunities", "bet_vs_missed_cbet_river_actions",
+    "fold_to_bet_vs_missed_cbet_river_opportunities", "fold_to_bet_vs_missed_cbet_river_actions",
+    "check_call_flop_opportunities", "check_call_flop_actions",
+    "check_fold_flop_opportunities", "check_fold_flop_actions",
+    "check_raise_flop_opportunities", "check_raise_flop_actions",
+    "fold_to_check_raise_flop_opportunities", "fold_to_check_raise_flop_actions",
+    "check_call_turn_opportunities", "check_call_turn_actions",
+    "check_fold_turn_opportunities", "check_fold_turn_actions",
+    "check_raise_turn_opportunities", "check_raise_turn_actions",
+    "fold_to_check_raise_turn_opportunities", "fold_to_check_raise_turn_actions",
+    "check_call_river_opportunities", "check_call_river_actions",
+    "check_fold_river_opportunities", "check_fold_river_actions",
+    "check_raise_river_opportunities", "check_raise_river_actions",
+    "fold_to_check_raise_river_opportunities", "fold_to_check_raise_river_actions",
+    "pfa_skipped_cbet_then_check_call_flop_opportunities", "pfa_skipped_cbet_then_check_call_flop_actions",
+    "pfa_skipped_cbet_then_check_fold_flop_opportunities", "pfa_skipped_cbet_then_check_fold_flop_actions",
+    "pfa_skipped_cbet_then_check_raise_flop_opportunities", "pfa_skipped_cbet_then_check_raise_flop_actions",
+    "bet_river_opportunities", "bet_river_actions",
+    "open_raise_ep_opportunities", "open_raise_ep_actions",
+    "open_raise_mp_opportunities", "open_raise_mp_actions",
+    "open_raise_co_opportunities", "open_raise_co_actions",
+    "open_raise_btn_opportunities", "open_raise_btn_actions",
+    "open_raise_sb_opportunities", "open_raise_sb_actions",
+    "call_open_raise_ep_opportunities", "call_open_raise_ep_actions",
+    "call_open_raise_mp_opportunities", "call_open_raise_mp_actions",
+    "call_open_raise_co_opportunities", "call_open_raise_co_actions",
+    "call_open_raise_btn_opportunities", "call_open_raise_btn_actions",
+    "call_open_raise_sb_opportunities", "call_open_raise_sb_actions",
+    "call_open_raise_bb_opportunities", "call_open_raise_bb_actions",
+    ("fold_to_bet_opportunities_by_size", (STATS_STREETS, SIZE_GROUP_NAMES)),
+    ("fold_to_bet_actions_by_size", (STATS_STREETS, SIZE_GROUP_NAMES)),
+    ("fold_to_river_bet_by_line_opportunities_by_size", (RIVER_LINE_TYPES, SIZE_GROUP_NAMES)),
+    ("fold_to_river_bet_by_line_actions_by_size", (RIVER_LINE_TYPES, SIZE_GROUP_NAMES)),
+    ("river_bet_called_composition_by_line", (RIVER_LINE_TYPES, SIZE_GROUP_NAMES, RIVER_HAND_CATEGORIES)),
+    ("call_fold_turn_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("call_fold_turn_actions_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_flop_cbet_ip_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_flop_cbet_ip_actions_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_flop_cbet_oop_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_flop_cbet_oop_actions_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_flop_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_flop_actions_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_turn_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_turn_actions_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_river_opportunities_by_size", (SIZE_GROUP_NAMES,)),
+    ("fold_to_donk_bet_river_actions_by_size", (SIZE_GROUP_NAMES,)),
+    "call_call_fold_river_ip_opportunities", "call_call_fold_river_ip_actions",
+    "call_call_fold_river_oop_opportunities", "call_call_fold_river_oop_actions",
+    "ccf_triple_barrel_opportunities", "ccf_triple_barrel_actions",
+    "bbf_vs_donk_river_opportunities", "bbf_vs_donk_river_actions",
+)
+
+def _build_stat_slots():
+    """stat_key -> índice do slot e, por dicionário, a árvore chave -> índice (ou subárvore)."""
+    slots, key_trees = {}, {}
+    def add_tree(path, domains):
+        if not domains:
+            slots[stat_key(*path)] = len(slots)
+            return len(slots) - 1
+        return {key: add_tree(path + (key,), domains[1:]) for key in domains[0]}
+    for counter in PLAYER_STAT_COUNTERS:
+        if isinstance(counter, str):
+            add_tree((counter,), ())
+        else:
+            attr_name, domains = counter
+            key_trees[attr_name] = add_tree((attr_name,), domains)
+    return slots, key_trees
+
+STAT_SLOTS, _STAT_KEY_TREES = _build_stat_slots()
+STAT_SLOT_COUNT = len(STAT_SLOTS)
+_ZERO_COUNTERS = array('q', bytes(8 * STAT_SLOT_COUNT))
+# Cabeçalho de PlayerStats.to_bytes: marca, nº de slots, tamanho do nome em UTF-8 (-1 = None)
+_STATS_BLOB_HEADER = struct.Struct("<4sIi")
+_STATS_BLOB_MAGIC = b"PST1"
+
+class _CounterSlot:
+    """Atributo int de PlayerStats guardado num slot de _counters (ps.x, ps.x += n, setattr/getattr)."""
+    __slots__ = ('index',)
+    def __init__(self, index): self.index = index
+    def __get__(self, ps, owner=None):
+        if ps is None: return self
+        return ps._counters[self.index]
+    def __set__(self, ps, value): ps._counters[self.index] = value
+
+class StatCounterMap(Mapping):
+    """
+    Visão dict (por street / linha / size) de um grupo de slots de _counters: ps.x[street][sg] += n,
+    .get(k, {}), .items(). Como nos defaultdict de antes, só as chaves com contagem aparecem na
+    iteração e len(); ler uma chave registrada sem contagem dá 0 (ou uma visão vazia), e gravar
+    uma chave fora do registro é KeyError.
+    """
+    __slots__ = ('_counters', '_tree')
+    def __init__(self, counters, tree):
+        self._counters = counters; self._tree = tree
+    def _entry(self, entry):
+        return self._counters[entry] if isinstance(entry, int) else StatCounterMap(self._counters, entry)
+    def __getitem__(self, key):
+        return self._entry(self._tree[key])
+    def __setitem__(self, key, value):
+        entry = self._tree[key]
+        if isinstance(entry, int):
+            self._counters[entry] = value
+        else:
+            sub_map = StatCounterMap(self._counters, entry)
+            sub_map.clear(); sub_map.update(value)
+    def get(self, key, default=None):
+        entry = self._tree.get(key)
+        return default if entry is None else self._entry(entry)
+    def _has_counts(self, entry):
+        if isinstance(entry, int): return self._counters[entry] != 0
+        return any(self._has_counts(sub_entry) for sub_entry in entry.values())
+    def __iter__(self):
+        return (key for key, entry in self._tree.items() if self._has_counts(entry))
+    def __len__(self): return sum(1 for _ in self)
+    def __contains__(self, key):
+        entry = self._tree.get(key)
+        return entry is not None and self._has_counts(entry)
+    def __bool__(self): return self._has_counts(self._tree)
+    def __repr__(self): return f"StatCounterMap({self.to_dict()!r})"
+    def clear(self):
+        for key, entry in self._tree.items():
+            if isinstance(entry, int): self._counters[entry] = 0
+            else: StatCounterMap(self._counters, entry).clear()
+    def update(self, values):
+        for key, value in values.items(): self[key] = value
+    def to_dict(self):
+        """dict comum (aninhado) só com as chaves que têm contagem."""
+        return {key: value.to_dict() if isinstance(value, StatCounterMap) else value for key, value in self.items()}
+
+class _CounterMapSlot:
+    """Atributo dicionário de PlayerStats: devolve a StatCounterMap dos slots dele; atribuir copia os valores."""
+    __slots__ = ('tree',)
+    def __init__(self, tree): self.tree = tree
+    def __get__(self, ps, owner=None):
+        if ps is None: return self
+        return StatCounterMap(ps._counters, self.tree)
+    def __set__(self, ps, values):
+        counter_map = StatCounterMap(ps._counters, self.tree)
+        counter_map.clear(); counter_map.update(values)
+
+def _add_counters(counters, other_counters, sign):
+    """counters += sign * other_counters, slot a slot (vetorizado com NumPy quando disponível)."""
+    if np is not None:
+        vector = np.frombuffer(counters, dtype=np.int64)
+        other_vector = np.frombuffer(other_counters, dtype=np.int64)
+        if sign > 0: vector += other_vector
+        else: vector -= other_vector
+        return
+    combine = operator.add if sign > 0 else operator.sub
+    counters[:] = array('q', map(combine, counters, other_counters))
+
 class PlayerStats:
     # ... (definição completa da classe) ...
+    # Contadores: um slot de _counters por entrada de STAT_SLOTS (ver PLAYER_STAT_COUNTERS);
+    # os atributos são descritores de classe, então cada instância guarda só player_name e o vetor.
     def __init__(self, player_name):
-        self.player_name = player_name; self.hands_played = 0
-        self.vpip_opportunities = 0; self.vpip_actions = 0
-        self.pfr_opportunities = 0; self.pfr_actions = 0
-        self.three_bet_pf_opportunities = 0; self.three_bet_pf_actions = 0
-        self.fold_to_pf_3bet_opportunities = 0; self.fold_to_pf_3bet_actions = 0
-        self.squeeze_pf_opportunities = 0; self.squeeze_pf_actions = 0
-        self.four_bet_pf_opportunities = 0; self.four_bet_pf_actions = 0
-        self.fold_to_pf_4bet_opportunities = 0; self.fold_to_pf_4bet_actions = 0
-        self.fold_bb_vs_btn_steal_opportunities = 0; self.fold_bb_vs_btn_steal_actions = 0
-        self.fold_bb_vs_co_steal_opportunities = 0; self.fold_bb_vs_co_steal_actions = 0
-        self.fold_bb_vs_sb_steal_opportunities = 0; self.fold_bb_vs_sb_steal_actions = 0
-        self.cbet_flop_opportunities = 0; self.cbet_flop_actions = 0
-        self.cbet_flop_ip_opportunities = 0; self.cbet_flop_ip_actions = 0
-        self.cbet_flop_oop_opportunities = 0; self.cbet_flop_oop_actions = 0
-        self.fold_to_flop_cbet_opportunities = 0; self.fold_to_flop_cbet_actions = 0
-        self.fold_to_flop_cbet_ip_opportunities = 0; self.fold_to_flop_cbet_ip_actions = 0
-        self.fold_to_flop_cbet_oop_opportunities = 0; self.fold_to_flop_cbet_oop_actions = 0
-        self.cbet_turn_opportunities = 0; self.cbet_turn_actions = 0
-        self.fold_to_turn_cbet_opportunities = 0; self.fold_to_turn_cbet_actions = 0
-        self.fold_to_turn_cbet_ip_opportunities = 0; self.fold_to_turn_cbet_ip_actions = 0
-        self.fold_to_turn_cbet_oop_opportunities = 0; self.fold_to_turn_cbet_oop_actions = 0
-        self.cbet_river_opportunities = 0; self.cbet_river_actions = 0
-        self.fold_to_river_cbet_opportunities = 0; self.fold_to_river_cbet_actions = 0
-        self.fold_to_river_cbet_ip_opportunities = 0; self.fold_to_river_cbet_ip_actions = 0
-        self.fold_to_river_cbet_oop_opportunities = 0; self.fold_to_river_cbet_oop_actions = 0
-        self.donk_bet_flop_opportunities = 0; self.donk_bet_flop_actions = 0
-        self.fold_to_donk_bet_flop_opportunities = 0; self.fold_to_donk_bet_flop_actions = 0
-        self.donk_bet_turn_opportunities = 0; self.donk_bet_turn_actions = 0
-        self.fold_to_donk_bet_turn_opportunities = 0; self.fold_to_donk_bet_turn_actions = 0
-        self.donk_bet_river_opportunities = 0; self.donk_bet_river_actions = 0
-        self.fold_to_donk_bet_river_opportunities = 0; self.fold_to_donk_bet_river_actions = 0
-        self.probe_bet_turn_opportunities = 0; self.probe_bet_turn_actions = 0
-        self.fold_to_probe_bet_turn_opportunities = 0; self.fold_to_probe_bet_turn_actions = 0
-        self.probe_bet_river_opportunities = 0; self.probe_bet_river_actions = 0
-        self.fold_to_probe_bet_river_opportunities = 0; self.fold_to_probe_bet_river_actions = 0
-        self.bet_vs_missed_cbet_flop_opportunities = 0
-        self.bet_vs_missed_cbet_flop_actions = 0
-        self.fold_to_bet_vs_missed_cbet_flop_opportunities = 0
-        self.fold_to_bet_vs_missed_cbet_flop_actions = 0
-        self.bet_vs_missed_cbet_turn_opportunities = 0
-        self.bet_vs_missed_cbet_turn_actions = 0
-        self.fold_to_bet_vs_missed_cbet_turn_opportunities = 0
-        self.fold_to_bet_vs_missed_cbet_turn_actions = 0
-        self.bet_vs_missed_cbet_river_opportunities = 0
-        self.bet_vs_missed_cbet_river_actions = 0
-        self.fold_to_bet_vs_missed_cbet_river_opportunities = 0
-        self.fold_to_bet_vs_missed_cbet_river_actions = 0
-        self.check_call_flop_opportunities = 0; self.check_call_flop_actions = 0
-        self.check_fold_flop_opportunities = 0; self.check_fold_flop_actions = 0
-        self.check_raise_flop_opportunities = 0; self.check_raise_flop_actions = 0
-        self.fold_to_check_raise_flop_opportunities = 0; self.fold_to_check_raise_flop_actions = 0
-        self.check_call_turn_opportunities = 0; self.check_call_turn_actions = 0
-        self.check_fold_turn_opportunities = 0; self.check_fold_turn_actions = 0
-        self.check_raise_turn_opportunities = 0; self.check_raise_turn_actions = 0
-        self.fold_to_check_raise_turn_opportunities = 0; self.fold_to_check_raise_turn_actions = 0
-        self.check_call_river_opportunities = 0; self.check_call_river_actions = 0
-        self.check_fold_river_opportunities = 0; self.check_fold_river_actions = 0
-        self.check_raise_river_opportunities = 0; self.check_raise_river_actions = 0
-        self.fold_to_check_raise_river_opportunities = 0; self.fold_to_check_raise_river_actions = 0
-        self.pfa_skipped_cbet_then_check_call_flop_opportunities = 0
-        self.pfa_skipped_cbet_then_check_call_flop_actions = 0
-        self.pfa_skipped_cbet_then_check_fold_flop_opportunities = 0
-        self.pfa_skipped_cbet_then_check_fold_flop_actions = 0
-        self.pfa_skipped_cbet_then_check_raise_flop_opportunities = 0
-        self.pfa_skipped_cbet_then_check_raise_flop_actions = 0
-        self.bet_river_opportunities = 0; self.bet_river_actions = 0
-        for pos_cat in PF_POS_CATS_FOR_STATS:
-            setattr(self, f"open_raise_{pos_cat.lower()}_opportunities", 0)
-            setattr(self, f"open_raise_{pos_cat.lower()}_actions", 0)
-        for pos_cat in PF_POS_CATS_FOR_CALL_STATS:
-            setattr(self, f"call_open_raise_{pos_cat.lower()}_opportunities", 0)
-            setattr(self, f"call_open_raise_{pos_cat.lower()}_actions", 0)
-        self.fold_to_bet_opportunities_by_size = defaultdict(dd_int)
-        self.fold_to_bet_actions_by_size = defaultdict(dd_int)
-        self.fold_to_river_bet_by_line_opportunities_by_size = defaultdict(dd_int)
-        self.fold_to_river_bet_by_line_actions_by_size = defaultdict(dd_int)
-        self.river_bet_called_composition_by_line = defaultdict(line_type_factory)
-        self.call_fold_turn_opportunities_by_size = defaultdict(int)
-        self.call_fold_turn_actions_by_size = defaultdict(int)
-        self.fold_to_flop_cbet_ip_opportunities_by_size = defaultdict(int)
-        self.fold_to_flop_cbet_ip_actions_by_size = defaultdict(int)
-        self.fold_to_flop_cbet_oop_opportunities_by_size = defaultdict(int)
-        self.fold_to_flop_cbet_oop_actions_by_size = defaultdict(int)
-        self.fold_to_donk_bet_flop_opportunities_by_size = defaultdict(int)
-        self.fold_to_donk_bet_flop_actions_by_size = defaultdict(int)
-        self.fold_to_donk_bet_turn_opportunities_by_size = defaultdict(int)
-        self.fold_to_donk_bet_turn_actions_by_size = defaultdict(int)
-        self.fold_to_donk_bet_river_opportunities_by_size = defaultdict(int)
-        self.fold_to_donk_bet_river_actions_by_size = defaultdict(int)
-        self.call_call_fold_river_ip_opportunities = 0
-        self.call_call_fold_river_ip_actions = 0
-        self.call_call_fold_river_oop_opportunities = 0
-        self.call_call_fold_river_oop_actions = 0
-        self.ccf_triple_barrel_opportunities = 0
-        self.ccf_triple_barrel_actions = 0
-        self.bbf_vs_donk_river_opportunities = 0
-        self.bbf_vs_donk_river_actions = 0
+        self.player_name = player_name
+        self._counters = array('q', _ZERO_COUNTERS)
+
+    def copy(self):
+        ps = PlayerStats.__new__(PlayerStats)
+        ps.player_name = self.player_name; ps._counters = array('q', self._counters)
+        return ps
+
+    def merge(self, other):
+        """Soma os contadores de other (p. ex. outra sessão ou outro lote de mãos) aos deste objeto."""
+        _add_counters(self._counters, other._counters, 1)
+        return self
+    __iadd__ = merge
+
+    def subtract(self, other):
+        """Tira os contadores de other (p. ex. mãos removidas), o inverso de merge."""
+        _add_counters(self._counters, other._counters, -1)
+        return self
+    __isub__ = subtract
+
+    def __add__(self, other): return self.copy().merge(other)
+    def __sub__(self, other): return self.copy().subtract(other)
+
+    def counter_values(self):
+        """{stat_key: valor} dos contadores diferentes de zero (nomes de STAT_SLOTS)."""
+        counters = self._counters
+        return {name: counters[index] for name, index in STAT_SLOTS.items() if counters[index]}
+
+    def to_bytes(self):
+        """Serialização compacta: cabeçalho, nome do jogador em UTF-8 e os slots em int64 little-endian."""
+        name_bytes = b"" if self.player_name is None else self.player_name.encode("utf-8")
+        counters = self._counters
+        if sys.byteorder != "little":
+            counters = array('q', counters); counters.byteswap()
+        header = _STATS_BLOB_HEADER.pack(_STATS_BLOB_MAGIC, len(counters), -1 if self.player_name is None else len(name_bytes))
+        return header + name_bytes + counters.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverso de to_bytes; blobs de um registro mais antigo (menos slots) são completados com zeros."""
+        magic, slot_count, name_length = _STATS_BLOB_HEADER.unpack_from(data)
+        if magic != _STATS_BLOB_MAGIC:
+            raise ValueError("Blob de PlayerStats inválido.")
+        if slot_count > STAT_SLOT_COUNT:
+            raise ValueError(f"Blob de PlayerStats com {slot_count} contadores; este registro tem {STAT_SLOT_COUNT}.")
+        offset = _STATS_BLOB_HEADER.size
+        ps = cls.__new__(cls)
+        ps.player_name = None if name_length < 0 else bytes(data[offset:offset + name_length]).decode("utf-8")
+        offset += max(name_length, 0)
+        counters = array('q')
+        counters.frombytes(data[offset:offset + 8 * slot_count])
+        if sys.byteorder != "little": counters.byteswap()
+        counters.extend(_ZERO_COUNTERS[slot_count:])
+        ps._counters = counters
+        return ps
 
     def get_bet_size_group(self, bet_percentage_pot):
-        if bet_percentage_pot is None or math.isnan(bet_percentage_pot) or math.isinf(bet_percentage_pot):
-            return "N/A"
-        if bet_percentage_pot <= 29.99: return "0-29%"
-        if bet_percentage_pot <= 45.99: return "30-45%"
-        if bet_percentage_pot <= 56.99: return "46-56%"
-        if bet_percentage_pot <= 70.99: return "57-70%"
-        if bet_percentage_pot <= 100.99: return "80-100%"
-        return "101%+"
+        size_group = size_group_code(bet_percentage_pot) # Grupos em poker_codes.SIZE_GROUP_NAMES
+        return "N/A" if size_group is None else SIZE_GROUP_NAMES[size_group]
 
     def get_stat_percentage(self, actions, opportunities):
         if opportunities == 0: return 0.0
@@ -612,39 +784,221 @@ class PlayerStats:
                         d[f"River {lt} {sg} Bluff vs MDF"] = self.get_river_bluff_over_under_display(lt, sg)
         return d
 
+for _counter in PLAYER_STAT_COUNTERS:
+    if isinstance(_counter, str):
+        setattr(PlayerStats, _counter, _CounterSlot(STAT_SLOTS[_counter]))
+    else:
+        setattr(PlayerStats, _counter[0], _CounterMapSlot(_STAT_KEY_TREES[_counter[0]]))
+del _counter
+
 def player_stats_factory(): # Adicionado para compatibilidade com defaultdict
     return PlayerStats(None)
 
+# Acima disso, um IN com os IDs pesa mais que agrupar todos e descartar os que não foram pedidos
+MAX_FILTERED_PLAYERS = 500
+
+
+def load_stats_for_single_player(conn: sqlite3.Connection, player_id: int, player_name: str) -> PlayerStats:
+    """
+    Monta o PlayerStats de UM jogador a partir de player_stat_counters (mantida pela
+    importação, ver stat_counters.py): uma leitura pela chave primária, sem recalcular
+    o histórico. Inclui as stats de Turn e River.
+    """
+    ps = PlayerStats(player_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT stat_key, value FROM player_stat_counters WHERE player_id = ?", (player_id,))
+    apply_stat_counters(ps, cursor.fetchall())
+    if ps.hands_played == 0:
+        return PlayerStats(player_name) # Mesmo resultado de calculate_stats_for_single_player: stats zeradas
+    return ps
+
+
+# Modo concorrente de calculate_stats_for_single_player: uma tarefa por street num pool de
+# threads; cada thread do pool mantém uma conexão somente leitura com o último arquivo de
+# banco usado (o sqlite3 solta o GIL enquanto a consulta executa, então as streets andam em
+# paralelo). close_street_connections encerra o pool e as conexões (também no atexit).
+STREET_CALCULATORS = (calculate_preflop_stats_for_players, calculate_flop_stats_for_players,
+                      calculate_turn_stats_for_players, calculate_river_stats_for_players)
+_street_executor = None
+_street_executor_lock = threading.Lock()
+_street_connections = threading.local()
 
-def calculate_stats_for_single_player(conn: sqlite3.Connection, player_id: int, player_name: str) -> PlayerStats:
+
+def _get_street_executor():
+    global _street_executor
+    with _street_executor_lock:
+        if _street_executor is None:
+            _street_executor = ThreadPoolExecutor(max_workers=len(STREET_CALCULATORS), thread_name_prefix="street_stats")
+        return _street_executor
+
+
+def _street_connection(db_path):
+    # Trocar de banco (stats_population, benchmarks) fecha a conexão anterior da thread
+    current = getattr(_street_connections, "current", None)
+    if current is not None and current[0] != db_path:
+        current[1].close()
+        current = None
+    if current is None:
+        current = _street_connections.current = (db_path, db_manager.get_read_only_connection(db_path=db_path))
+    return current[1]
+
+
+def close_street_connections():
+    """
+    Encerra o pool de threads das streets. As conexões ficam no threading.local de cada
+    thread e são fechadas quando a thread termina (o sqlite3 não deixa fechá-las de outra
+    thread). O próximo calculate_stats_for_single_player(concurrent_streets=True) recria o pool.
+    """
+    global _street_executor
+    with _street_executor_lock:
+        executor, _street_executor = _street_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+atexit.register(close_street_connections)
+
+
+def _calculate_street_worker(calculate_street, db_path, player_id, player_name):
+    """
+    Executado no pool: uma street num PlayerStats zerado (as streets preenchem contadores
+    disjuntos), com o StatQueryPlan da thread. Retorna (PlayerStats, leituras por tabela).
+    """
+    street_ps = PlayerStats(player_name)
+    cursor = _street_connection(db_path).cursor()
+    plan = StatQueryPlan(cursor, [player_id])
+    calculate_street({player_id: street_ps}, cursor, [player_id], plan)
+    return street_ps, plan.table_reads
+
+
+def _calculate_streets_concurrently(ps, conn, player_id):
+    """Soma as quatro streets em ps; retorna as leituras por tabela (Counter) de todas elas."""
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_path: # Banco em memória: as outras conexões não o enxergam
+        cursor = conn.cursor()
+        plan = StatQueryPlan(cursor, [player_id])
+        for calculate_street in STREET_CALCULATORS:
+            calculate_street({player_id: ps}, cursor, [player_id], plan)
+        return plan.table_reads
+    executor = _get_street_executor()
+    futures = [executor.submit(_calculate_street_worker, calculate_street, db_path, player_id, ps.player_name)
+               for calculate_street in STREET_CALCULATORS]
+    table_reads = Counter()
+    for future in futures:
+        street_ps, street_reads = future.result()
+        ps.merge(street_ps)
+        table_reads.update(street_reads)
+    return table_reads
+
+
+def calculate_stats_for_single_player(conn: sqlite3.Connection, player_id: int, player_name: str,
+                                      concurrent_streets: bool = False, materialize_hands: bool = False) -> PlayerStats:
     """
     Calcula TODAS as estatísticas para UM jogador específico a partir do banco de dados.
     Chama funções auxiliares para cada street.
+    concurrent_streets=True: Pré-Flop, Flop, Turn e River rodam ao mesmo tempo, cada um numa
+    conexão somente leitura do pool de threads, e são somados num PlayerStats; o tempo fica
+    perto do da street mais lenta (inclui Turn e River, como calculate_stats_for_all_players).
+    materialize_hands=True: antes das consultas, as mãos do jogador (e as ações delas) são
+    copiadas para tabelas TEMP indexadas (stats_sql.materialized_player_hands), então o custo
+    acompanha o volume do jogador e não o do banco. Com os índices por jogador das tabelas
+    principais (idx_hand_players_player, PK de hand_features) o caminho direto também só lê as
+    linhas do jogador e sai mais barato que a cópia; o bloco materialized_player_hands também
+    serve para rodar outras consultas avulsas sobre as mãos do jogador.
     """
+    if materialize_hands:
+        if concurrent_streets:
+            raise ValueError("materialize_hands usa tabelas TEMP desta conexão; não combina com concurrent_streets.")
+        with materialized_player_hands(conn, player_id):
+            return calculate_stats_for_single_player(conn, player_id, player_name)
+
     ps = PlayerStats(player_name) # Cria o objeto de estatísticas
     cursor = conn.cursor()
+    # Blocos compartilhados (stats_sql.STAT_BLOCKS) das streets calculadas, lidos uma vez
+    plan = StatQueryPlan(cursor, [player_id], PREFLOP_STAT_BLOCKS + FLOP_STAT_BLOCKS)
 
-    # --- Hands Played (calculado uma vez) ---
-    cursor.execute("SELECT COUNT(DISTINCT hand_db_id) FROM hand_players WHERE player_id = ?", (player_id,))
-    count_row = cursor.fetchone()
-    ps.hands_played = count_row[0] if count_row and count_row[0] is not None else 0
+    # --- Hands Played (calculado uma vez; o mesmo bloco dá as oportunidades de VPIP e PFR) ---
+    hands_rows = plan.rows("player_hands")
+    ps.hands_played = hands_rows[0][1] if hands_rows and hands_rows[0][1] is not None else 0
 
     if ps.hands_played == 0:
         print(f"Jogador {player_name} (ID: {player_id}) não tem mãos jogadas. Pulando cálculo de stats.")
         return ps # Retorna stats zeradas
 
+    if concurrent_streets:
+        print(f"  Calculando stats de Pré-Flop, Flop, Turn e River em paralelo para {player_name}...")
+        table_reads = _calculate_streets_concurrently(ps, conn, player_id)
+        # No pool cada thread tem o seu plano: os blocos não são compartilhados entre as streets
+        print(f"  {table_reads['actions']} leituras de actions para {player_name}.")
+        return ps
+
     print(f"  Calculando stats Pré-Flop para {player_name}...")
-    calculate_preflop_stats_for_player(ps, cursor, player_id)
+    calculate_preflop_stats_for_player(ps, cursor, player_id, plan)
     
     print(f"  Calculando stats de Flop para {player_name}...")
-    calculate_flop_stats_for_player(ps, cursor, player_id)
+    calculate_flop_stats_for_player(ps, cursor, player_id, plan)
     
     # print(f"  Calculando stats de Turn para {player_name}...")
-    # calculate_turn_stats_for_player(ps, cursor, player_id) # A ser implementado
+    # calculate_turn_stats_for_player(ps, cursor, player_id, plan) # A ser implementado (declarar TURN_STAT_BLOCKS no plano)
     
     # print(f"  Calculando stats de River para {player_name}...")
-    # calculate_river_stats_for_player(ps, cursor, player_id) # A ser implementado
+    # calculate_river_stats_for_player(ps, cursor, player_id, plan) # A ser implementado (declarar RIVER_STAT_BLOCKS no plano)
 
     # Adicione aqui quaisquer cálculos de stats que cruzam streets ou são gerais após os de street
-    
-    return ps
\ No newline at end of file
+
+    print(f"  {plan.table_reads['actions']} leituras de actions para {player_name} ({len(plan.blocks)} blocos compartilhados).")
+    return ps
+
+
+def calculate_stats_for_all_players(conn: sqlite3.Connection, player_ids=None) -> dict:
+    """
+    Calcula as estatísticas de TODOS os jogadores (ou dos player_ids informados) de uma vez:
+    cada stat é uma consulta agrupada por player_id (e o 3bet uma leitura ordenada das ações
+    de pré-flop), em vez de ~12 consultas por jogador. Mesmos campos de
+    calculate_stats_for_single_player, incluindo Turn e River.
+    Retorna {player_name: PlayerStats}.
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row # Só neste cursor: a conexão é do chamador
+
+    if player_ids is None:
+        cursor.execute("SELECT player_id, player_name FROM players")
+        player_rows = cursor.fetchall()
+        query_ids = None
+    else:
+        # Muitos IDs: lê os jogadores em blocos e as stats sem filtro (agrupadas para todos;
+        # os jogadores que não foram pedidos são descartados)
+        player_ids = list(player_ids)
+        player_rows = []
+        for start in range(0, len(player_ids), MAX_FILTERED_PLAYERS):
+            chunk_sql, chunk_params = player_filter("player_id", player_ids[start:start + MAX_FILTERED_PLAYERS])
+            cursor.execute(f"SELECT player_id, player_name FROM players WHERE {chunk_sql}", chunk_params)
+            player_rows.extend(cursor.fetchall())
+        query_ids = player_ids if len(player_ids) <= MAX_FILTERED_PLAYERS else None
+    stats_by_player_id = {row['player_id']: PlayerStats(row['player_name']) for row in player_rows}
+    if not stats_by_player_id:
+        return {}
+
+    # Blocos compartilhados entre as streets (stats_sql.STAT_BLOCKS): cada um é lido uma vez
+    # e alimenta todas as stats que o declaram (p. ex. o FTS por size das três streets pós-flop)
+    plan = StatQueryPlan(cursor, query_ids,
+                         PREFLOP_STAT_BLOCKS + FLOP_STAT_BLOCKS + TURN_STAT_BLOCKS + RIVER_STAT_BLOCKS)
+
+    # --- Hands Played ---
+    for row in plan.rows("player_hands"):
+        ps = stats_by_player_id.get(row[0])
+        if ps is not None:
+            ps.hands_played = row[1] or 0
+
+    print(f"  Calculando stats de {len(stats_by_player_id)} jogadores...")
+    calculate_preflop_stats_for_players(stats_by_player_id, cursor, query_ids, plan)
+    calculate_flop_stats_for_players(stats_by_player_id, cursor, query_ids, plan)
+    calculate_turn_stats_for_players(stats_by_player_id, cursor, query_ids, plan)
+    calculate_river_stats_for_players(stats_by_player_id, cursor, query_ids, plan)
+    print(f"  {plan.table_reads['actions']} leituras de actions ({len(plan.blocks)} blocos compartilhados).")
+
+    # Sem mãos jogadas: stats zeradas, como em calculate_stats_for_single_player
+    return {
+        ps.player_name: ps if ps.hands_played else PlayerStats(ps.player_name)
+        for ps in stats_by_player_id.values()
+    }
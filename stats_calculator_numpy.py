@@ -0,0 +1,358 @@
+# stats_calculator_numpy.py
+"""
+Motor colunar (NumPy) das stats pós-flop de TODOS os jogadores, alternativo às
+consultas SQL dos stats_calculator_*: actions, hands e hand_players são lidas uma
+única vez para arrays (códigos inteiros de poker_codes, mãos delimitadas por
+offsets) e cada stat é uma máscara vetorizada contada com np.bincount.
+
+Mesma semântica de hand_features.py (agressor da street = PFA / FA / TA, donk
+antes do agressor agir, probe depois de street checada, check-raise, primeira
+aposta enfrentada) e do FTS por size de actions.size_group_code. Preenche os
+campos de PlayerStats listados em NUMPY_STAT_FIELDS (CBet, Fold to CBet, Donk,
+Probe, Check-Raise, FTS por size) e hands_played; os demais ficam zerados.
+
+NumPy é opcional: sem ele NUMPY_AVAILABLE é False e o cálculo levanta RuntimeError.
+"""
+from collections import namedtuple
+from itertools import chain
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError: # Dependência opcional: o caminho SQL continua funcionando sem ela
+    np = None
+    NUMPY_AVAILABLE = False
+
+from poker_codes import (STREET_FLOP, ACTION_FOLDS, ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES,
+                         SIZE_GROUP_NAMES)
+from hand_parser import POSTFLOP_STREET_CODES
+from stats_calculator import PlayerStats
+
+# Colunas das ações, na ordem da mão (hand_db_id, action_sequence); player_id e
+# size_group_code NULL viram -1. hand_offsets[h]:hand_offsets[h + 1] são as ações da mão h
+# (mesma ordem de hand_ids e dos agressores). load_action_columns lê só as ações pós-flop;
+# action_store.open_action_columns traz todas as streets a partir dos arquivos mapeados.
+# Ficam fora dos cálculos as ações de outras streets.
+ActionColumns = namedtuple('ActionColumns', (
+    'hand_ids', 'hand_offsets', 'aggressor_ids',
+    'street_code', 'action_code', 'player_id', 'bet_faced', 'size_group_code',
+))
+
+# Campos de PlayerStats calculados pelo motor (por street onde a stat existe)
+NUMPY_STAT_FIELDS = (
+    'cbet_flop_opportunities', 'cbet_flop_actions', 'cbet_flop_ip_opportunities', 'cbet_flop_ip_actions',
+    'cbet_flop_oop_opportunities', 'cbet_flop_oop_actions',
+    'cbet_turn_opportunities', 'cbet_turn_actions', 'cbet_river_opportunities', 'cbet_river_actions',
+    'fold_to_flop_cbet_opportunities', 'fold_to_flop_cbet_actions',
+    'fold_to_flop_cbet_ip_opportunities', 'fold_to_flop_cbet_ip_actions',
+    'fold_to_flop_cbet_oop_opportunities', 'fold_to_flop_cbet_oop_actions',
+    'fold_to_flop_cbet_ip_opportunities_by_size', 'fold_to_flop_cbet_ip_actions_by_size',
+    'fold_to_flop_cbet_oop_opportunities_by_size', 'fold_to_flop_cbet_oop_actions_by_size',
+    'fold_to_turn_cbet_opportunities', 'fold_to_turn_cbet_actions',
+    'fold_to_turn_cbet_ip_opportunities', 'fold_to_turn_cbet_ip_actions',
+    'fold_to_turn_cbet_oop_opportunities', 'fold_to_turn_cbet_oop_actions',
+    'fold_to_river_cbet_opportunities', 'fold_to_river_cbet_actions',
+    'fold_to_river_cbet_ip_opportunities', 'fold_to_river_cbet_ip_actions',
+    'fold_to_river_cbet_oop_opportunities', 'fold_to_river_cbet_oop_actions',
+    'donk_bet_flop_opportunities', 'donk_bet_flop_actions',
+    'donk_bet_turn_opportunities', 'donk_bet_turn_actions',
+    'donk_bet_river_opportunities', 'donk_bet_river_actions',
+    'fold_to_donk_bet_flop_opportunities', 'fold_to_donk_bet_flop_actions',
+    'fold_to_donk_bet_turn_opportunities', 'fold_to_donk_bet_turn_actions',
+    'fold_to_donk_bet_river_opportunities', 'fold_to_donk_bet_river_actions',
+    'fold_to_donk_bet_flop_opportunities_by_size', 'fold_to_donk_bet_flop_actions_by_size',
+    'fold_to_donk_bet_turn_opportunities_by_size', 'fold_to_donk_bet_turn_actions_by_size',
+    'fold_to_donk_bet_river_opportunities_by_size', 'fold_to_donk_bet_river_actions_by_size',
+    'probe_bet_turn_opportunities', 'probe_bet_turn_actions',
+    'probe_bet_river_opportunities', 'probe_bet_river_actions',
+    'fold_to_probe_bet_turn_opportunities', 'fold_to_probe_bet_turn_actions',
+    'fold_to_probe_bet_river_opportunities', 'fold_to_probe_bet_river_actions',
+    'check_raise_flop_opportunities', 'check_raise_flop_actions',
+    'check_raise_turn_opportunities', 'check_raise_turn_actions',
+    'check_raise_river_opportunities', 'check_raise_river_actions',
+    'fold_to_bet_opportunities_by_size', 'fold_to_bet_actions_by_size',
+)
+
+_STREET_KEYS = ('flop', 'turn', 'river')
+_STREET_NAMES = ('Flop', 'Turn', 'River')
+_SIZE_GROUPS = len(SIZE_GROUP_NAMES)
+
+
+def _require_numpy():
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("NumPy não está instalado: use stats_calculator.calculate_stats_for_all_players.")
+
+
+def load_action_columns(conn):
+    """Lê hands e as ações pós-flop de actions para um ActionColumns (uma leitura de cada tabela)."""
+    _require_numpy()
+    hand_rows = conn.execute("""
+        SELECT hand_db_id, COALESCE(preflop_aggressor_id, -1), COALESCE(flop_aggressor_id, -1), COALESCE(turn_aggressor_id, -1)
+        FROM hands ORDER BY hand_db_id
+    """)
+    hands = np.fromiter(chain.from_iterable(hand_rows), dtype=np.int64).reshape(-1, 4)
+    placeholders = ",".join("?" * len(POSTFLOP_STREET_CODES))
+    action_rows = conn.execute(f"""
+        SELECT hand_db_id, street_code, action_code, COALESCE(player_id, -1),
+               COALESCE(bet_faced_by_player_amount, 0), COALESCE(size_group_code, -1)
+        FROM actions
+        WHERE street_code IN ({placeholders})
+        ORDER BY hand_db_id, action_sequence
+    """, POSTFLOP_STREET_CODES)
+    actions = np.fromiter(chain.from_iterable(action_rows), dtype=np.float64).reshape(-1, 6)
+    action_hand_ids = actions[:, 0].astype(np.int64)
+    hand_ids = hands[:, 0]
+    hand_offsets = np.searchsorted(action_hand_ids, hand_ids, side='left')
+    return ActionColumns(
+        hand_ids=hand_ids,
+        hand_offsets=np.append(hand_offsets, len(action_hand_ids)),
+        aggressor_ids=hands[:, 1:4],
+        street_code=actions[:, 1].astype(np.int8),
+        action_code=actions[:, 2].astype(np.int8),
+        player_id=actions[:, 3].astype(np.int64),
+        bet_faced=actions[:, 4],
+        size_group_code=actions[:, 5].astype(np.int8),
+    )
+
+
+def _exclusive_count_in_segment(flags, segment_start):
+    """Para cada ação, quantas ações anteriores da mesma (mão, street) têm flags."""
+    counts = np.cumsum(flags, dtype=np.int64)
+    counts -= flags
+    return counts - counts[segment_start]
+
+
+def _first_index_per_group(group, mask, groups_count):
+    """Índice da primeira ação com mask em cada grupo (as ações já estão na ordem da mão); -1 se não há."""
+    no_action = len(group)
+    first_index = np.full(groups_count, no_action, dtype=np.int64)
+    indexes = np.flatnonzero(mask)
+    np.minimum.at(first_index, group[indexes], indexes)
+    first_index[first_index == no_action] = -1
+    return first_index
+
+
+def compute_player_counters(columns, player_index_by_id, players_count):
+    """
+    Calcula os contadores das stats pós-flop de todos os jogadores com máscaras vetorizadas.
+    player_index_by_id: array player_id -> índice denso (-1 = ignorar).
+    Retorna {nome do campo de PlayerStats: array por jogador}, com arrays
+    (jogadores, SIZE_GROUPS) para os campos por size e (jogadores, 3 streets, SIZE_GROUPS)
+    para fold_to_bet_*_by_size.
+    """
+    _require_numpy()
+    counters = {}
+    bincount = lambda indexes: np.bincount(indexes, minlength=players_count)
+    bincount_by_size = lambda indexes, size_codes: np.bincount(
+        indexes * _SIZE_GROUPS + size_codes, minlength=players_count * _SIZE_GROUPS).reshape(players_count, _SIZE_GROUPS)
+
+    hand_lengths = np.diff(columns.hand_offsets)
+    all_hand_index = np.repeat(np.arange(len(columns.hand_ids)), hand_lengths)
+    all_street = columns.street_code.astype(np.int64) - STREET_FLOP
+    all_player = np.where(columns.player_id >= 0,
+                          player_index_by_id[np.clip(columns.player_id, 0, len(player_index_by_id) - 1)], -1)
+    postflop = (all_street >= 0) & (all_street < 3) # As colunas podem trazer todas as streets (action_store)
+
+    # --- FTS por Size (todas as ações diante de uma aposta, como em actions.size_group_code) ---
+    sized = postflop & (columns.size_group_code >= 0) & (all_player >= 0)
+    fts_keys = (all_player[sized] * 3 + all_street[sized]) * _SIZE_GROUPS + columns.size_group_code[sized]
+    fts_folds = columns.action_code[sized] == ACTION_FOLDS
+    counters['fold_to_bet_opportunities_by_size'] = np.bincount(
+        fts_keys, minlength=players_count * 3 * _SIZE_GROUPS).reshape(players_count, 3, _SIZE_GROUPS)
+    counters['fold_to_bet_actions_by_size'] = np.bincount(
+        fts_keys[fts_folds], minlength=players_count * 3 * _SIZE_GROUPS).reshape(players_count, 3, _SIZE_GROUPS)
+
+    # Só as ações voluntárias com jogador (as mesmas de hand_features)
+    voluntary = np.isin(columns.action_code, (ACTION_FOLDS, ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES)) \
+        & (columns.player_id >= 0) & postflop
+    hand_index = all_hand_index[voluntary]
+    street = all_street[voluntary]
+    action = columns.action_code[voluntary]
+    player_id = columns.player_id[voluntary]
+    player = all_player[voluntary]
+    size_code = columns.size_group_code[voluntary]
+    faced = columns.bet_faced[voluntary] > 0
+    actions_count = len(action)
+    indexes = np.arange(actions_count)
+
+    # Segmento = (mão, street): as ações já estão agrupadas por mão e, dentro dela, por street
+    segment_key = hand_index * 3 + street
+    segment_starts_mask = np.ones(actions_count, dtype=bool)
+    segment_starts_mask[1:] = segment_key[1:] != segment_key[:-1]
+    segment = np.cumsum(segment_starts_mask) - 1
+    segment_first = np.flatnonzero(segment_starts_mask)
+    segment_start = segment_first[segment]
+    segments_count = len(segment_first)
+    segment_hand = hand_index[segment_first]
+    segment_street = street[segment_first]
+
+    # Agressor da street (PFA / FA / TA) e se houve aposta na street anterior (donk x probe)
+    aggressor = columns.aggressor_ids[hand_index, street]
+    is_aggressor = (player_id == aggressor) & (aggressor >= 0)
+    is_bet_or_raise = (action == ACTION_BETS) | (action == ACTION_RAISES)
+    street_had_bet = np.zeros((len(columns.hand_ids), 3), dtype=bool)
+    street_had_bet[hand_index[is_bet_or_raise], street[is_bet_or_raise]] = True
+    segment_lead_is_donk = (segment_street == 0) | street_had_bet[segment_hand, np.maximum(segment_street - 1, 0)]
+    bet_before = _exclusive_count_in_segment(is_bet_or_raise, segment_start) > 0
+    aggressor_acted_before = _exclusive_count_in_segment(is_aggressor, segment_start) > 0
+
+    # Grupo = (segmento, jogador), na ordem da primeira ação do jogador na street
+    order = np.lexsort((indexes, player_id, segment))
+    sorted_segment, sorted_player = segment[order], player_id[order]
+    group_starts_mask = np.ones(actions_count, dtype=bool)
+    group_starts_mask[1:] = (sorted_segment[1:] != sorted_segment[:-1]) | (sorted_player[1:] != sorted_player[:-1])
+    group = np.empty(actions_count, dtype=np.int64)
+    group[order] = np.cumsum(group_starts_mask) - 1
+    group_first = order[group_starts_mask]
+    groups_count = len(group_first)
+    group_segment = segment[group_first]
+    group_street = street[group_first]
+    group_player = player[group_first]
+    group_is_aggressor = is_aggressor[group_first]
+    group_any = lambda mask: np.bincount(group[mask], minlength=groups_count) > 0
+
+    # Donk / Probe: primeira ação do jogador (bet ou check) antes de qualquer aposta e de o agressor agir
+    first_action = group_first
+    lead_opportunity = ~is_aggressor[first_action] & (aggressor[first_action] >= 0) \
+        & ~aggressor_acted_before[first_action] & ~bet_before[first_action] \
+        & ((action[first_action] == ACTION_BETS) | (action[first_action] == ACTION_CHECKS))
+    lead_action = lead_opportunity & group_any(action == ACTION_BETS)
+    group_lead_is_donk = segment_lead_is_donk[group_segment]
+    lead_bet = (action == ACTION_BETS) & lead_opportunity[group]
+    lead_bet_before = _exclusive_count_in_segment(lead_bet, segment_start) > 0
+
+    # CBet: o agressor age (bet ou check) sem aposta antes; ação: essa primeira ação sem aposta é um bet
+    unopened = (action == ACTION_BETS) | (action == ACTION_CHECKS)
+    aggressor_unopened = is_aggressor & ~bet_before & unopened
+    cbet_opportunity = group_any(aggressor_unopened)
+    first_unopened = _first_index_per_group(group, unopened, groups_count)
+    cbet_bet = aggressor_unopened & (action == ACTION_BETS)
+    cbet_action = group_any(cbet_bet) & (first_unopened >= 0) & (action[np.maximum(first_unopened, 0)] == ACTION_BETS)
+    cbet_before = _exclusive_count_in_segment(cbet_bet, segment_start) > 0
+
+    # Primeira aposta enfrentada na street: tamanho e reação; fold em qualquer ponto da street
+    faced_index = _first_index_per_group(group, faced, groups_count)
+    has_faced = faced_index >= 0
+    safe_faced_index = np.maximum(faced_index, 0)
+    faced_size = size_code[safe_faced_index]
+    faced_action = action[safe_faced_index]
+    folded = group_any(action == ACTION_FOLDS)
+    faced_cbet = has_faced & ~group_is_aggressor & cbet_before[safe_faced_index]
+    faced_lead = has_faced & group_is_aggressor & lead_bet_before[safe_faced_index]
+
+    # Check-Raise: deu check e volta a agir enfrentando aposta; ação: raise
+    first_check = _first_index_per_group(group, action == ACTION_CHECKS, groups_count)
+    check_raise_opportunity = has_faced & (first_check >= 0) & (first_check < faced_index)
+    check_raise_action = check_raise_opportunity & (faced_action == ACTION_RAISES)
+
+    # IP/OOP: quem enfrenta o agressor age depois dele; o agressor é IP se ninguém que
+    # ficou na street (sem fold) age depois dele (como hand_street_players.is_ip)
+    segment_aggressor_first = np.full(segments_count, actions_count, dtype=np.int64)
+    np.minimum.at(segment_aggressor_first, group_segment[group_is_aggressor], group_first[group_is_aggressor])
+    ip_vs_aggressor = group_first > segment_aggressor_first[group_segment]
+    others_active = ~group_is_aggressor & ~folded
+    segment_last_other_active = np.full(segments_count, -1, dtype=np.int64)
+    np.maximum.at(segment_last_other_active, group_segment[others_active], group_first[others_active])
+    aggressor_is_ip = group_first > segment_last_other_active[group_segment]
+
+    counted = group_player >= 0
+    for street_index, street_key in enumerate(_STREET_KEYS):
+        in_street = counted & (group_street == street_index)
+        count = lambda mask: bincount(group_player[in_street & mask])
+
+        counters[f'cbet_{street_key}_opportunities'] = count(cbet_opportunity)
+        counters[f'cbet_{street_key}_actions'] = count(cbet_action)
+        fold_to_cbet_prefix = f'fold_to_{street_key}_cbet'
+        counters[f'{fold_to_cbet_prefix}_opportunities'] = count(faced_cbet)
+        counters[f'{fold_to_cbet_prefix}_actions'] = count(faced_cbet & folded)
+        for position_key, position_mask in (('ip', ip_vs_aggressor), ('oop', ~ip_vs_aggressor)):
+            counters[f'{fold_to_cbet_prefix}_{position_key}_opportunities'] = count(faced_cbet & position_mask)
+            counters[f'{fold_to_cbet_prefix}_{position_key}_actions'] = count(faced_cbet & position_mask & folded)
+
+        donk_opportunity = lead_opportunity & group_lead_is_donk
+        counters[f'donk_bet_{street_key}_opportunities'] = count(donk_opportunity)
+        counters[f'donk_bet_{street_key}_actions'] = count(lead_action & group_lead_is_donk)
+        faced_donk = faced_lead & group_lead_is_donk
+        counters[f'fold_to_donk_bet_{street_key}_opportunities'] = count(faced_donk)
+        counters[f'fold_to_donk_bet_{street_key}_actions'] = count(faced_donk & folded)
+        sized_donk = in_street & faced_donk & (faced_size >= 0)
+        counters[f'fold_to_donk_bet_{street_key}_opportunities_by_size'] = bincount_by_size(
+            group_player[sized_donk], faced_size[sized_donk])
+        folded_donk = sized_donk & (faced_action == ACTION_FOLDS)
+        counters[f'fold_to_donk_bet_{street_key}_actions_by_size'] = bincount_by_size(
+            group_player[folded_donk], faced_size[folded_donk])
+        if street_index > 0:
+            counters[f'probe_bet_{street_key}_opportunities'] = count(lead_opportunity & ~group_lead_is_donk)
+            counters[f'probe_bet_{street_key}_actions'] = count(lead_action & ~group_lead_is_donk)
+            faced_probe = faced_lead & ~group_lead_is_donk
+            counters[f'fold_to_probe_bet_{street_key}_opportunities'] = count(faced_probe)
+            counters[f'fold_to_probe_bet_{street_key}_actions'] = count(faced_probe & folded)
+
+        counters[f'check_raise_{street_key}_opportunities'] = count(check_raise_opportunity)
+        counters[f'check_raise_{street_key}_actions'] = count(check_raise_action)
+
+    # Só no flop: CBet IP/OOP e Fold to CBet IP/OOP por size
+    in_flop = counted & (group_street == 0)
+    for position_key, cbet_position, faced_position in (('ip', aggressor_is_ip, ip_vs_aggressor),
+                                                        ('oop', ~aggressor_is_ip, ~ip_vs_aggressor)):
+        counters[f'cbet_flop_{position_key}_opportunities'] = bincount(group_player[in_flop & cbet_opportunity & cbet_position])
+        counters[f'cbet_flop_{position_key}_actions'] = bincount(group_player[in_flop & cbet_action & cbet_position])
+        sized_cbet = in_flop & faced_cbet & faced_position & (faced_size >= 0)
+        counters[f'fold_to_flop_cbet_{position_key}_opportunities_by_size'] = bincount_by_size(
+            group_player[sized_cbet], faced_size[sized_cbet])
+        folded_cbet = sized_cbet & (faced_action == ACTION_FOLDS)
+        counters[f'fold_to_flop_cbet_{position_key}_actions_by_size'] = bincount_by_size(
+            group_player[folded_cbet], faced_size[folded_cbet])
+    return counters
+
+
+def _apply_player_counters(ps, counters, player_index):
+    for field_name, values in counters.items():
+        player_values = values[player_index]
+        if player_values.ndim == 0:
+            setattr(ps, field_name, int(player_values))
+        elif player_values.ndim == 1: # {size group: contagem}
+            target = getattr(ps, field_name)
+            for size_code in np.flatnonzero(player_values):
+                target[SIZE_GROUP_NAMES[size_code]] += int(player_values[size_code])
+        else: # {street: {size group: contagem}}
+            target = getattr(ps, field_name)
+            for street_index, size_code in zip(*np.nonzero(player_values)):
+                target[_STREET_NAMES[street_index]][SIZE_GROUP_NAMES[size_code]] += int(player_values[street_index, size_code])
+
+
+def calculate_stats_for_all_players(conn, player_ids=None, columns=None):
+    """
+    Versão NumPy de stats_calculator.calculate_stats_for_all_players para os campos de
+    NUMPY_STAT_FIELDS. columns: ActionColumns já carregadas (senão lê do banco).
+    Retorna {player_name: PlayerStats}.
+    """
+    _require_numpy()
+    if columns is None:
+        columns = load_action_columns(conn)
+    players = conn.execute("SELECT player_id, player_name FROM players ORDER BY player_id").fetchall()
+    if player_ids is not None:
+        wanted_ids = set(player_ids)
+        players = [row for row in players if row[0] in wanted_ids]
+    if not players:
+        return {}
+
+    max_player_id = max(int(columns.player_id.max(initial=-1)), max(row[0] for row in players))
+    player_index_by_id = np.full(max_player_id + 1, -1, dtype=np.int64)
+    player_index_by_id[[row[0] for row in players]] = np.arange(len(players))
+
+    # --- Hands Played (hand_players) ---
+    hand_player_ids = np.fromiter(chain.from_iterable(conn.execute("SELECT player_id FROM hand_players")), dtype=np.int64)
+    hand_player_index = player_index_by_id[np.clip(hand_player_ids, 0, max_player_id)]
+    hands_played = np.bincount(hand_player_index[(hand_player_ids <= max_player_id) & (hand_player_index >= 0)],
+                               minlength=len(players))
+
+    counters = compute_player_counters(columns, player_index_by_id, len(players))
+    stats_by_name = {}
+    for player_index, (player_id, player_name) in enumerate(players):
+        ps = PlayerStats(player_name)
+        ps.hands_played = int(hands_played[player_index])
+        if ps.hands_played:
+            _apply_player_counters(ps, counters, player_index)
+        stats_by_name[player_name] = ps
+    return stats_by_name
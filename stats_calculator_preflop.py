@@ -1,5 +1,11 @@
 import sqlite3
+from itertools import groupby
 from typing import Optional
+from poker_codes import STREET_PREFLOP, ACTION_FOLDS, ACTION_BETS, ACTION_RAISES
+from stats_sql import player_filter, StatQueryPlan
+
+# Blocos de stats_sql.STAT_BLOCKS usados pelas stats de pré-flop
+PREFLOP_STAT_BLOCKS = ("player_hands", "preflop_voluntary_hands")
 
 class PreflopStats:
     def __init__(self):
@@ -13,130 +19,109 @@ class PreflopStats:
         self.fold_to_threebet_opportunities = 0
 
 
-def _count(query: str, cursor: sqlite3.Cursor, params: tuple) -> int:
-    cursor.execute(query, params)
-    row = cursor.fetchone()
-    if not row:
-        return 0
-    value = row[0]
-    return value if value else 0
-
-
-def calculate_preflop_stats_for_player(ps, cursor: sqlite3.Cursor, player_id: int) -> Optional[PreflopStats]:
+def calculate_preflop_stats_for_player(ps, cursor: sqlite3.Cursor, player_id: int, plan=None) -> Optional[PreflopStats]:
     """Calcula estatísticas de pré-flop para o jogador indicado.
 
     O objeto ``ps`` é atualizado in-place com os valores calculados. A função
     também retorna o objeto ``PreflopStats`` resumido para uso externo, se
     necessário.
     """
-    stats = PreflopStats()
+    calculate_preflop_stats_for_players({player_id: ps}, cursor, [player_id], plan)
 
-    # Total de mãos jogadas
-    stats.vpip_opportunities = _count(
-        "SELECT COUNT(DISTINCT hand_db_id) FROM hand_players WHERE player_id=?",
-        cursor,
-        (player_id,)
-    )
+    stats = PreflopStats()
+    stats.vpip_opportunities = ps.vpip_opportunities
+    stats.vpip_actions = ps.vpip_actions
+    stats.pfr_opportunities = ps.pfr_opportunities
+    stats.pfr_actions = ps.pfr_actions
+    stats.threebet_opportunities = ps.three_bet_pf_opportunities
+    stats.threebet_actions = ps.three_bet_pf_actions
+    stats.fold_to_threebet_opportunities = ps.fold_to_pf_3bet_opportunities
+    stats.fold_to_threebet_actions = ps.fold_to_pf_3bet_actions
+    return stats
 
-    stats.pfr_opportunities = stats.vpip_opportunities
-    stats.threebet_opportunities = 0
-    stats.fold_to_threebet_opportunities = 0
 
-    if stats.vpip_opportunities == 0:
-        # Atualiza objeto PlayerStats com valores zerados
-        ps.vpip_opportunities = 0
-        ps.vpip_actions = 0
-        ps.pfr_opportunities = 0
-        ps.pfr_actions = 0
-        ps.threebet_opportunities = 0
-        ps.threebet_actions = 0
-        ps.fold_to_pf_3bet_opportunities = 0
-        ps.fold_to_pf_3bet_actions = 0
-        return stats
+def calculate_preflop_stats_for_players(stats_by_player_id, cursor: sqlite3.Cursor, player_ids=None, plan=None) -> None:
+    """Calcula as estatísticas de pré-flop de vários jogadores de uma vez.
 
-    # VPIP
-    stats.vpip_actions = _count(
-        """
-        SELECT COUNT(DISTINCT a.hand_db_id)
-        FROM actions a
-        JOIN hand_players hp ON a.hand_db_id = hp.hand_db_id AND a.player_id = hp.player_id
-        JOIN hands h ON a.hand_db_id = h.hand_db_id
-        WHERE a.player_id=? AND a.street='Preflop'
-          AND a.action_type IN ('calls','bets','raises')
-          AND NOT (
-            (hp.position='SB' AND a.action_type='calls' AND a.amount=h.big_blind_amount/2) OR
-            (hp.position='BB' AND a.action_type='calls' AND a.amount=0)
-          )
-        """,
-        cursor,
-        (player_id,),
-    )
+    ``stats_by_player_id`` mapeia player_id -> PlayerStats (atualizados in-place);
+    ``player_ids`` None calcula para todos os jogadores do dicionário com consultas
+    agrupadas por player_id e uma única leitura ordenada das ações de pré-flop.
+    ``plan``: stats_sql.StatQueryPlan da requisição (com os mesmos player_ids), para
+    reaproveitar os blocos já lidos pelas outras streets.
+    Jogadores sem mãos ficam com os valores zerados.
+    """
+    if plan is None:
+        plan = StatQueryPlan(cursor, player_ids)
+    plan.declare(PREFLOP_STAT_BLOCKS)
+    player_sql, player_params = player_filter("player_id", player_ids)
 
-    # PFR
-    stats.pfr_actions = _count(
-        "SELECT COUNT(DISTINCT hand_db_id) FROM actions WHERE player_id=? AND street='Preflop' AND action_type IN ('bets','raises')",
-        cursor,
-        (player_id,),
-    )
+    # Total de mãos jogadas
+    for row in plan.rows("player_hands"):
+        ps = stats_by_player_id.get(row[0])
+        if ps is not None:
+            ps.vpip_opportunities = ps.pfr_opportunities = row[1]
+
+    # VPIP e PFR (uma leitura das ações de pré-flop, ver o bloco preflop_voluntary_hands)
+    for row in plan.rows("preflop_voluntary_hands"):
+        ps = stats_by_player_id.get(row[0])
+        if ps is not None:
+            ps.vpip_actions = row[1] or 0
+            ps.pfr_actions = row[2] or 0
 
     # 3bet e Fold to 3bet
-    cursor.execute(
-        """
-        SELECT hand_db_id, player_id, action_type, action_sequence
+    # Para jogadores específicos, só as mãos deles (as demais não contam; nas mãos em que
+    # não agiram no pré-flop nenhum deles entra na contagem): a subconsulta usa
+    # idx_hand_players_player e a leitura das ações de cada mão, já na ordem,
+    # idx_actions_hand_sequence. O custo acompanha o volume dos jogadores, não o do banco.
+    # Para todos os jogadores, uma leitura ordenada de todo o pré-flop.
+    hand_filter = "" if player_ids is None else \
+        f"AND hand_db_id IN (SELECT hand_db_id FROM hand_players WHERE {player_sql})"
+    cursor = plan.execute(
+        f"""
+        SELECT hand_db_id, player_id, action_code, action_sequence
         FROM actions
-        WHERE street='Preflop'
+        WHERE street_code={STREET_PREFLOP} {hand_filter}
         ORDER BY hand_db_id, action_sequence
-        """
+        """,
+        player_params if player_ids is not None else (),
+        tables=("actions",) if player_ids is None else ("actions", "hand_players"),
     )
-    rows = cursor.fetchall()
-    hands = {}
-    for row in rows:
-        hand_id = row[0]
-        if hand_id not in hands:
-            hands[hand_id] = []
-        hands[hand_id].append(row)
-
-    for hand_id, actions in hands.items():
+    for hand_id, actions in groupby(cursor, key=lambda row: row[0]):
+        actions = list(actions)
         first_raise = None
         second_raise = None
-        player_action_index = None
+        player_action_indexes = {}
         for idx, act in enumerate(actions):
             pid = act[1]
             a_type = act[2]
-            if a_type in ("bets", "raises"):
+            if a_type in (ACTION_BETS, ACTION_RAISES):
                 if not first_raise:
                     first_raise = pid
                 elif not second_raise:
                     second_raise = pid
-            if pid == player_id and player_action_index is None:
-                player_action_index = idx
-
-        if player_action_index is None:
-            continue
-
-        # 3bet opportunity: there is exactly one raise before player's action
-        pre_actions = [a for a in actions if a[3] < actions[player_action_index][3] and a[2] in ('bets', 'raises')]
-        if len(pre_actions) == 1 and pre_actions[0][1] != player_id:
-            stats.threebet_opportunities += 1
-            if actions[player_action_index][2] in ('bets', 'raises'):
-                stats.threebet_actions += 1
-        # Fold to 3bet opportunity
-        # If player is the first raiser and another player reraises and player later folds
-        if first_raise == player_id and second_raise and second_raise != player_id:
-            stats.fold_to_threebet_opportunities += 1
-            for act in actions[player_action_index + 1 : ]:
-                if act[1] == player_id and act[2] == 'folds':
-                    stats.fold_to_threebet_actions += 1
-                    break
-
-    # Propaga resultados para o objeto PlayerStats
-    ps.vpip_opportunities = stats.vpip_opportunities
-    ps.vpip_actions = stats.vpip_actions
-    ps.pfr_opportunities = stats.pfr_opportunities
-    ps.pfr_actions = stats.pfr_actions
-    ps.three_bet_pf_opportunities = stats.threebet_opportunities
-    ps.three_bet_pf_actions = stats.threebet_actions
-    ps.fold_to_pf_3bet_opportunities = stats.fold_to_threebet_opportunities
-    ps.fold_to_pf_3bet_actions = stats.fold_to_threebet_actions
-
-    return stats
+            if pid in stats_by_player_id and pid not in player_action_indexes:
+                player_action_indexes[pid] = idx
+
+        for player_id, player_action_index in player_action_indexes.items():
+            ps = stats_by_player_id[player_id]
+            # 3bet opportunity: there is exactly one raise before player's action
+            pre_actions = [a for a in actions if a[3] < actions[player_action_index][3] and a[2] in (ACTION_BETS, ACTION_RAISES)]
+            if len(pre_actions) == 1 and pre_actions[0][1] != player_id:
+                ps.three_bet_pf_opportunities += 1
+                if actions[player_action_index][2] in (ACTION_BETS, ACTION_RAISES):
+                    ps.three_bet_pf_actions += 1
+            # Fold to 3bet opportunity
+            # If player is the first raiser and another player reraises and player later folds
+            if first_raise == player_id and second_raise and second_raise != player_id:
+                ps.fold_to_pf_3bet_opportunities += 1
+                for act in actions[player_action_index + 1 : ]:
+                    if act[1] == player_id and act[2] == ACTION_FOLDS:
+                        ps.fold_to_pf_3bet_actions += 1
+                        break
+
+    # Sem mãos jogadas: stats de pré-flop zeradas
+    for ps in stats_by_player_id.values():
+        if ps.vpip_opportunities == 0:
+            ps.vpip_actions = ps.pfr_opportunities = ps.pfr_actions = 0
+            ps.three_bet_pf_opportunities = ps.three_bet_pf_actions = 0
+            ps.fold_to_pf_3bet_opportunities = ps.fold_to_pf_3bet_actions = 0
@@ -1,163 +1,199 @@
 # stats_calculator_river.py
 import sqlite3
 from collections import defaultdict
+from poker_codes import STREET_FLOP, STREET_TURN, STREET_RIVER, ACTION_FOLDS, ACTION_CALLS, SIZE_GROUP_NAMES
+from stats_sql import player_filter, StatQueryPlan
+
+# Blocos de stats_sql.STAT_BLOCKS usados pelas stats de River
+RIVER_STAT_BLOCKS = ("faced_bet_actions_by_size", "river_unfaced_actions")
 # from .stats_calculator import PlayerStats, _get_simplified_hand_category_from_description, FOLD_CLASS_THRESHOLDS, BLUFF_CLASS_THRESHOLDS, _classify_percentage
 # Se PlayerStats e outras constantes/funções estiverem no stats_calculator.py principal
 
-def calculate_river_stats_for_player(ps, cursor: sqlite3.Cursor, player_id: int):
+def calculate_river_stats_for_player(ps, cursor: sqlite3.Cursor, player_id: int, plan=None):
     """
     Calcula e preenche as estatísticas de River para o objeto PlayerStats (ps).
     """
     if ps.hands_played == 0: return
+    calculate_river_stats_for_players({player_id: ps}, cursor, [player_id], plan)
+
+def calculate_river_stats_for_players(stats_by_player_id, cursor: sqlite3.Cursor, player_ids=None, plan=None):
+    """
+    Calcula as estatísticas de River de vários jogadores (player_id -> PlayerStats, zerados)
+    com consultas agrupadas por player_id; player_ids None = todos os do dicionário.
+    plan: stats_sql.StatQueryPlan da requisição (blocos compartilhados entre as streets).
+    """
+    if plan is None:
+        plan = StatQueryPlan(cursor, player_ids)
+    plan.declare(RIVER_STAT_BLOCKS)
+    player_sql, player_params = player_filter("player_id", player_ids)
+    hf_player_sql, _ = player_filter("hf.player_id", player_ids)
+    river_hf_player_sql, _ = player_filter("river_hf.player_id", player_ids)
 
-    # --- CBet River ---
-    # Oportunidade: Jogador foi Turn Aggressor (TA), chegou no river, ninguém betou antes dele no river.
-    # Ação: Jogador beta no river.
-    cursor.execute("""
-        WITH TurnAggressorIsPlayer AS (
-            SELECT hand_db_id FROM hands WHERE turn_aggressor_id = ?
-        ),
-        CBetRiverOpps AS (
-            SELECT DISTINCT taip.hand_db_id
-            FROM TurnAggressorIsPlayer taip
-            JOIN actions ra ON taip.hand_db_id = ra.hand_db_id
-            WHERE ra.player_id = ? AND ra.street = 'River'
-              AND ra.action_type IN ('bets', 'checks')
-              AND NOT EXISTS (SELECT 1 FROM actions pre_river_bet 
-                              WHERE pre_river_bet.hand_db_id = taip.hand_db_id AND pre_river_bet.street = 'River'
-                              AND pre_river_bet.action_type IN ('bets', 'raises') 
-                              AND pre_river_bet.action_sequence < ra.action_sequence)
-        ),
-        CBetRiverActs AS (
-            SELECT DISTINCT cbo_r.hand_db_id
-            FROM CBetRiverOpps cbo_r
-            JOIN actions ra_bet ON cbo_r.hand_db_id = ra_bet.hand_db_id
-            WHERE ra_bet.player_id = ? AND ra_bet.street = 'River' AND ra_bet.action_type = 'bets'
-            AND ra_bet.action_sequence = (SELECT MIN(act_seq.action_sequence) FROM actions act_seq 
-                                          WHERE act_seq.hand_db_id = cbo_r.hand_db_id AND act_seq.street = 'River' 
-                                          AND act_seq.player_id = ? AND act_seq.action_type IN ('bets', 'checks'))
-        )
-        SELECT (SELECT COUNT(*) FROM CBetRiverOpps) as opps, (SELECT COUNT(*) FROM CBetRiverActs) as acts
-    """, (player_id, player_id, player_id, player_id))
-    res = cursor.fetchone()
-    ps.cbet_river_opportunities = res['opps'] if res and res['opps'] is not None else 0
-    ps.cbet_river_actions = res['acts'] if res and res['acts'] is not None else 0
-    
-    # --- Fold to River CBet ---
-    # (Lógica similar a Fold to Turn CBet, usando turn_aggressor_id)
+    # Fatos por mão de hand_features (ver hand_features.py); o agressor do river é o
+    # Turn Aggressor (TA), que é o agressor anterior quando o turn foi checado.
+
+    # --- CBet River / Donk Bet River / Probe Bet River / Check-Raise River / Fold to XR River / Check-Call e Check-Fold River ---
+    # CBet: Jogador é o TA, ninguém betou antes dele no river; ação: a primeira ação dele é um bet.
+    # Donk / Probe: Jogador NÃO é o TA, ninguém betou e o TA ainda não agiu no river; ação: bet
+    # (Probe quando o turn foi checado).
+    # Check-Raise / Check-Call / Check-Fold: Jogador deu check e volta a agir enfrentando aposta.
+    # Fold to XR: Jogador betou e enfrenta um check-raise; ação: folda.
+    cursor.execute(f"""
+        SELECT player_id,
+               SUM(cbet_opportunity) as cbet_opps, SUM(cbet_action) as cbet_acts,
+               SUM(donk_opportunity) as donk_opps, SUM(donk_action) as donk_acts,
+               SUM(probe_opportunity) as probe_opps, SUM(probe_action) as probe_acts,
+               SUM(check_raise_opportunity) as xr_opps, SUM(check_raise_action) as xr_acts,
+               SUM(check_raise_opportunity * (faced_bet_action_code = {ACTION_CALLS})) as check_calls,
+               SUM(check_raise_opportunity * (faced_bet_action_code = {ACTION_FOLDS})) as check_folds,
+               SUM(faced_check_raise) as faced_xr, SUM(faced_check_raise * folded) as folds_to_xr
+        FROM hand_features
+        WHERE {player_sql} AND street_code = {STREET_RIVER}
+        GROUP BY player_id
+    """, player_params)
+    for res in cursor.fetchall():
+        ps = stats_by_player_id.get(res['player_id'])
+        if ps is None: continue
+        ps.cbet_river_opportunities = res['cbet_opps'] or 0
+        ps.cbet_river_actions = res['cbet_acts'] or 0
+        ps.donk_bet_river_opportunities = res['donk_opps'] or 0
+        ps.donk_bet_river_actions = res['donk_acts'] or 0
+        ps.probe_bet_river_opportunities = res['probe_opps'] or 0
+        ps.probe_bet_river_actions = res['probe_acts'] or 0
+        ps.check_raise_river_opportunities = res['xr_opps'] or 0
+        ps.check_raise_river_actions = res['xr_acts'] or 0
+        ps.check_call_river_opportunities = ps.check_fold_river_opportunities = res['xr_opps'] or 0
+        ps.check_call_river_actions = res['check_calls'] or 0
+        ps.check_fold_river_actions = res['check_folds'] or 0
+        ps.fold_to_check_raise_river_opportunities = res['faced_xr'] or 0
+        ps.fold_to_check_raise_river_actions = res['folds_to_xr'] or 0
+
+    # --- Fold to River CBet (Geral, IP, OOP) ---
+    # Oportunidade: Jogador NÃO foi TA, TA betou no River (CBet River), é a vez do jogador.
+    # Ação: Jogador folda.
+    # IP/OOP: ordem de ação do jogador em relação ao TA no river.
+    cursor.execute(f"""
+        SELECT player_id, ip_vs_aggressor, COUNT(*) as opps, SUM(folded) as acts
+        FROM hand_features
+        WHERE {player_sql} AND street_code = {STREET_RIVER} AND faced_cbet = 1
+        GROUP BY player_id, ip_vs_aggressor
+    """, player_params)
+    for row in cursor.fetchall():
+        ps = stats_by_player_id.get(row['player_id'])
+        if ps is None: continue
+        ps.fold_to_river_cbet_opportunities += row['opps']
+        ps.fold_to_river_cbet_actions += row['acts']
+        if row['ip_vs_aggressor']:
+            ps.fold_to_river_cbet_ip_opportunities, ps.fold_to_river_cbet_ip_actions = row['opps'], row['acts']
+        else:
+            ps.fold_to_river_cbet_oop_opportunities, ps.fold_to_river_cbet_oop_actions = row['opps'], row['acts']
 
     # --- Bet River --- (Qualquer bet no river quando é a vez do jogador e não há aposta para pagar)
-    cursor.execute("""
-        SELECT COUNT(DISTINCT a.hand_db_id)
-        FROM actions a
-        WHERE a.player_id = ? AND a.street = 'River' AND a.action_type IN ('bets', 'checks')
-          AND a.amount_to_call_for_player = 0 -- Não enfrenta aposta
-    """, (player_id,))
-    res_opp = cursor.fetchone()
-    ps.bet_river_opportunities = res_opp[0] if res_opp and res_opp[0] is not None else 0
-    
-    cursor.execute("""
-        SELECT COUNT(DISTINCT a.hand_db_id)
-        FROM actions a
-        WHERE a.player_id = ? AND a.street = 'River' AND a.action_type = 'bets'
-          AND a.amount_to_call_for_player = 0
-    """, (player_id,))
-    res_act = cursor.fetchone()
-    ps.bet_river_actions = res_act[0] if res_act and res_act[0] is not None else 0
+    # Oportunidade e ação numa leitura (bloco river_unfaced_actions).
+    for res in plan.rows("river_unfaced_actions"):
+        ps = stats_by_player_id.get(res['player_id'])
+        if ps is None: continue
+        ps.bet_river_opportunities = res['opportunities'] or 0
+        ps.bet_river_actions = res['bets'] or 0
+
+    # --- Fold to Donk River (Geral e por Size) / Fold to Probe River ---
+    # Oportunidade: Jogador é TA e enfrenta um Donk (ou Probe) Bet no River.
+    # Ação: Jogador folda. Por size: grupo do tamanho do donk e reação do jogador a ele.
+    cursor.execute(f"""
+        SELECT player_id, faced_donk, faced_size_group_code, faced_bet_action_code, COUNT(*) as count, SUM(folded) as folds
+        FROM hand_features
+        WHERE {player_sql} AND street_code = {STREET_RIVER} AND (faced_donk = 1 OR faced_probe = 1)
+        GROUP BY player_id, faced_donk, faced_size_group_code, faced_bet_action_code
+    """, player_params)
+    for row in cursor.fetchall():
+        ps = stats_by_player_id.get(row['player_id'])
+        if ps is None: continue
+        if not row['faced_donk']:
+            ps.fold_to_probe_bet_river_opportunities += row['count']
+            ps.fold_to_probe_bet_river_actions += row['folds']
+            continue
+        ps.fold_to_donk_bet_river_opportunities += row['count']
+        ps.fold_to_donk_bet_river_actions += row['folds']
+        if row['faced_size_group_code'] is not None:
+            sg = SIZE_GROUP_NAMES[row['faced_size_group_code']]
+            ps.fold_to_donk_bet_river_opportunities_by_size[sg] += row['count']
+            if row['faced_bet_action_code'] == ACTION_FOLDS:
+                ps.fold_to_donk_bet_river_actions_by_size[sg] += row['count']
 
-    # --- Donk Bet River / Fold to Donk River ---
-    # --- Probe Bet River / Fold to Probe River ---
     # --- Bet vs Missed CBet River / Fold to Bet vs Missed CBet River ---
-    # --- Check-Raise River / Fold to XR River ---
     # (Lógica similar às de Turn, adaptando o agressor da street anterior)
 
-    # --- FTS River por Size --- (Já coberto no stats_calculator.py principal)
-    # --- Fold to Donk River por Size ---
+    # --- FTS River por Size ---
+    # Oportunidade: cada ação do jogador diante de uma aposta no river; ação: folda.
+    # Bloco faced_bet_actions_by_size (actions.size_group_code, uma leitura para as três streets).
+    for row in plan.rows("faced_bet_actions_by_size"):
+        if row['street_code'] != STREET_RIVER: continue
+        ps = stats_by_player_id.get(row['player_id'])
+        if ps is None: continue
+        sg = SIZE_GROUP_NAMES[row['size_group_code']]
+        ps.fold_to_bet_opportunities_by_size["River"][sg] += row['count']
+        if row['action_code'] == ACTION_FOLDS:
+            ps.fold_to_bet_actions_by_size["River"][sg] += row['count']
 
     # --- FTS River por Linha (BBB, BXB, XBB, XXB) e Size ---
-    # PFA é o jogador, linha é definida por suas ações Flop (B/X), Turn (B/X), River (B)
-    # E oponente (outro jogador) folda para o bet do PFA no river.
-    # Esta é uma consulta complexa que precisa identificar a linha do PFA.
-    # (A consulta de composição de river já faz parte disso, pode ser adaptada)
+    # PFA é quem aposta no river, linha é definida por suas ações Flop (B/X), Turn (B/X), River (B)
+    # (hand_features.line do PFA). Oportunidade: o jogador enfrenta o bet do PFA no river; ação: folda.
+    cursor.execute(f"""
+        SELECT hf.player_id, bettor_hf.line, hf.faced_size_group_code, hf.faced_bet_action_code, COUNT(*) as count
+        FROM hand_features hf
+        JOIN hands h ON h.hand_db_id = hf.hand_db_id AND h.preflop_aggressor_id = hf.faced_bet_player_id
+        JOIN hand_features bettor_hf ON bettor_hf.player_id = hf.faced_bet_player_id AND bettor_hf.street_code = {STREET_RIVER}
+                                    AND bettor_hf.hand_db_id = hf.hand_db_id
+        WHERE {hf_player_sql} AND hf.street_code = {STREET_RIVER}
+          AND bettor_hf.line IN ('BBB', 'BXB', 'XBB', 'XXB')
+        GROUP BY hf.player_id, bettor_hf.line, hf.faced_size_group_code, hf.faced_bet_action_code
+    """, player_params)
+    for row in cursor.fetchall():
+        ps = stats_by_player_id.get(row['player_id'])
+        if ps is None: continue
+        if row['faced_size_group_code'] is not None:
+            sg = SIZE_GROUP_NAMES[row['faced_size_group_code']]
+            ps.fold_to_river_bet_by_line_opportunities_by_size[row['line']][sg] += row['count']
+            if row['faced_bet_action_code'] == ACTION_FOLDS:
+                ps.fold_to_river_bet_by_line_actions_by_size[row['line']][sg] += row['count']
 
     # --- Composição de River por Linha, Size e Mão (PFA é o jogador) ---
     # (A consulta já está no stats_calculator.py principal, pode ser chamada ou movida/adaptada aqui)
 
     # --- CCF vs Triple Barrel ---
-    # Oportunidade: Jogador deu C/C Flop, C/C Turn, e enfrenta 3rd barrel do PFA no River.
+    # Oportunidade: Jogador deu C/C Flop, C/C Turn, e enfrenta 3rd barrel do PFA (linha BBB) no River.
     # Ação: Jogador folda.
-    cursor.execute("""
-        WITH PFAIsNOTPlayer AS (SELECT hand_db_id, preflop_aggressor_id as pfa_id FROM hands WHERE preflop_aggressor_id IS NOT NULL AND preflop_aggressor_id != ?),
-        PFATripleBarrelHands AS ( -- Mãos onde PFA betou F, T, R
-            SELECT DISTINCT pnp.hand_db_id, pnp.pfa_id
-            FROM PFAIsNOTPlayer pnp
-            WHERE EXISTS (SELECT 1 FROM actions fa WHERE fa.hand_db_id = pnp.hand_db_id AND fa.player_id = pnp.pfa_id AND fa.street = 'Flop' AND fa.action_type = 'bets')
-              AND EXISTS (SELECT 1 FROM actions ta WHERE ta.hand_db_id = pnp.hand_db_id AND ta.player_id = pnp.pfa_id AND ta.street = 'Turn' AND ta.action_type = 'bets')
-              AND EXISTS (SELECT 1 FROM actions ra WHERE ra.hand_db_id = pnp.hand_db_id AND ra.player_id = pnp.pfa_id AND ra.street = 'River' AND ra.action_type = 'bets')
-        ),
-        PlayerCalledFlopAndTurn AS (
-            SELECT DISTINCT ptbh.hand_db_id
-            FROM PFATripleBarrelHands ptbh
-            WHERE 
-                EXISTS (SELECT 1 FROM actions fc WHERE fc.hand_db_id = ptbh.hand_db_id AND fc.player_id = ? AND fc.street = 'Flop' AND fc.action_type = 'calls' AND fc.bet_faced_by_player_amount > 0)
-            AND EXISTS (SELECT 1 FROM actions tc WHERE tc.hand_db_id = ptbh.hand_db_id AND tc.player_id = ? AND tc.street = 'Turn' AND tc.action_type = 'calls' AND tc.bet_faced_by_player_amount > 0)
-        ),
-        CCFvsTBOpps AS ( -- Jogador (que deu C/C F,T) enfrenta 3rd barrel
-            SELECT DISTINCT pcft.hand_db_id
-            FROM PlayerCalledFlopAndTurn pcft
-            JOIN actions river_pfa_bet ON pcft.hand_db_id = river_pfa_bet.hand_db_id
-            JOIN actions player_river_act ON pcft.hand_db_id = player_river_act.hand_db_id
-            JOIN PFATripleBarrelHands ptbh_check ON pcft.hand_db_id = ptbh_check.hand_db_id -- Para pegar pfa_id
-            WHERE river_pfa_bet.player_id = ptbh_check.pfa_id AND river_pfa_bet.street = 'River' AND river_pfa_bet.action_type = 'bets'
-              AND player_river_act.player_id = ? AND player_river_act.street = 'River'
-              AND player_river_act.action_sequence > river_pfa_bet.action_sequence
-              AND player_river_act.bet_faced_by_player_amount > 0
-        ),
-        CCFvsTBActs AS (
-            SELECT DISTINCT opps.hand_db_id
-            FROM CCFvsTBOpps opps
-            JOIN actions player_fold ON opps.hand_db_id = player_fold.hand_db_id
-            WHERE player_fold.player_id = ? AND player_fold.street = 'River' AND player_fold.action_type = 'folds'
-        )
-        SELECT (SELECT COUNT(*) FROM CCFvsTBOpps) as opps, (SELECT COUNT(*) FROM CCFvsTBActs) as acts
-    """, (player_id, player_id, player_id, player_id, player_id)) # player_id usado várias vezes
-    res = cursor.fetchone()
-    ps.ccf_triple_barrel_opportunities = res['opps'] if res and res['opps'] is not None else 0
-    ps.ccf_triple_barrel_actions = res['acts'] if res and res['acts'] is not None else 0
+    cursor.execute(f"""
+        SELECT river_hf.player_id, COUNT(*) as opps, SUM(river_hf.folded) as acts
+        FROM hand_features river_hf
+        JOIN hands h ON h.hand_db_id = river_hf.hand_db_id AND h.preflop_aggressor_id = river_hf.faced_bet_player_id
+        JOIN hand_features pfa_hf ON pfa_hf.player_id = river_hf.faced_bet_player_id AND pfa_hf.street_code = {STREET_RIVER}
+                                 AND pfa_hf.hand_db_id = river_hf.hand_db_id
+        JOIN hand_features flop_hf ON flop_hf.player_id = river_hf.player_id AND flop_hf.street_code = {STREET_FLOP}
+                                  AND flop_hf.hand_db_id = river_hf.hand_db_id
+        JOIN hand_features turn_hf ON turn_hf.player_id = river_hf.player_id AND turn_hf.street_code = {STREET_TURN}
+                                  AND turn_hf.hand_db_id = river_hf.hand_db_id
+        WHERE {river_hf_player_sql} AND river_hf.street_code = {STREET_RIVER}
+          AND pfa_hf.line = 'BBB' AND flop_hf.called_bet = 1 AND turn_hf.called_bet = 1
+        GROUP BY river_hf.player_id
+    """, player_params)
+    for res in cursor.fetchall():
+        ps = stats_by_player_id.get(res['player_id'])
+        if ps is None: continue
+        ps.ccf_triple_barrel_opportunities = res['opps'] or 0
+        ps.ccf_triple_barrel_actions = res['acts'] or 0
 
     # --- BBF vs Donk River ---
-    # Oportunidade: Jogador betou flop, betou turn (foi o agressor F & T), e enfrenta um Donk Bet no River.
+    # Oportunidade: Jogador betou flop, betou turn, e enfrenta uma aposta no River antes de agir (linha 'BB-').
     # Ação: Jogador folda.
-    cursor.execute("""
-        WITH PlayerBetFlopAndTurn AS (
-            SELECT DISTINCT fa.hand_db_id
-            FROM actions fa
-            JOIN actions ta ON fa.hand_db_id = ta.hand_db_id AND fa.player_id = ta.player_id
-            WHERE fa.player_id = ? AND fa.street = 'Flop' AND fa.action_type = 'bets'
-              AND ta.street = 'Turn' AND ta.action_type = 'bets'
-              -- Adicionar condições para garantir que foram CBets ou bets agressivas, não donks do próprio jogador
-        ),
-        FacedRiverDonk AS (
-            SELECT DISTINCT pbft.hand_db_id, river_donk.action_sequence as river_donk_seq
-            FROM PlayerBetFlopAndTurn pbft
-            JOIN actions river_donk ON pbft.hand_db_id = river_donk.hand_db_id
-            WHERE river_donk.street = 'River' AND river_donk.action_type = 'bets'
-              AND river_donk.player_id != ? -- Donk por outro jogador
-              AND NOT EXISTS ( -- Jogador (agressor F,T) não agiu ainda no river antes do donk
-                  SELECT 1 FROM actions player_prev_river_act
-                  WHERE player_prev_river_act.hand_db_id = pbft.hand_db_id AND player_prev_river_act.street = 'River'
-                    AND player_prev_river_act.player_id = ? AND player_prev_river_act.action_sequence < river_donk.action_sequence
-              )
-        ),
-        BBFoldedToRiverDonk AS (
-            SELECT DISTINCT frd.hand_db_id
-            FROM FacedRiverDonk frd
-            JOIN actions player_fold_river ON frd.hand_db_id = player_fold_river.hand_db_id
-            WHERE player_fold_river.player_id = ? AND player_fold_river.street = 'River' AND player_fold_river.action_type = 'folds'
-            AND player_fold_river.action_sequence > frd.river_donk_seq
-        )
-        SELECT (SELECT COUNT(*) FROM FacedRiverDonk) as opps, (SELECT COUNT(*) FROM BBFoldedToRiverDonk) as acts
-    """, (player_id, player_id, player_id, player_id))
-    res = cursor.fetchone()
-    ps.bbf_vs_donk_river_opportunities = res['opps'] if res and res['opps'] is not None else 0
-    ps.bbf_vs_donk_river_actions = res['acts'] if res and res['acts'] is not None else 0
\ No newline at end of file
+    cursor.execute(f"""
+        SELECT player_id, COUNT(*) as opps, SUM(folded) as acts
+        FROM hand_features
+        WHERE {player_sql} AND street_code = {STREET_RIVER} AND line = 'BB-' AND faced_bet_player_id IS NOT NULL
+        GROUP BY player_id
+    """, player_params)
+    for res in cursor.fetchall():
+        ps = stats_by_player_id.get(res['player_id'])
+        if ps is None: continue
+        ps.bbf_vs_donk_river_opportunities = res['opps'] or 0
+        ps.bbf_vs_donk_river_actions = res['acts'] or 0
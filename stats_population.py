@@ -0,0 +1,114 @@
+# stats_population.py
+"""
+Cálculo das stats de uma população inteira de jogadores (p. ex. para
+html_generator.generate_html_grid) num pool de processos.
+
+Os player_ids são divididos em blocos e distribuídos para um ProcessPoolExecutor;
+cada worker abre a sua própria conexão somente leitura (db_manager.get_read_only_connection),
+calcula o bloco com stats_calculator.calculate_stats_for_all_players (consultas agrupadas
+filtradas pelos IDs do bloco) e devolve os PlayerStats serializados (PlayerStats.to_bytes).
+O processo principal recebe os blocos à medida que ficam prontos e mostra o progresso
+e a vazão (jogadores/s).
+"""
+import io
+import os
+import time
+import argparse
+import contextlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import db_manager
+import stats_calculator
+
+# Conexão somente leitura de cada processo do pool (aberta por _init_population_worker)
+_worker_conn = None
+
+
+def _init_population_worker(db_name):
+    """Initializer do pool: o worker aponta para o mesmo banco e abre a sua conexão somente leitura."""
+    global _worker_conn
+    db_manager.DB_NAME = db_name
+    _worker_conn = db_manager.get_read_only_connection()
+
+
+def _calculate_players_worker(player_ids):
+    """
+    Executado nos processos do pool: calcula as stats dos player_ids do bloco e devolve
+    [PlayerStats.to_bytes(), ...]. Os prints por bloco do stats_calculator são descartados;
+    o progresso é mostrado pelo processo principal.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats_by_name = stats_calculator.calculate_stats_for_all_players(_worker_conn, player_ids)
+    return [ps.to_bytes() for ps in stats_by_name.values()]
+
+
+def _iter_chunks(items, chunk_size):
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def iter_population_stats(player_ids=None, workers=None, chunk_size=100):
+    """
+    Gera os PlayerStats dos player_ids (None = todos os jogadores do banco) à medida que
+    os blocos de chunk_size jogadores ficam prontos nos `workers` processos (padrão: um
+    por núcleo). No máximo 2 blocos por worker ficam em voo.
+    """
+    if player_ids is None:
+        conn = db_manager.get_read_only_connection()
+        try:
+            player_ids = [row[0] for row in conn.execute("SELECT player_id FROM players ORDER BY player_id")]
+        finally:
+            conn.close()
+    player_ids = list(player_ids)
+    if not player_ids:
+        return
+    workers = min(workers or os.cpu_count() or 1, (len(player_ids) + chunk_size - 1) // chunk_size)
+
+    done_count = 0
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_population_worker,
+                             initargs=(os.path.abspath(db_manager.DB_NAME),)) as pool:
+        in_flight = deque()
+        chunks = _iter_chunks(player_ids, chunk_size)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < workers * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    in_flight.append((len(chunk), pool.submit(_calculate_players_worker, chunk)))
+            if not in_flight:
+                break
+            chunk_length, future = in_flight.popleft()
+            for blob in future.result():
+                yield stats_calculator.PlayerStats.from_bytes(blob)
+            done_count += chunk_length
+            elapsed = time.perf_counter() - start_time
+            print(f"  Stats calculadas para {done_count}/{len(player_ids)} jogadores "
+                  f"({done_count / elapsed if elapsed else 0:.0f} jogadores/s).")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Stats de {done_count} jogadores calculadas com {workers} workers em {elapsed:.1f}s "
+          f"({done_count / elapsed if elapsed else 0:.0f} jogadores/s).")
+
+
+def calculate_population_stats(player_ids=None, workers=None, chunk_size=100):
+    """Como iter_population_stats, mas retorna {player_name: PlayerStats} (o formato de stats_data do html_generator)."""
+    return {ps.player_name: ps for ps in iter_population_stats(player_ids, workers, chunk_size)}
+
+
+def main(argv=None):
+    import html_generator
+    arg_parser = argparse.ArgumentParser(description="Calcula as stats de todos os jogadores e gera o HUD em HTML.")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="Processos do pool (padrão: um por núcleo).")
+    arg_parser.add_argument("--chunk-size", type=int, default=100, help="Jogadores por tarefa do pool.")
+    arg_parser.add_argument("--output", default="estatisticas_poker_grid.html", help="Arquivo HTML do grid.")
+    args = arg_parser.parse_args(argv)
+    html_generator.generate_population_html_grid(args.output, workers=args.workers, chunk_size=args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
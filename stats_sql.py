@@ -0,0 +1,175 @@
+# stats_sql.py
+"""
+Auxiliares de SQL compartilhados pelos stats_calculator_*.
+"""
+import contextlib
+from collections import Counter, namedtuple
+
+from poker_codes import (STREET_PREFLOP, STREET_FLOP, STREET_TURN, STREET_RIVER,
+                         ACTION_CHECKS, ACTION_CALLS, ACTION_BETS, ACTION_RAISES)
+
+# Bloco de consulta compartilhado pelas stats: roda uma vez por requisição (StatQueryPlan) e
+# alimenta todas as stats que o declaram. tables: tabelas lidas (uma entrada por leitura);
+# player_column: coluna do filtro de player_filter ({player_sql} no SQL).
+StatBlock = namedtuple("StatBlock", ["name", "tables", "player_column", "sql"])
+
+STAT_BLOCKS = {block.name: block for block in (
+    # Mãos jogadas por jogador (hands_played, oportunidades de VPIP e PFR)
+    StatBlock("player_hands", ("hand_players",), "player_id", """
+        SELECT player_id, COUNT(DISTINCT hand_db_id) AS hands
+        FROM hand_players
+        WHERE {player_sql}
+        GROUP BY player_id
+    """),
+    # VPIP e PFR numa leitura das ações voluntárias (call / bet / raise) de pré-flop do jogador:
+    # uma linha por mão com "entrou voluntariamente" (fora o SB completando e o BB com 0) e
+    # "fez raise". MAX ignora NULL, então a condição NULL do NOT (...) não conta, como no WHERE.
+    StatBlock("preflop_voluntary_hands", ("actions", "hand_players", "hands"), "a.player_id", f"""
+        WITH player_preflop_hands AS (
+            SELECT a.player_id, a.hand_db_id,
+                   MAX(hp.player_id IS NOT NULL AND h.hand_db_id IS NOT NULL AND NOT (
+                         (hp.position='SB' AND a.action_code={ACTION_CALLS} AND a.amount=h.big_blind_amount/2) OR
+                         (hp.position='BB' AND a.action_code={ACTION_CALLS} AND a.amount=0)
+                       )) AS vpip,
+                   MAX(a.action_code IN ({ACTION_BETS},{ACTION_RAISES})) AS pfr
+            FROM actions a
+            LEFT JOIN hand_players hp ON a.hand_db_id = hp.hand_db_id AND a.player_id = hp.player_id
+            LEFT JOIN hands h ON a.hand_db_id = h.hand_db_id
+            WHERE {{player_sql}} AND a.street_code={STREET_PREFLOP}
+              AND a.action_code IN ({ACTION_CALLS},{ACTION_BETS},{ACTION_RAISES})
+            GROUP BY a.player_id, a.hand_db_id
+        )
+        SELECT player_id, SUM(vpip) AS vpip_hands, SUM(pfr) AS pfr_hands
+        FROM player_preflop_hands
+        GROUP BY player_id
+    """),
+    # Ações diante de aposta (size_group_code gravado na importação, índice parcial) das três
+    # streets pós-flop: FTS por size de Flop, Turn e River. O intervalo (e não um IN) deixa o
+    # planner pular direto para as streets em idx_actions_player_street_size.
+    StatBlock("faced_bet_actions_by_size", ("actions",), "player_id", f"""
+        SELECT player_id, street_code, size_group_code, action_code, COUNT(*) AS count
+        FROM actions
+        WHERE {{player_sql}} AND street_code BETWEEN {STREET_FLOP} AND {STREET_RIVER}
+          AND size_group_code IS NOT NULL
+        GROUP BY player_id, street_code, size_group_code, action_code
+    """),
+    # Ações no river sem aposta para pagar: mãos com check/bet (oportunidade de Bet River) e com bet
+    StatBlock("river_unfaced_actions", ("actions",), "player_id", f"""
+        SELECT player_id, COUNT(DISTINCT hand_db_id) AS opportunities,
+               COUNT(DISTINCT CASE WHEN action_code = {ACTION_BETS} THEN hand_db_id END) AS bets
+        FROM actions
+        WHERE {{player_sql}} AND street_code = {STREET_RIVER} AND action_code IN ({ACTION_BETS}, {ACTION_CHECKS})
+          AND amount_to_call_for_player = 0
+        GROUP BY player_id
+    """),
+)}
+
+_PLAYER_HANDS_FILTER = "hand_db_id IN (SELECT hand_db_id FROM temp.player_hand_ids)"
+
+# Tabelas lidas pelos stats_calculator_*, de onde materialized_player_hands copia as linhas
+# das mãos do jogador, e os índices que as consultas usam nas cópias TEMP (as tabelas
+# principais têm PK / índices equivalentes). hand_features é indexada por jogador, então a
+# cópia parte dos pares (jogador, mão) já copiados de hand_players (CROSS JOIN fixa essa ordem no SQLite).
+PLAYER_HAND_TABLES = (
+    ("hands", f"SELECT * FROM main.hands WHERE {_PLAYER_HANDS_FILTER}", ("hand_db_id",)),
+    ("hand_players", f"SELECT * FROM main.hand_players WHERE {_PLAYER_HANDS_FILTER}", ("player_id", "hand_db_id, player_id")),
+    ("actions", f"SELECT * FROM main.actions WHERE {_PLAYER_HANDS_FILTER}",
+     ("player_id, street_code, action_code", "player_id, street_code, size_group_code, action_code",
+      "hand_db_id, action_sequence", "hand_db_id, player_id")),
+    ("hand_street_players", f"SELECT * FROM main.hand_street_players WHERE {_PLAYER_HANDS_FILTER}",
+     ("hand_db_id, street_code, player_id",)),
+    ("hand_features", f"""
+        SELECT hf.* FROM temp.hand_players hp
+        CROSS JOIN main.hand_features hf ON hf.player_id = hp.player_id AND hf.hand_db_id = hp.hand_db_id
+                                  AND hf.street_code IN ({STREET_FLOP}, {STREET_TURN}, {STREET_RIVER})
+     """, ("player_id, street_code, hand_db_id",)),
+)
+
+
+def player_filter(column, player_ids):
+    """
+    Condição WHERE que limita uma consulta de stats aos jogadores: (sql, params).
+    player_ids None = todos os jogadores (as consultas agrupam por player_id); senão
+    um IN com os IDs informados, que com um único ID usa o índice como um '= ?'.
+    """
+    if player_ids is None:
+        return "1", ()
+    player_ids = tuple(player_ids)
+    return f"{column} IN ({','.join('?' * len(player_ids))})", player_ids
+
+
+class StatQueryPlan:
+    """
+    Consultas de uma requisição de stats (os mesmos player_ids para todas as streets).
+    blocks: nomes de STAT_BLOCKS que as stats declaram usar (PREFLOP_STAT_BLOCKS etc. dos
+    stats_calculator_*); rows(nome) roda o bloco na primeira vez e devolve as mesmas linhas
+    para as stats seguintes. table_reads conta as leituras por tabela dos blocos e das
+    consultas feitas por execute (todas as que leem actions passam pelo plano).
+    """
+    def __init__(self, cursor, player_ids=None, blocks=()):
+        self.cursor = cursor
+        self.player_ids = None if player_ids is None else tuple(player_ids)
+        self.blocks = frozenset(blocks)
+        self.table_reads = Counter()
+        self._rows_by_block = {}
+
+    def declare(self, blocks):
+        self.blocks |= frozenset(blocks)
+
+    def rows(self, block_name):
+        if block_name not in self.blocks:
+            raise KeyError(f"Bloco '{block_name}' não declarado neste plano de stats.")
+        if block_name not in self._rows_by_block:
+            block = STAT_BLOCKS[block_name]
+            player_sql, player_params = player_filter(block.player_column, self.player_ids)
+            self.cursor.execute(block.sql.format(player_sql=player_sql), player_params)
+            self._rows_by_block[block_name] = self.cursor.fetchall()
+            self.table_reads.update(block.tables)
+        return self._rows_by_block[block_name]
+
+    def execute(self, sql, params=(), tables=()):
+        """Consulta avulsa (não compartilhada) pelo cursor do plano, contando as tabelas lidas."""
+        self.table_reads.update(tables)
+        return self.cursor.execute(sql, params)
+
+
+@contextlib.contextmanager
+def materialized_player_hands(conn, player_id):
+    """
+    Dentro do bloco, as tabelas de PLAYER_HAND_TABLES desta conexão são cópias TEMP só com
+    as linhas das mãos do jogador (todas as linhas da mão, não só as dele: as consultas
+    cruzam com o agressor e os outros jogadores da mesma mão). As tabelas TEMP têm o mesmo
+    nome e o SQLite resolve nomes sem schema primeiro em temp, então as consultas dos
+    stats_calculator_* rodam sem mudança sobre tabelas do tamanho do volume do jogador.
+    Não grave nessas tabelas pela conexão dentro do bloco. Numa conexão somente leitura
+    (db_manager.get_read_only_connection) o query_only é desligado durante o bloco: o
+    mode=ro continua protegendo o arquivo, e as tabelas TEMP não ficam nele.
+    O bloco roda num SAVEPOINT: ao sair, a transação aberta pela cópia é encerrada (a
+    conexão não segura um snapshot antigo do WAL) e uma transação do chamador, se já
+    havia uma, continua aberta como estava.
+    """
+    query_only = conn.execute("PRAGMA query_only").fetchone()[0]
+    if query_only:
+        conn.execute("PRAGMA query_only = OFF")
+    conn.execute("SAVEPOINT materialized_player_hands")
+    created_tables = []
+    try:
+        conn.execute("CREATE TEMP TABLE player_hand_ids (hand_db_id INTEGER PRIMARY KEY)")
+        created_tables.append("player_hand_ids")
+        conn.execute("INSERT INTO temp.player_hand_ids SELECT DISTINCT hand_db_id FROM main.hand_players WHERE player_id = ?",
+                     (player_id,))
+        for table_name, source_sql, index_columns in PLAYER_HAND_TABLES:
+            conn.execute(f"CREATE TEMP TABLE {table_name} AS {source_sql}")
+            created_tables.append(table_name)
+            for index_number, columns in enumerate(index_columns):
+                conn.execute(f"CREATE INDEX temp.idx_player_{table_name}_{index_number} ON {table_name} ({columns})")
+            # Estatísticas das cópias: sem elas o planejador supõe tabelas grandes (e, p. ex.,
+            # monta um bloom filter varrendo toda a main.hand_features)
+            conn.execute(f"ANALYZE temp.{table_name}")
+        yield conn
+    finally:
+        for table_name in reversed(created_tables):
+            conn.execute(f"DROP TABLE temp.{table_name}")
+        conn.execute("RELEASE SAVEPOINT materialized_player_hands")
+        if query_only:
+            conn.execute("PRAGMA query_only = ON")